@@ -5,7 +5,7 @@ import statistics
 import csv
 from dotenv import load_dotenv
 from openai import OpenAI
-from difflib import SequenceMatcher
+from pm_eval.similarity import jaccard_matrix, edit_similarity, edit_similarity_matrix, upper_pairs
 
 
 # Models to benchmark (exact names from OpenAI)
@@ -64,12 +64,11 @@ def run_openai(model_name, client):
 
 
 def jaccard_similarity(a, b):
-    set_a, set_b = set(a.split()), set(b.split())
-    return len(set_a & set_b) / len(set_a | set_b) if set_a | set_b else 1
+    return float(jaccard_matrix([a.split(), b.split()])[0, 1])
 
 
 def levenshtein_ratio(a, b):
-    return SequenceMatcher(None, a, b).ratio()
+    return edit_similarity(a, b)
 
 
 def benchmark(client):
@@ -124,11 +123,9 @@ def benchmark(client):
 
         # Diversity metrics
         if len(outputs) > 1:
-            jaccards, levenshteins = [], []
-            for i in range(len(outputs)):
-                for j in range(i + 1, len(outputs)):
-                    jaccards.append(jaccard_similarity(outputs[i], outputs[j]))
-                    levenshteins.append(levenshtein_ratio(outputs[i], outputs[j]))
+            # all pairs at once (pm_eval/similarity.py)
+            jaccards = upper_pairs(jaccard_matrix([o.split() for o in outputs]))
+            levenshteins = upper_pairs(edit_similarity_matrix(outputs))
             avg_jaccard = statistics.mean(jaccards)
             avg_levenshtein = statistics.mean(levenshteins)
         else:
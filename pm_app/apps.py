@@ -6,6 +6,10 @@ class PmAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pm_app'
     def ready(self):
+            from django.db.backends.signals import connection_created
+            from .db import apply_sqlite_pragmas
+            connection_created.connect(apply_sqlite_pragmas, dispatch_uid='pm_app.apply_sqlite_pragmas')
+
             # We only want this to run for the 'runserver' command
             if 'runserver' not in sys.argv:
                 return
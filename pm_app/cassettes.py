@@ -0,0 +1,140 @@
+"""
+Record and replay of LLM traffic, so benchmarks, load tests and CI can run
+offline with production-sized prompts and responses.
+
+telemetry.call_llm() consults the store on every call, so this covers
+openapi_client, documents_helper.chat_call and the pm_eval scripts alike.
+LLM_CASSETTE_MODE picks what happens:
+
+  off     (default) every call goes to the API
+  record  calls go to the API and each response is saved
+  replay  responses come from the cassettes; an unrecorded request raises CassetteMiss
+  auto    replay what was recorded, call the API (and record) for the rest
+
+Cassettes live in LLM_CASSETTE_DIR (default: <EVAL_OUTPUT_DIR>/cassettes), one
+JSON file per distinct request, named by the sha256 of the request fields
+that shape the reply (model, messages, temperature, response_format). A file
+keeps up to LLM_CASSETTE_TAKES responses; replays go through them in order,
+per process, so repeated calls replay the recorded variation deterministically.
+With LLM_CASSETTE_LATENCY=recorded a replay also waits out the recorded time
+to first token and total latency; by default replays are instant.
+
+Like telemetry, this module must stay importable without Django settings.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+MODES = ("off", "record", "replay", "auto")
+REQUEST_FIELDS = ("model", "messages", "temperature", "response_format")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode was asked for a request that was never recorded."""
+
+
+def request_key(kwargs: dict) -> str:
+    request = {k: kwargs[k] for k in REQUEST_FIELDS if kwargs.get(k) is not None}
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    def __init__(self, directory, mode="off", takes=5, replay_latency=False):
+        if mode not in MODES:
+            raise ValueError(f"LLM cassette mode must be one of {', '.join(MODES)}, not {mode!r}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.takes = takes
+        self.replay_latency = replay_latency
+        self._loaded = {}   # key -> list of takes read from disk
+        self._played = {}   # key -> takes replayed so far in this process
+        self._lock = threading.Lock()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode in ("replay", "auto")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode in ("record", "auto")
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read(self, key: str) -> list:
+        if key not in self._loaded:
+            try:
+                self._loaded[key] = json.loads(self.path(key).read_text(encoding="utf-8"))["takes"]
+            except FileNotFoundError:
+                self._loaded[key] = []
+        return self._loaded[key]
+
+    def lookup(self, kwargs: dict):
+        """The next recorded take for this request, or None when it should go to the API."""
+        if not self.replaying:
+            return None
+        key = request_key(kwargs)
+        with self._lock:
+            takes = self._read(key)
+            if not takes:
+                if self.mode == "replay":
+                    raise CassetteMiss(f"No cassette for request {key[:12]} (model {kwargs.get('model')})")
+                return None
+            n = self._played.get(key, 0)
+            self._played[key] = n + 1
+            return takes[n % len(takes)]
+
+    def play(self, take: dict, t0: float):
+        """(text, ttft_s, usage) for a take, sleeping out the recorded timings if configured."""
+        if self.replay_latency and take.get("ttft_s") is not None:
+            time.sleep(max(0.0, t0 + take["ttft_s"] - time.perf_counter()))
+        ttft = round(time.perf_counter() - t0, 3)
+        if self.replay_latency and take.get("latency_s") is not None:
+            time.sleep(max(0.0, t0 + take["latency_s"] - time.perf_counter()))
+        usage = SimpleNamespace(**take["usage"]) if take.get("usage") else None
+        return take["text"], ttft, usage
+
+    def record(self, kwargs: dict, text: str, usage, ttft_s, latency_s):
+        if not self.recording:
+            return
+        key = request_key(kwargs)
+        take = {
+            "text": text,
+            "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+            if usage is not None else None,
+            "ttft_s": ttft_s,
+            "latency_s": latency_s,
+            "recorded_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self._loaded.pop(key, None)  # another process may have added takes
+            takes = self._read(key)
+            if len(takes) >= self.takes:
+                return
+            takes.append(take)
+            path = self.path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            request = {k: kwargs[k] for k in REQUEST_FIELDS if kwargs.get(k) is not None}
+            # Write then rename, so a concurrent reader never sees half a file
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps({"key": key, "request": request, "takes": takes}, ensure_ascii=False, default=str),
+                           encoding="utf-8")
+            os.replace(tmp, path)
+
+
+def _default_dir() -> Path:
+    return Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "cassettes"
+
+
+store = CassetteStore(
+    os.getenv("LLM_CASSETTE_DIR") or _default_dir(),
+    mode=os.getenv("LLM_CASSETTE_MODE", "off").lower(),
+    takes=int(os.getenv("LLM_CASSETTE_TAKES") or 5),
+    replay_latency=os.getenv("LLM_CASSETTE_LATENCY", "none").lower() == "recorded",
+)
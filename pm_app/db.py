@@ -0,0 +1,14 @@
+"""
+Per-connection SQLite tuning. PmAppConfig.ready() connects apply_sqlite_pragmas
+to connection_created, so every new connection runs settings.SQLITE_PRAGMAS
+(set by DB_PROFILE=production; empty otherwise, which leaves SQLite's defaults).
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -1,17 +1,40 @@
+from __future__ import annotations
+
 import json
 import ast
+import threading
+from typing import TYPE_CHECKING
 from django.conf import settings
 from dotenv import load_dotenv
 import os
-from openai import OpenAI, AuthenticationError, RateLimitError, APIConnectionError
-from .models import Project, Outcome, Benefit, Deliverable, Task
-from docx import Document
+from .models import Project, GeneratedDocument
+from .helper import load_project_flow
+from .instrumentation import span, submit_in_context
+from . import metrics
+from . import cassettes
+from .telemetry import call_llm, record_cache_hit
 import re as _re2
-from django.http import JsonResponse
-from docx.shared import Pt
+from django.http import JsonResponse, FileResponse
+from tempfile import SpooledTemporaryFile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import zipfile
+from dataclasses import dataclass, field
+from xml.sax.saxutils import escape as xml_escape
 from datetime import date, timedelta as td, datetime as _dt
 
+# openai and python-docx are imported on first use, so loading the views does not pay for them
+if TYPE_CHECKING:
+    from docx.document import Document
+
+
 
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Documents up to this size stay in memory; larger ones spill to an anonymous temp file
+DOCX_SPOOL_MAX_BYTES = 2 * 1024 * 1024
+
+# Shared pool for document LLM calls, so a burst of bundle downloads cannot spawn unbounded threads
+DOCUMENT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="docgen")
 
 BUDGET_RE = _re2.compile(r'(?P<currency>[$£€])\s?(?P<amount>[\d,]+(?:\.\d+)?)', _re2.I)
 YEAR_RE = _re2.compile(r'\b(20[2-9]\d|203\d)\b')
@@ -21,15 +44,25 @@ load_dotenv()
 # 3. Get the API key from the environment
 api_key = os.getenv("OPENAI_API_KEY") 
 MODEL = "gpt-4o"
-client = None
+_client = None
+_client_lock = threading.Lock()
 
-# 4. Check if the key exists and initialize the client
-if api_key:
-    client = OpenAI(api_key=api_key)
-else:
+# 4. Check if the key exists; the client itself is created on the first call
+if not api_key:
     print("Warning: OPENAI_API_KEY not found in .env file.")
 
 
+def get_client():
+    """The shared OpenAI client, or None without an API key."""
+    global _client
+    if _client is None and api_key:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=api_key, base_url=settings.OPENAI_BASE_URL)
+    return _client
+
+
 def _strip_code_fences(s: str) -> str:
     s = (s or "").strip()
     if s.startswith("```"):
@@ -49,12 +82,13 @@ def _coerce_obj(raw_text: str):
         if not isinstance(obj, dict): raise ValueError
         return obj
 
-def chat_call(messages, temperature=0.3) -> str:
-    if not client:
+def chat_call(messages, temperature=0.3, feature="document") -> str:
+    from openai import AuthenticationError, RateLimitError, APIConnectionError
+    client = get_client()
+    if not client and not cassettes.store.replaying:
         raise RuntimeError("OpenAI client is not initialized. Check API Key.")
     try:
-        resp = client.chat.completions.create(model=MODEL, messages=messages, temperature=temperature)
-        return resp.choices[0].message.content
+        return call_llm(client, feature=feature, model=MODEL, messages=messages, temperature=temperature).text
     except (AuthenticationError, RateLimitError, APIConnectionError) as e:
         raise RuntimeError(f"OpenAI call failed: {e}") from e
 
@@ -77,7 +111,7 @@ def generate_comm_plan(desc: str) -> dict:
     }}
     Rules: Generate 8–12 relevant stakeholder rows. Tailor Roles & Frequency to the project description in <desc>.
     """
-    raw_response = chat_call([{"role": "system", "content": system}])
+    raw_response = chat_call([{"role": "system", "content": system}], feature="comm_plan")
     return _coerce_obj(raw_response)
 
 # --- Safety Net Functions ---
@@ -165,7 +199,7 @@ def generate_financial_plan(desc: str) -> dict:
 
     Use the currency "£". Return ONLY the JSON object.
     """
-    raw_response = chat_call([{"role":"system", "content":system}], 0.3)
+    raw_response = chat_call([{"role":"system", "content":system}], 0.3, feature="financial_plan")
     return _coerce_obj(raw_response)
 
 def _rows_from_any(data):
@@ -211,25 +245,54 @@ def _parse_budget_year(txt: str):
     return budget, year
 
 
-def _project_facts(project_id: int) -> dict:
-    try:
-        p = Project.objects.get(pk=project_id)
-    except Project.DoesNotExist:
-        return {"Project Name": f"Project {project_id}",
-                "Project Manager": "Project Manager", "Executive Sponsor": "Executive Sponsor",
-                "Start Date": "", "End Date": "", "Total Budget": "", "Target Year": "",
-                "Board Cadence": "Fortnightly", "Highlight Frequency": "Weekly",
-                "Regulators": "", "Suppliers": [], "Objectives": [], "Deliverables": []}
-    objectives = [o.description for o in p.outcomes.all()]
-    deliverables = []
-    for o in p.outcomes.all():
-        for b in o.benefits.all():
-            for d in b.deliverables.all():
-                if d.description:
-                    deliverables.append(d.description)
+@dataclass
+class ProjectFacts:
+    """
+    Everything the plan documents need about a project, gathered once per
+    request: the flow snapshot for objectives/deliverables/counts and a single
+    task query for the schedule. Reads like the old facts dict via get/[].
+    """
+    project: Project
+    fields: dict
+    objectives: list = field(default_factory=list)
+    deliverables: list = field(default_factory=list)
+    tasks: list = field(default_factory=list)
+    outcome_count: int = 0
+    deliverable_count: int = 0
+    schedule_start: date | None = None
+    schedule_end: date | None = None
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def as_dict(self) -> dict:
+        return dict(self.fields)
+
+
+def build_project_facts(project: Project) -> ProjectFacts:
+    """One task query on top of the project row (the snapshot covers the rest)."""
+    flow = load_project_flow(project)
+    tasks = list(project.tasks.order_by('id'))
+
+    outcomes = flow.get("outcomes", [])
+    objectives = [o["description"] for o in outcomes]
+    deliverables, deliverable_count = [], 0
+    for o in outcomes:
+        for b in o.get("benefits", []):
+            for d in b.get("deliverables", []):
+                deliverable_count += 1
+                if d.get("description"):
+                    deliverables.append(d["description"])
+    starts = [t.start_date for t in tasks if t.start_date]
+    ends = [t.end_date for t in tasks if t.end_date]
+
+    p = project
     b_from_vision, y_from_vision = _parse_budget_year(getattr(p, "vision", "") or "")
-    return {
-        "Project Name": getattr(p, "name", f"Project {project_id}"),
+    fields = {
+        "Project Name": getattr(p, "name", f"Project {p.pk}"),
         "Project Manager": getattr(p, "project_manager", "Project Manager"),
         "Executive Sponsor": getattr(p, "sponsor", "Executive Sponsor"),
         "Start Date": getattr(p, "start_date", "") or "",
@@ -243,9 +306,15 @@ def _project_facts(project_id: int) -> dict:
         "Objectives": objectives,
         "Deliverables": deliverables,
     }
+    return ProjectFacts(
+        project=p, fields=fields, objectives=objectives, deliverables=deliverables,
+        tasks=tasks, outcome_count=len(outcomes), deliverable_count=deliverable_count,
+        schedule_start=min(starts) if starts and ends else None,
+        schedule_end=max(ends) if starts and ends else None,
+    )
 
 
-def build_project_desc(facts: dict) -> str:
+def build_project_desc(facts) -> str:
     parts = []
     for k in ("Project Name", "Project Manager", "Executive Sponsor", "Total Budget",
               "Start Date", "End Date", "Board Cadence", "Highlight Frequency", "Regulators"):
@@ -273,27 +342,145 @@ def _duration_to_days(s, default=7):
 
 
 
+TABLE_STYLE_NAME = "PM Table"
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+# Characters XML 1.0 cannot carry; python-docx rejects them too
+_XML_INVALID_RE = _re2.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_TABLE_STYLE_XML = f"""
+<w:style xmlns:w="{_W_NS}" w:type="table" w:customStyle="1" w:styleId="PMTable">
+  <w:name w:val="{TABLE_STYLE_NAME}"/>
+  <w:basedOn w:val="TableNormal"/>
+  <w:rPr>
+    <w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>
+    <w:sz w:val="20"/><w:szCs w:val="20"/>
+  </w:rPr>
+  <w:tblPr/>
+  <w:tblStylePr w:type="firstRow"><w:rPr><w:b/><w:bCs/></w:rPr></w:tblStylePr>
+</w:style>
+"""
+
+
+def _ensure_table_style(doc: Document) -> None:
+    """Adds the shared 'PM Table' style (Calibri 10pt, bold header row) once per document."""
+    from docx.oxml import parse_xml
+    styles = doc.styles.element
+    if styles.get_by_id("PMTable") is None:
+        styles.append(parse_xml(_TABLE_STYLE_XML))
+
+
 def _docx_add_table(doc: Document, rows, header: bool = True):
-    if not rows:
+    """
+    Appends a table built from an iterable of rows. The whole table XML is
+    assembled in one pass and parsed once; fonts and the bold header come
+    from the 'PM Table' style instead of per-run formatting.
+    """
+    from docx.oxml import parse_xml
+    from docx.shared import Emu
+    from docx.table import Table
+    cols = 0
+    tr_cells = []
+    for r in rows:
+        cells = []
+        for val in r:
+            txt = "" if val is None else str(val)
+            txt = xml_escape(_XML_INVALID_RE.sub("", txt))
+            cells.append(f'<w:p><w:r><w:t xml:space="preserve">{txt}</w:t></w:r></w:p>' if txt else "<w:p/>")
+        cols = max(cols, len(cells))
+        tr_cells.append(cells)
+    if not tr_cells:
         return
-    cols = max(len(r) for r in rows)
-    table = doc.add_table(rows=1 if header else 0, cols=cols)
-    if header:
-        hdr = table.rows[0].cells
-        for i, val in enumerate(rows[0]):
-            run = hdr[i].paragraphs[0].add_run(str(val))
-            run.font.name = "Calibri"
-            run.font.size = Pt(10)
-            run.bold = True
-        data = rows[1:]
+
+    section = doc.sections[-1]
+    col_w = int(Emu(section.page_width - section.left_margin - section.right_margin).twips / max(1, cols))
+    tc_pr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{col_w}"/></w:tcPr>'
+    empty_tc = f"<w:tc>{tc_pr}<w:p/></w:tc>"
+
+    parts = [
+        f'<w:tbl xmlns:w="{_W_NS}"><w:tblPr><w:tblStyle w:val="PMTable"/><w:tblW w:type="auto" w:w="0"/>',
+        f'<w:tblLook w:firstColumn="0" w:firstRow="{1 if header else 0}" w:lastColumn="0" w:lastRow="0" w:noHBand="1" w:noVBand="1"/></w:tblPr>',
+        "<w:tblGrid>", f'<w:gridCol w:w="{col_w}"/>' * cols, "</w:tblGrid>",
+    ]
+    for cells in tr_cells:
+        parts.append("<w:tr>")
+        parts.extend(f"<w:tc>{tc_pr}{c}</w:tc>" for c in cells)
+        parts.append(empty_tc * (cols - len(cells)))
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+
+    _ensure_table_style(doc)
+    tbl = parse_xml("".join(parts))
+    doc.element.body._insert_tbl(tbl)
+    return Table(tbl, doc._body)
+
+
+def docx_response(doc, filename: str) -> FileResponse:
+    """
+    Streams a python-docx Document (or already rendered DOCX bytes) as an
+    attachment without leaving files behind. Documents are written to a
+    spooled buffer (in memory up to DOCX_SPOOL_MAX_BYTES, then an unlinked
+    temp file); FileResponse closes it once the response has been sent,
+    which frees or deletes it.
+    """
+    if isinstance(doc, (bytes, memoryview)):
+        buf = BytesIO(doc)
     else:
-        data = rows
-    for r in data:
-        cells = table.add_row().cells
-        for i, val in enumerate(r):
-            run = cells[i].paragraphs[0].add_run("" if val is None else str(val))
-            run.font.name = "Calibri"
-            run.font.size = Pt(10)
+        buf = SpooledTemporaryFile(max_size=DOCX_SPOOL_MAX_BYTES, suffix=".docx")
+        doc.save(buf)
+        buf.seek(0)
+    return FileResponse(buf, as_attachment=True, filename=filename, content_type=DOCX_CONTENT_TYPE)
+
+
+def zip_response(files: dict, filename: str) -> FileResponse:
+    """Streams a ZIP built from {archive name: bytes}, spooled like docx_response."""
+    buf = SpooledTemporaryFile(max_size=DOCX_SPOOL_MAX_BYTES, suffix=".zip")
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    buf.seek(0)
+    return FileResponse(buf, as_attachment=True, filename=filename, content_type="application/zip")
+
+
+def docx_bytes(doc: Document) -> bytes:
+    buf = BytesIO()
+    with span("docx"):
+        doc.save(buf)
+    return buf.getvalue()
+
+
+def cached_document(project: Project, doc_type: str):
+    """Returns the GeneratedDocument for the project's current flow_version, or None."""
+    doc = GeneratedDocument.objects.filter(
+        projectID=project, doc_type=doc_type, flow_version=project.flow_version
+    ).first()
+    metrics.DOCUMENT_CACHE.inc(doc_type=doc_type, result="miss" if doc is None else "hit")
+    if doc is not None:
+        record_cache_hit(feature=doc_type, model=MODEL)
+    return doc
+
+
+def submit_document_job(fn, *args):
+    """Runs fn(*args) on DOCUMENT_EXECUTOR, tracking queue depth in the docgen gauges."""
+    metrics.DOCGEN_QUEUED.inc()
+
+    def job():
+        metrics.DOCGEN_QUEUED.dec()
+        metrics.DOCGEN_RUNNING.inc()
+        try:
+            return fn(*args)
+        finally:
+            metrics.DOCGEN_RUNNING.dec()
+
+    return submit_in_context(DOCUMENT_EXECUTOR, job)
+
+
+def store_document(project: Project, doc_type: str, ai_json: dict, docx: bytes) -> None:
+    """Caches a generated document against the flow_version and template it was built from."""
+    from .docx_render import template_version  # docx_render imports this module
+    GeneratedDocument.objects.update_or_create(
+        projectID=project, doc_type=doc_type, flow_version=project.flow_version,
+        defaults={"ai_json": ai_json, "docx": docx, "template_version": template_version(doc_type)},
+    )
 
 
 def _parse_money(s: str) -> float | None:
@@ -306,17 +493,14 @@ def _parse_money(s: str) -> float | None:
         return None
 
 
-def _infer_dates_from_tasks(project: Project):
-    tasks = list(Task.objects.filter(deliverableID__benefitID__outcomeID__projectID=project))
-    starts = [t.start_date for t in tasks if t.start_date]
-    ends = [t.end_date for t in tasks if t.end_date]
-    if starts and ends:
-        return min(starts), max(ends)
+def _infer_dates_from_tasks(facts: ProjectFacts):
+    if facts.schedule_start and facts.schedule_end:
+        return facts.schedule_start, facts.schedule_end
     s = date.today()
     return s, s + td(days=240)
 
 
-def _normalize_stages_for_doc(stages_data, project: Project):
+def _normalize_stages_for_doc(stages_data, facts: ProjectFacts):
     """Return rows for the Stages table (with default objectives if missing)."""
 
     def _parse_date_any(x):
@@ -345,7 +529,7 @@ def _normalize_stages_for_doc(stages_data, project: Project):
 
     def _fallback_rows():
         names = ["Initiation", "Planning", "Execution", "Closure"]
-        s, e = _infer_dates_from_tasks(project)
+        s, e = _infer_dates_from_tasks(facts)
         total = max(1, (e - s).days)
         cuts = [s,
                 s + td(days=int(total * .10)),
@@ -381,22 +565,21 @@ def _normalize_stages_for_doc(stages_data, project: Project):
 
     return [["name", "start_date", "end_date", "objectives"]] + rows
 
-def _expenses_from_deliverables(project: Project):
+def _expenses_from_deliverables(facts: ProjectFacts):
     cats = ["Market Research", "Product Development", "Digital Marketing", "Branding and Design",
             "Website / Platform", "Staffing & Training", "Logistics & Distribution"]
-    ds = list(Deliverable.objects.filter(benefitID__outcomeID__projectID=project))
-    base_each = max(1, len(ds)) * 25000
-    return [(c, f"£{base_each:,.0f}")] * len(cats)
+    base_each = max(1, facts.deliverable_count) * 25000
+    return [(c, f"£{base_each:,.0f}") for c in cats]
 
 
-def _monthly_cashflow(project: Project, total_cost_guess: float | None):
-    s, e = _infer_dates_from_tasks(project)
+def _monthly_cashflow(facts: ProjectFacts, total_cost_guess: float | None):
+    s, e = _infer_dates_from_tasks(facts)
     months, cur = [], date(s.year, s.month, 1)
     while cur <= e:
         months.append(cur)
         cur = date(cur.year + (1 if cur.month == 12 else 0), 1 if cur.month == 12 else cur.month + 1, 1)
     if total_cost_guess is None:
-        total_cost_guess = sum(_parse_money(v) or 0 for _, v in _expenses_from_deliverables(project)) or 1_000_000
+        total_cost_guess = sum(_parse_money(v) or 0 for _, v in _expenses_from_deliverables(facts)) or 1_000_000
     monthly = total_cost_guess / max(1, len(months))
     return months, monthly, total_cost_guess
 
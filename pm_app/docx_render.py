@@ -0,0 +1,125 @@
+"""
+Template-based rendering for the plan documents.
+
+Each document type has a pre-styled .docx skeleton in settings.DOCX_TEMPLATE_DIR
+(built by `manage.py build_docx_templates`, then free to be restyled in Word).
+Skeletons are parsed once per process and deep-copied per request.
+
+Placeholders are written as {{ name }}:
+- inside running text (e.g. a heading) they are replaced by the string value;
+- a paragraph that holds nothing but a placeholder is a block and is replaced
+  by the value: a str becomes a paragraph, a list of lists a table, a list of
+  str a bulleted list and bytes an image. An empty value removes the block
+  together with a heading directly above it.
+
+python-docx is imported on first use, so loading the views does not pay for it.
+"""
+from __future__ import annotations
+
+import copy
+import re
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+from .documents_helper import _docx_add_table
+from .instrumentation import span
+
+if TYPE_CHECKING:
+    from docx.document import Document
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([a-zA-Z0-9_]+)\s*\}\}")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def template_path(name: str) -> Path:
+    return Path(settings.DOCX_TEMPLATE_DIR) / f"{name}.docx"
+
+
+def template_version(name: str) -> str:
+    """Identifies the current skeleton (its mtime); stored with cached documents to spot layout changes."""
+    return str(template_path(name).stat().st_mtime_ns)
+
+
+def load_template(name: str) -> Document:
+    """
+    Returns the parsed skeleton for a document type. The parse is cached per
+    process and refreshed when the file's mtime changes, so layout edits are
+    picked up without a restart. Callers must copy before mutating.
+    """
+    path = template_path(name)
+    mtime = int(template_version(name))
+    cached = _cache.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _cache_lock:
+        cached = _cache.get(name)
+        if not cached or cached[0] != mtime:
+            import docx
+            cached = (mtime, docx.Document(str(path)))
+            _cache[name] = cached
+    return cached[1]
+
+
+@span("docx")
+def render_docx_template(name: str, context: dict) -> Document:
+    """Clones the named skeleton and fills its placeholders from context."""
+    doc = copy.deepcopy(load_template(name))
+    for paragraph in list(doc.paragraphs):
+        text = paragraph.text
+        if "{{" not in text:
+            continue
+        block = PLACEHOLDER_RE.fullmatch(text.strip())
+        if block:
+            _fill_block(doc, paragraph, context.get(block.group(1)))
+        else:
+            _set_text(paragraph, PLACEHOLDER_RE.sub(lambda m: str(context.get(m.group(1), "")), text))
+    return doc
+
+
+def _set_text(paragraph, text: str) -> None:
+    # Keep the first run (and its formatting), drop the rest
+    runs = paragraph.runs
+    if not runs:
+        paragraph.add_run(text)
+        return
+    runs[0].text = text
+    for run in runs[1:]:
+        run._r.getparent().remove(run._r)
+
+
+def _fill_block(doc, paragraph, value) -> None:
+    p = paragraph._p
+    if not value:
+        prev = p.getprevious()
+        prev_style = getattr(prev, "style", None)
+        if isinstance(prev_style, str) and prev_style.startswith("Heading"):
+            prev.getparent().remove(prev)
+        p.getparent().remove(p)
+        return
+
+    if isinstance(value, str):
+        _set_text(paragraph, value)
+        return
+
+    if isinstance(value, (bytes, bytearray)):
+        for run in paragraph.runs:
+            run._r.getparent().remove(run._r)
+        from docx.shared import Inches
+        paragraph.add_run().add_picture(BytesIO(value), width=Inches(6.5))
+        return
+
+    if isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+        for item in value:
+            bullet = doc.add_paragraph(item, style="List Bullet")
+            p.addprevious(bullet._p)
+    else:
+        table = _docx_add_table(doc, value, header=True)
+        if table is not None:
+            p.addprevious(table._tbl)
+    p.getparent().remove(p)
@@ -0,0 +1,51 @@
+"""
+The embedding function for our Chroma collections. Imported on first use by
+services.get_embedding_function(), since it pulls in chromadb and onnxruntime.
+
+chromadb's DefaultEmbeddingFunction builds a new ONNXMiniLM_L6_V2 on every
+call, so the ONNX session and tokenizer were loaded again for each query.
+TimedEmbeddingFunction keeps one instance per process (still registered under
+the "default" name, so existing collections accept it).
+"""
+from functools import cached_property
+
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction, ONNXMiniLM_L6_V2
+from django.conf import settings
+
+from .instrumentation import span
+
+
+class MiniLM(ONNXMiniLM_L6_V2):
+    """
+    ONNXMiniLM_L6_V2 with settings.EMBEDDING_THREADS ONNX Runtime threads
+    (0 keeps chromadb's session). The prefork server uses 1: ONNX Runtime's
+    thread pool does not survive fork(), and with one thread inference runs on
+    the calling thread, so a session loaded in the parent works in every worker.
+    """
+
+    @cached_property
+    def model(self):
+        threads = settings.EMBEDDING_THREADS
+        if not threads:
+            return ONNXMiniLM_L6_V2.model.func(self)
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = threads
+        so.inter_op_num_threads = threads
+        return self.ort.InferenceSession(
+            str(self.DOWNLOAD_PATH / self.EXTRACTED_FOLDER_NAME / "model.onnx"),
+            providers=["CPUExecutionProvider"], sess_options=so,
+        )
+
+
+class TimedEmbeddingFunction(DefaultEmbeddingFunction):
+    """The default embedding function, timed as the request's "embedding" span."""
+
+    def __init__(self):
+        super().__init__()
+        self._model = MiniLM()
+
+    def __call__(self, input):
+        with span("embedding"):
+            return self._model(input)
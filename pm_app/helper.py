@@ -1,6 +1,10 @@
 from .services import get_or_create_collection
+from .instrumentation import span
+from datetime import date
+from django.db import transaction
+from django.db.models import F
 import json
-from .models import Project, Outcome, Benefit, Deliverable, Task
+from .models import Project, Outcome, Benefit, Deliverable, Task, GeneratedDocument
 from .schemas import ProjectFlow
 from pydantic import ValidationError
 
@@ -10,11 +14,12 @@ def find_similar_projects(input_prompt):
 
     project_collection = get_or_create_collection("projects")
 
-    results = project_collection.query(
-    query_texts=[input_prompt],
-    n_results=1,
-    include=["metadatas", "documents"]
-)
+    with span("chroma"):
+        results = project_collection.query(
+            query_texts=[input_prompt],
+            n_results=1,
+            include=["metadatas", "documents"]
+        )
     project_metadata = results['metadatas'][0][0]
 
     outcomes_json_string = project_metadata.get('outcomes_json', '[]')
@@ -33,9 +38,10 @@ def find_similar_teams(input_prompt):
 
     org_collection = get_or_create_collection("organizational_teams")
 
-    results = org_collection.query(
-        query_texts=[input_prompt]
-    )
+    with span("chroma"):
+        results = org_collection.query(
+            query_texts=[input_prompt]
+        )
     
     return results.get('documents', [[]])[0]
 
@@ -106,6 +112,146 @@ def serialize_project_flow(project: Project) -> dict:
     return project_data
 
 
+def save_project_flow(project: Project, flow_data: dict) -> None:
+    """
+    Replaces the project's outcomes/benefits/deliverables/tasks with the given
+    nested flow (the shape returned by the LLM helpers).
+
+    Every level is written with a single bulk insert and carries the
+    denormalized projectID, so project-wide queries never need the join chain.
+    The materialized flow_snapshot is written in the same transaction.
+
+    Args:
+        project (Project): The project that owns the flow.
+        flow_data (dict): A dict with a "title" and nested "outcomes".
+    """
+    flow_data = flow_data or {}
+    with transaction.atomic():
+        project.outcomes.all().delete()
+        project.name = flow_data.get('title') or project.name
+
+        outcome_rows = flow_data.get('outcomes', [])
+        outcomes = Outcome.objects.bulk_create([
+            Outcome(projectID=project, description=o.get('description'))
+            for o in outcome_rows
+        ])
+
+        benefit_rows = [(b, outcome) for o, outcome in zip(outcome_rows, outcomes)
+                        for b in o.get('benefits', [])]
+        benefits = Benefit.objects.bulk_create([
+            Benefit(outcomeID=outcome, projectID=project, description=b.get('description'))
+            for b, outcome in benefit_rows
+        ])
+
+        deliverable_rows = [(d, benefit) for (b, _), benefit in zip(benefit_rows, benefits)
+                            for d in b.get('deliverables', [])]
+        deliverables = Deliverable.objects.bulk_create([
+            Deliverable(benefitID=benefit, projectID=project, description=d.get('description'))
+            for d, benefit in deliverable_rows
+        ])
+
+        tasks = []
+        for (d, _), deliverable in zip(deliverable_rows, deliverables):
+            for t in d.get('tasks', []):
+                start_date = t.get('start_date')
+                end_date = t.get('end_date')
+                tasks.append(Task(
+                    deliverableID=deliverable,
+                    projectID=project,
+                    name=t.get('name'),
+                    responsible_team=t.get('responsible_team') or 'Unassigned',
+                    duration=str(t.get('duration') or '1 day'),
+                    start_date=date.fromisoformat(start_date) if start_date else None,
+                    end_date=date.fromisoformat(end_date) if end_date else None,
+                ))
+        Task.objects.bulk_create(tasks)
+
+        # Build the snapshot from the rows we just inserted instead of reading them back
+        tasks_by_deliverable = {}
+        for task in tasks:
+            tasks_by_deliverable.setdefault(task.deliverableID_id, []).append(task)
+        deliverables_by_benefit = {}
+        for deliverable in deliverables:
+            deliverables_by_benefit.setdefault(deliverable.benefitID_id, []).append(deliverable)
+        benefits_by_outcome = {}
+        for benefit in benefits:
+            benefits_by_outcome.setdefault(benefit.outcomeID_id, []).append(benefit)
+
+        _write_flow_snapshot(project, _serialize_flow_tree(
+            project, outcomes,
+            benefits=lambda o: benefits_by_outcome.get(o.id, []),
+            deliverables=lambda b: deliverables_by_benefit.get(b.id, []),
+            tasks=lambda d: tasks_by_deliverable.get(d.id, []),
+        ))
+
+
+def refresh_flow_snapshot(project: Project) -> dict:
+    """
+    Rebuilds the project's flow_snapshot from the relational rows and bumps
+    flow_version. Call this after editing individual rows in place.
+
+    Returns:
+        dict: The fresh snapshot (same shape as serialize_project_flow).
+    """
+    with transaction.atomic():
+        fresh = Project.objects.prefetch_related(
+            'outcomes__benefits__deliverables__tasks'
+        ).get(pk=project.pk)
+        snapshot = serialize_project_flow(fresh)
+        _write_flow_snapshot(project, snapshot)
+    return snapshot
+
+
+def load_project_flow(project: Project) -> dict:
+    """
+    Returns the whole plan tree for a project, reading the materialized
+    flow_snapshot when present and lazily building it otherwise.
+    """
+    if project.flow_snapshot is not None:
+        return project.flow_snapshot
+    return refresh_flow_snapshot(project)
+
+
+def _serialize_flow_tree(project, outcomes, benefits, deliverables, tasks) -> dict:
+    return {
+        'id': str(project.id),
+        'title': project.name,
+        'vision': project.vision,
+        'outcomes': [{
+            'id': str(o.id),
+            'description': o.description,
+            'benefits': [{
+                'id': str(b.id),
+                'description': b.description,
+                'deliverables': [{
+                    'id': str(d.id),
+                    'description': d.description,
+                    'tasks': [{
+                        'id': str(t.id),
+                        'name': t.name,
+                        'responsible_team': t.responsible_team,
+                        'duration': t.duration,
+                    } for t in tasks(d)],
+                } for d in deliverables(b)],
+            } for b in benefits(o)],
+        } for o in outcomes],
+    }
+
+
+def _write_flow_snapshot(project: Project, snapshot: dict) -> None:
+    # Any plan write makes previously generated documents stale
+    GeneratedDocument.objects.filter(projectID=project).delete()
+    # Bump the version in SQL so concurrent writers never reuse a number
+    Project.objects.filter(pk=project.pk).update(
+        name=project.name,
+        vision=project.vision,
+        flow_snapshot=snapshot,
+        flow_version=F('flow_version') + 1,
+    )
+    project.flow_snapshot = snapshot
+    project.flow_version = Project.objects.values_list('flow_version', flat=True).get(pk=project.pk)
+
+
 def validate_and_serialize_sample_project(project_data: dict) -> str:
     """
     Validates a project data dictionary against the ProjectFlow schema
@@ -0,0 +1,155 @@
+"""
+Per-request performance breakdown.
+
+RequestMetricsMiddleware opens a RequestMetrics for every request and counts
+database queries through connection.execute_wrapper. Code on the slow paths
+wraps its work in `span("name")` (chroma, embedding, llm, matplotlib, docx),
+which is a no-op outside a request. At the end of the request one JSONL record
+is appended to settings.REQUEST_METRICS_LOG (same flat style as
+pm_eval/perf.py's api_metrics.jsonl) and, if REQUEST_METRICS_SERVER_TIMING is
+on, the breakdown is sent as a Server-Timing header for the browser devtools.
+With METRICS_ENABLED, request counts, latency and query counts also go to the
+/metrics registry (pm_app/metrics.py).
+
+Spans nest: chroma_ms includes the embedding_ms spent inside the query.
+"""
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import metrics as m
+
+# Always present in the record so the JSONL has stable columns
+SPANS = ("db", "chroma", "embedding", "llm", "matplotlib", "docx")
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+_write_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Span totals and counters for one request; safe to update from worker threads."""
+
+    def __init__(self):
+        self.spans = {name: [0.0, 0] for name in SPANS}  # name -> [seconds, calls]
+        self.counters = {"tokens_in": 0, "tokens_out": 0}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            total = self.spans.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + (value or 0)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - t0)
+
+    def as_record(self, request, response, total_s: float) -> dict:
+        match = getattr(request, "resolver_match", None)
+        rec = {
+            "ts": datetime.utcnow().isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_s * 1000, 3),
+        }
+        for name, (seconds, calls) in self.spans.items():
+            rec[f"{name}_ms"] = round(seconds * 1000, 3)
+            rec["db_queries" if name == "db" else f"{name}_calls"] = calls
+        rec.update(self.counters)
+        return rec
+
+    def server_timing(self, total_s: float) -> str:
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{calls}x"'
+                 for name, (seconds, calls) in self.spans.items() if calls]
+        parts.append(f"total;dur={total_s * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    """Times the block into the current request's breakdown (no-op outside a request)."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - t0)
+
+
+def record_llm_usage(usage):
+    """Adds an OpenAI usage object (or dict) to the current request's token counters."""
+    metrics = _current.get()
+    if metrics is None or usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+    metrics.incr("tokens_in", get("prompt_tokens") or get("input_tokens"))
+    metrics.incr("tokens_out", get("completion_tokens") or get("output_tokens"))
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's request metrics, so worker-thread spans are counted."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _append(path: Path, rec: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _write_lock, path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(rec) + "\n")
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        log = getattr(settings, "REQUEST_METRICS_LOG", None)
+        self.log_path = Path(log) if log else None
+        self.server_timing = getattr(settings, "REQUEST_METRICS_SERVER_TIMING", False)
+        self.export = getattr(settings, "METRICS_ENABLED", True)
+        if not self.log_path and not self.server_timing and not self.export:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        t0 = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - t0
+
+        if self.server_timing:
+            response["Server-Timing"] = metrics.server_timing(total)
+        if self.log_path:
+            _append(self.log_path, metrics.as_record(request, response, total))
+        if self.export:
+            match = getattr(request, "resolver_match", None)
+            view = match.view_name if match else "unmatched"
+            m.HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+            m.HTTP_LATENCY.observe(total, view=view)
+            m.DB_QUERIES.inc(metrics.spans["db"][1], view=view)
+        return response
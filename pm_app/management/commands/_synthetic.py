@@ -0,0 +1,56 @@
+"""
+Shared helpers for the benchmark management commands: synthetic project
+flows of configurable size and a throwaway database to load them into.
+Django skips underscore-prefixed modules, so this is not a command itself.
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.db import connection
+
+
+def synthetic_flow(outcomes=3, benefits=2, deliverables=2, tasks=3, seed=0) -> dict:
+    """Builds a nested flow dict shaped like the LLM output."""
+    start = date(2025, 1, 6) + timedelta(days=seed % 28)
+    flow = {"title": f"Synthetic project {seed}", "outcomes": []}
+    n = 0
+    for o in range(outcomes):
+        outcome = {"description": f"Outcome {o + 1} of project {seed}", "benefits": []}
+        for b in range(benefits):
+            benefit = {"description": f"Benefit {o + 1}.{b + 1}", "deliverables": []}
+            for d in range(deliverables):
+                deliverable = {"description": f"Deliverable {o + 1}.{b + 1}.{d + 1}", "tasks": []}
+                for t in range(tasks):
+                    s = start + timedelta(days=7 * n)
+                    deliverable["tasks"].append({
+                        "name": f"Task {o + 1}.{b + 1}.{d + 1}.{t + 1}",
+                        "responsible_team": ["Engineering", "Product", "Marketing", "Operations"][n % 4],
+                        "duration": 5 + n % 10,
+                        "start_date": s.isoformat(),
+                        "end_date": (s + timedelta(days=5 + n % 10)).isoformat(),
+                    })
+                    n += 1
+                benefit["deliverables"].append(deliverable)
+            outcome["benefits"].append(benefit)
+        flow["outcomes"].append(outcome)
+    return flow
+
+
+@contextmanager
+def isolated_database(path=None):
+    """
+    Runs the block against a freshly migrated test database so benchmarks
+    never touch db.sqlite3. The database is destroyed on exit. SQLite test
+    databases live in memory unless a file path is given; pass one when
+    several connections need to share the database.
+    """
+    old_name = connection.settings_dict["NAME"]
+    old_test_name = connection.settings_dict["TEST"]["NAME"]
+    if path:
+        connection.settings_dict["TEST"]["NAME"] = str(path)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict["TEST"]["NAME"] = old_test_name
@@ -0,0 +1,218 @@
+import http.client
+import io
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import reverse
+
+from pm_app.helper import save_project_flow
+from pm_app.models import Project
+from pm_app.views import flow as flow_views
+from .bench_hot_paths import _git_rev, _stats
+from .serve_prefork import _serve
+from ._synthetic import synthetic_flow, isolated_database
+
+CSRF_TOKEN = 'benchmarkbenchmarkbenchmarkbench'
+
+
+def _request(port, kind, project_id, rng):
+    """One HTTP request to the benchmark server; returns (status, body)."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        if kind == 'read':
+            conn.request('GET', reverse('project_flow', args=[project_id]))
+        else:
+            conn.request('POST', reverse('update_flow_ajax', args=[project_id]),
+                         body=json.dumps({'edited_field': 'vision', 'payload': {'vision': f'Edit {rng.random()}'}}),
+                         headers={'Content-Type': 'application/json', 'X-CSRFToken': CSRF_TOKEN,
+                                  'Cookie': f'csrftoken={CSRF_TOKEN}'})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = ('Serves a file-backed copy of the database with the serve_prefork worker server and runs flow '
+            'page readers and update_flow_ajax writers against it over HTTP (the LLM is simulated with a '
+            'fixed delay); reports throughput, latency, lock errors and database connections opened for '
+            'the active DB_PROFILE, saves JSON and compares against a baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Client processes loading the flow page')
+        parser.add_argument('--writers', type=int, default=4, help='Client processes posting flow edits')
+        parser.add_argument('--server-workers', type=int, default=2, help='serve_prefork worker processes')
+        parser.add_argument('--threads', type=int, default=8, help='Request threads per server worker')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--projects', type=int, default=50)
+        parser.add_argument('--outcomes', type=int, default=3)
+        parser.add_argument('--tasks', type=int, default=3, help='Tasks per deliverable')
+        parser.add_argument('--llm-latency', type=float, default=0.2, help='Seconds each simulated LLM call takes')
+        parser.add_argument('--out', help='Results file (default: benchmarks/db_contention_<git rev>_<profile>.json)')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark measures SQLite locking; the default database is not SQLite')
+        size = {k: opts[k] for k in ('outcomes', 'tasks')}
+
+        def fake_llm(payload):
+            time.sleep(opts['llm_latency'])
+            return synthetic_flow(**size, seed=random.randrange(1000))
+
+        ctx = multiprocessing.get_context('fork')
+        opened = ctx.Value('i', 0)  # database connections opened by the server workers
+
+        def count_connection(sender, connection, **kwargs):
+            with opened.get_lock():
+                opened.value += 1
+
+        with tempfile.TemporaryDirectory() as tmp, isolated_database(Path(tmp) / 'contention.sqlite3'), \
+                override_settings(REQUEST_METRICS_LOG='', ALLOWED_HOSTS=['127.0.0.1']), \
+                mock.patch.object(flow_views, 'update_flow_with_llm', fake_llm), \
+                mock.patch.object(flow_views, 'find_similar_projects', return_value={}), \
+                mock.patch.object(flow_views, 'find_similar_teams', return_value=[]):
+            ids = []
+            for i in range(opts['projects']):
+                project = Project.objects.create(name='bench', vision=f'Vision {i}')
+                save_project_flow(project, synthetic_flow(**size, seed=i))
+                ids.append(project.id)
+            with connection.cursor() as cursor:
+                journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            connections.close_all()
+
+            # The same server the app runs on (serve_prefork), so connection handling
+            # and CONN_MAX_AGE behave as they do in production
+            sock = socket.create_server(('127.0.0.1', 0), backlog=128)
+            port = sock.getsockname()[1]
+            app = WSGIHandler()
+
+            def server():
+                # Failed requests are counted by the clients; keep their tracebacks out of the report
+                sys.stderr = io.StringIO()
+                logging.getLogger('django.server').setLevel(logging.CRITICAL)
+                logging.getLogger('django.request').setLevel(logging.CRITICAL)
+                connection_created.connect(count_connection)
+                _serve(sock, app, '127.0.0.1', port, threads=opts['threads'])
+
+            servers = [ctx.Process(target=server) for _ in range(opts['server_workers'])]
+            for p in servers:
+                p.start()
+            sock.close()
+            queue = ctx.Queue()
+
+            def client(kind, seed):
+                rng = random.Random(seed)
+                timings, failed = [], {}
+                try:
+                    while time.monotonic() < deadline:
+                        t0 = time.perf_counter()
+                        status, body = _request(port, kind, rng.choice(ids), rng)
+                        if status == 200:
+                            timings.append(time.perf_counter() - t0)
+                        else:
+                            try:
+                                reason = json.loads(body)['message']
+                            except (ValueError, KeyError):
+                                reason = f'HTTP {status}'
+                            failed[reason] = failed.get(reason, 0) + 1
+                finally:
+                    queue.put((kind, timings, failed))
+
+            # Processes rather than threads: with threads the readers would starve the writers of the GIL
+            procs = ([ctx.Process(target=client, args=('read', i)) for i in range(opts['readers'])]
+                     + [ctx.Process(target=client, args=('write', 1000 + i)) for i in range(opts['writers'])])
+            deadline = time.monotonic() + opts['seconds']
+            t0 = time.perf_counter()
+            for p in procs:
+                p.start()
+            results = {'read': [], 'write': []}
+            errors = {'read': {}, 'write': {}}
+            for _ in procs:
+                kind, timings, failed = queue.get()
+                results[kind].extend(timings)
+                for reason, n in failed.items():
+                    errors[kind][reason] = errors[kind].get(reason, 0) + n
+            elapsed = time.perf_counter() - t0
+            for p in procs:
+                p.join()
+            for p in servers:
+                p.terminate()  # SIGTERM: the worker drains and exits
+                p.join()
+
+        profile = {
+            'db_profile': settings.DB_PROFILE,
+            'journal_mode': journal_mode,
+            'conn_max_age': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+            'pragmas': settings.SQLITE_PRAGMAS,
+            'connections_opened': opened.value,
+        }
+        self.stdout.write(f"profile {profile['db_profile']}: journal_mode={journal_mode} "
+                          f"CONN_MAX_AGE={profile['conn_max_age']} pragmas={profile['pragmas'] or 'none'}")
+        self.stdout.write(f"database connections opened: {opened.value}")
+        report_results = {}
+        for kind, timings in results.items():
+            s = {'ops': len(timings), 'ops_per_s': round(len(timings) / elapsed, 2),
+                 'errors': sum(errors[kind].values()), 'error_reasons': errors[kind]}
+            if timings:
+                s.update(_stats(timings))
+            report_results[kind] = s
+            self.stdout.write(f"{kind:>6}: {s['ops_per_s']:8.2f}/s ok={s['ops']} errors={s['errors']}"
+                              + (f" median={s['median_ms']:.1f}ms p95={s['p95_ms']:.1f}ms" if timings else ''))
+            for reason, n in errors[kind].items():
+                self.stdout.write(self.style.WARNING(f"{'':>8}{n} x {reason}"))
+
+        params = {k: opts[k] for k in ('readers', 'writers', 'server_workers', 'threads', 'seconds', 'projects',
+                                       'outcomes', 'tasks', 'llm_latency')}
+        rev = _git_rev()
+        report = {
+            'meta': {
+                'git_rev': rev,
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'params': params,
+                'profile': profile,
+            },
+            'results': report_results,
+        }
+        out = Path(opts['out'] or Path(settings.BASE_DIR) / 'benchmarks'
+                   / f"db_contention_{rev}_{profile['db_profile']}.json")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        self.stdout.write(f"Saved {out}")
+
+        if opts['baseline']:
+            base = json.loads(Path(opts['baseline']).read_text(encoding='utf-8'))
+            if base.get('meta', {}).get('params') != params:
+                self.stdout.write(self.style.WARNING('Baseline was run with different parameters; deltas are indicative only'))
+            base_profile = base.get('meta', {}).get('profile', {}).get('db_profile', '?')
+            self.stdout.write(f"\nAgainst baseline {base.get('meta', {}).get('git_rev', '?')} ({base_profile}):")
+            for kind, cur in report_results.items():
+                b = base['results'][kind]
+                line = f"{kind:>6}: {b['ops_per_s']:.2f}/s -> {cur['ops_per_s']:.2f}/s"
+                if b['ops_per_s']:
+                    line += f" ({cur['ops_per_s'] / b['ops_per_s'] - 1:+.1%})"
+                if 'p95_ms' in b and 'p95_ms' in cur:
+                    line += f", p95 {b['p95_ms']:.1f}ms -> {cur['p95_ms']:.1f}ms"
+                self.stdout.write(line + f", errors {b['errors']} -> {cur['errors']}")
+            base_opened = base.get('meta', {}).get('profile', {}).get('connections_opened')
+            if base_opened is not None:
+                self.stdout.write(f"connections opened: {base_opened} -> {opened.value}")
+
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from docx import Document
+from docx.shared import Pt
+
+from pm_app.documents_helper import _docx_add_table, docx_bytes
+
+
+def _legacy_add_table(doc, rows, header=True):
+    """The previous per-cell writer (add_row + add_run + font per cell), kept for comparison."""
+    cols = max(len(r) for r in rows)
+    table = doc.add_table(rows=1 if header else 0, cols=cols)
+    if header:
+        hdr = table.rows[0].cells
+        for i, val in enumerate(rows[0]):
+            run = hdr[i].paragraphs[0].add_run(str(val))
+            run.font.name = "Calibri"
+            run.font.size = Pt(10)
+            run.bold = True
+        data = rows[1:]
+    else:
+        data = rows
+    for r in data:
+        cells = table.add_row().cells
+        for i, val in enumerate(r):
+            run = cells[i].paragraphs[0].add_run("" if val is None else str(val))
+            run.font.name = "Calibri"
+            run.font.size = Pt(10)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the bulk DOCX table writer against the legacy per-cell writer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000])
+        parser.add_argument('--cols', type=int, default=4)
+        parser.add_argument('--legacy-max', type=int, default=10_000,
+                            help='Skip the legacy writer above this many rows')
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'rows':>7} {'writer':>7} {'build_s':>9} {'save_s':>8} {'bytes':>9}")
+        for n in opts['sizes']:
+            rows = [[f"col_{c}" for c in range(opts['cols'])]] + [
+                [f"Month {i}", f"£{i * 1250:,}", "Operations", f"Item {i} notes"][:opts['cols']]
+                for i in range(n)
+            ]
+            writers = [('bulk', _docx_add_table)]
+            if n <= opts['legacy_max']:
+                writers.insert(0, ('legacy', _legacy_add_table))
+            for name, writer in writers:
+                doc = Document()
+                t0 = time.perf_counter()
+                writer(doc, rows, header=True)
+                t1 = time.perf_counter()
+                size = len(docx_bytes(doc))
+                t2 = time.perf_counter()
+                self.stdout.write(f"{n:>7} {name:>7} {t1 - t0:>9.3f} {t2 - t1:>8.3f} {size:>9}")
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from pm_app.helper import save_project_flow
+from pm_app.models import Project, Benefit, Deliverable, Task
+from ._synthetic import synthetic_flow, isolated_database
+
+
+class Command(BaseCommand):
+    help = 'Compares query plans and timings of the join-chain vs denormalized projectID lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=10_000)
+        parser.add_argument('--samples', type=int, default=500, help='Projects queried per variant')
+        parser.add_argument('--outcomes', type=int, default=2)
+        parser.add_argument('--tasks', type=int, default=2, help='Tasks per deliverable')
+
+    def handle(self, *args, **opts):
+        with isolated_database():
+            self._populate(opts)
+            ids = list(Project.objects.values_list('id', flat=True))
+            sample = random.Random(0).sample(ids, min(opts['samples'], len(ids)))
+
+            variants = [
+                ('tasks', lambda p: Task.objects.filter(deliverableID__benefitID__outcomeID__projectID=p),
+                          lambda p: Task.objects.filter(projectID=p)),
+                ('deliverables', lambda p: Deliverable.objects.filter(benefitID__outcomeID__projectID=p),
+                                 lambda p: Deliverable.objects.filter(projectID=p)),
+                ('benefits', lambda p: Benefit.objects.filter(outcomeID__projectID=p),
+                             lambda p: Benefit.objects.filter(projectID=p)),
+            ]
+            for label, joined, flat in variants:
+                self.stdout.write(self.style.SUCCESS(f"--- {label} ---"))
+                for name, build in (('join chain', joined), ('projectID', flat)):
+                    self.stdout.write(f"{name} plan:")
+                    for row in self._plan(build(sample[0])):
+                        self.stdout.write(f"    {row}")
+                    timings = self._time(build, sample)
+                    self.stdout.write(
+                        f"{name}: mean={statistics.fmean(timings) * 1000:.3f}ms "
+                        f"p95={sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000:.3f}ms "
+                        f"(n={len(timings)})"
+                    )
+
+    def _populate(self, opts):
+        self.stdout.write(f"Creating {opts['projects']} synthetic projects...")
+        t0 = time.perf_counter()
+        for i in range(opts['projects']):
+            project = Project.objects.create(name='bench', vision='bench')
+            save_project_flow(project, synthetic_flow(outcomes=opts['outcomes'], tasks=opts['tasks'], seed=i))
+        self.stdout.write(
+            f"Loaded {Task.objects.count()} tasks in {time.perf_counter() - t0:.1f}s"
+        )
+
+    @staticmethod
+    def _plan(qs):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [r[-1] for r in cursor.fetchall()]
+
+    @staticmethod
+    def _time(build, sample):
+        timings = []
+        for pid in sample:
+            t0 = time.perf_counter()
+            list(build(pid))
+            timings.append(time.perf_counter() - t0)
+        return timings
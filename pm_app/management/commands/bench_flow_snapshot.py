@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from pm_app.helper import save_project_flow, serialize_project_flow
+from pm_app.models import Project
+from ._synthetic import synthetic_flow, isolated_database
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks whole-plan reads: relational prefetch + serialize vs the flow_snapshot row'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--outcomes', type=int, default=5)
+        parser.add_argument('--tasks', type=int, default=3, help='Tasks per deliverable')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        with isolated_database():
+            for i in range(opts['projects']):
+                project = Project.objects.create(name='bench', vision='bench')
+                save_project_flow(project, synthetic_flow(outcomes=opts['outcomes'], tasks=opts['tasks'], seed=i))
+            ids = list(Project.objects.values_list('id', flat=True))
+
+            def relational(pid):
+                p = Project.objects.prefetch_related('outcomes__benefits__deliverables__tasks').get(pk=pid)
+                return serialize_project_flow(p)
+
+            def snapshot(pid):
+                return Project.objects.only('flow_snapshot').get(pk=pid).flow_snapshot
+
+            assert relational(ids[0]) == snapshot(ids[0]), "snapshot and relational read disagree"
+
+            for label, read in (('relational', relational), ('snapshot', snapshot)):
+                with CaptureQueriesContext(connection) as ctx:
+                    read(ids[0])
+                n_queries = len(ctx.captured_queries)
+                timings = []
+                for _ in range(opts['repeat']):
+                    for pid in ids:
+                        t0 = time.perf_counter()
+                        read(pid)
+                        timings.append(time.perf_counter() - t0)
+                self.stdout.write(
+                    f"{label:>10}: queries/read={n_queries} "
+                    f"mean={statistics.fmean(timings) * 1000:.3f}ms "
+                    f"p95={sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000:.3f}ms "
+                    f"(n={len(timings)})"
+                )
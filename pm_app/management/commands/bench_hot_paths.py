@@ -0,0 +1,156 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from docx import Document
+
+from pm_app.documents_helper import (
+    _docx_add_table, _normalize_stages_for_doc, build_project_facts, normalize_comm_obj,
+)
+from pm_app.helper import save_project_flow, serialize_project_flow, validate_and_serialize_sample_project
+from pm_app.models import Project
+from pm_app.views.gantt import _gantt_rows, _render_gantt_png, _render_gantt_svg
+from ._synthetic import synthetic_flow, isolated_database
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _stats(timings: list) -> dict:
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        'n': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'median_ms': round(statistics.median(ms), 3),
+        'p95_ms': round(ms[int(0.95 * (len(ms) - 1))], 3),
+        'min_ms': round(ms[0], 3),
+        'stdev_ms': round(statistics.stdev(ms), 3) if len(ms) > 1 else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Times the Python-side hot paths (flow persistence, serialization, Gantt, DOCX tables, '
+            'document normalizers) on synthetic plans, saves JSON and compares against a baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--outcomes', type=int, default=5)
+        parser.add_argument('--benefits', type=int, default=2)
+        parser.add_argument('--deliverables', type=int, default=2)
+        parser.add_argument('--tasks', type=int, default=3, help='Tasks per deliverable')
+        parser.add_argument('--rows', type=int, default=500, help='Rows for the DOCX table case')
+        parser.add_argument('--stakeholders', type=int, default=50)
+        parser.add_argument('--stages', type=int, default=12)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='+', help='Run only these cases')
+        parser.add_argument('--out', help='Results file (default: benchmarks/hot_paths_<git rev>.json)')
+        parser.add_argument('--baseline', help='Earlier results file to compare medians against')
+        parser.add_argument('--threshold', type=float, default=0.15,
+                            help='Relative median slowdown flagged as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **opts):
+        size = {k: opts[k] for k in ('outcomes', 'benefits', 'deliverables', 'tasks')}
+        flow = synthetic_flow(**size)
+
+        with isolated_database():
+            project = Project.objects.create(name='bench', vision='Deliver the programme for £250,000 in 2026')
+            save_project_flow(project, flow)
+            facts = build_project_facts(project)
+            gantt_rows = _gantt_rows(facts.tasks)
+            table_rows = [['Name', 'Role', 'Frequency', 'Goal']] + [
+                [f'Stakeholder {i}', 'Role', 'Weekly', f'Goal {i} ' * 5] for i in range(opts['rows'])]
+            comm = {'Objective': 'Keep everyone aligned', 'Channels': ['Email'], 'Stakeholders': [
+                {'Stakeholder': f'Person {i}', 'Role': 'Lead', 'Priority': 'h', 'Purpose': 'Updates'}
+                for i in range(opts['stakeholders'])]}
+            stages = [{'name': f'Stage {i}', 'start_date': f'2026-{i % 12 + 1:02d}-01',
+                       'end_date': f'28/{i % 12 + 1:02d}/2026', 'objectives': ['Plan', '', 'Deliver']}
+                      for i in range(opts['stages'])]
+
+            # name -> (setup or None, fn); setup output is passed to fn and not timed
+            cases = {
+                'save_project_flow': (None, lambda _: save_project_flow(project, flow)),
+                'serialize_project_flow': (None, lambda _: serialize_project_flow(
+                    Project.objects.prefetch_related('outcomes__benefits__deliverables__tasks').get(pk=project.pk))),
+                'validate_and_serialize_sample_project': (
+                    None, lambda _: validate_and_serialize_sample_project(flow)),
+                'gantt_png': (None, lambda _: _render_gantt_png(gantt_rows)),
+                'gantt_svg': (None, lambda _: _render_gantt_svg(gantt_rows)),
+                'docx_add_table': (Document, lambda doc: _docx_add_table(doc, table_rows)),
+                'normalize_comm_obj': (None, lambda _: normalize_comm_obj(comm, 'bench')),
+                'normalize_stages_for_doc': (None, lambda _: _normalize_stages_for_doc(stages, facts)),
+            }
+            unknown = set(opts['only'] or []) - set(cases)
+            if unknown:
+                raise CommandError(f"Unknown case(s): {', '.join(sorted(unknown))}. Known: {', '.join(cases)}")
+
+            results = {}
+            for name, (setup, fn) in cases.items():
+                if opts['only'] and name not in opts['only']:
+                    continue
+                timings = []
+                for i in range(opts['warmup'] + opts['repeat']):
+                    arg = setup() if setup else None
+                    t0 = time.perf_counter()
+                    fn(arg)
+                    if i >= opts['warmup']:
+                        timings.append(time.perf_counter() - t0)
+                results[name] = _stats(timings)
+                s = results[name]
+                self.stdout.write(f"{name:>38}: median={s['median_ms']:9.3f}ms "
+                                  f"p95={s['p95_ms']:9.3f}ms min={s['min_ms']:9.3f}ms (n={s['n']})")
+
+        params = {**size, **{k: opts[k] for k in ('rows', 'stakeholders', 'stages', 'repeat', 'warmup')}}
+        rev = _git_rev()
+        report = {
+            'meta': {
+                'git_rev': rev,
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'params': params,
+            },
+            'results': results,
+        }
+        out = Path(opts['out'] or Path(settings.BASE_DIR) / 'benchmarks' / f'hot_paths_{rev}.json')
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        self.stdout.write(f"Saved {out}")
+
+        if opts['baseline']:
+            regressions = self._compare(report, json.loads(Path(opts['baseline']).read_text(encoding='utf-8')),
+                                        opts['threshold'])
+            if regressions and opts['fail_on_regression']:
+                raise CommandError(f"Regression in: {', '.join(regressions)}")
+
+    def _compare(self, report: dict, baseline: dict, threshold: float) -> list:
+        """Prints median deltas against the baseline and returns the regressed case names."""
+        if baseline.get('meta', {}).get('params') != report['meta']['params']:
+            self.stdout.write(self.style.WARNING('Baseline was run with different parameters; deltas are indicative only'))
+        self.stdout.write(f"\nAgainst baseline {baseline.get('meta', {}).get('git_rev', '?')} "
+                          f"(threshold +{threshold:.0%}):")
+        regressions = []
+        for name, cur in report['results'].items():
+            base = baseline.get('results', {}).get(name)
+            if not base:
+                self.stdout.write(f"{name:>38}: new case")
+                continue
+            delta = cur['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+            line = f"{name:>38}: {base['median_ms']:9.3f}ms -> {cur['median_ms']:9.3f}ms ({delta:+.1%})"
+            if delta > threshold:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            else:
+                self.stdout.write(line)
+        return regressions
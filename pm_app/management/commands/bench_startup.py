@@ -0,0 +1,107 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench_hot_paths import _git_rev
+
+HEAVY_MODULES = ('openai', 'chromadb', 'onnxruntime', 'matplotlib', 'docx', 'pandas', 'plotly', 'numpy')
+
+# Runs in a fresh interpreter: what a worker does before it can serve its first request
+CHILD = f"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns  # imports the URLconf and every view module
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+print(json.dumps({{"startup_ms": elapsed * 1000, "max_rss_mb": rss_kb / 1024,
+                  "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _importtime(stderr: str) -> dict:
+    """Cumulative microseconds per module from -X importtime output."""
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        out[name.strip()] = int(cumulative)
+    return out
+
+
+class Command(BaseCommand):
+    help = ('Measures worker startup: time to import Django and the URLconf, peak RSS and which heavy '
+            'libraries got imported, in fresh interpreters with -X importtime; saves JSON and compares '
+            'against a baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to start')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--out', help='Results file (default: benchmarks/startup_<git rev>.json)')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+
+    def handle(self, *args, **opts):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'pm_tool.settings'),
+               'PYTHONPATH': os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get('PYTHONPATH')]))}
+        runs, imports = [], {}
+        for _ in range(opts['repeat']):
+            proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], cwd=settings.BASE_DIR,
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise CommandError(f"Startup failed:\n{proc.stderr[-2000:]}")
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            for name, us in _importtime(proc.stderr).items():
+                imports.setdefault(name, []).append(us)
+
+        results = {
+            'startup_ms': round(statistics.median(r['startup_ms'] for r in runs), 1),
+            'max_rss_mb': round(statistics.median(r['max_rss_mb'] for r in runs), 1),
+            'heavy_modules': runs[-1]['heavy'],
+            # modules by median cumulative import time (children included)
+            'slowest_imports_ms': dict(sorted(
+                ((name, round(statistics.median(us) / 1000, 1)) for name, us in imports.items()),
+                key=lambda kv: -kv[1])[:opts['top']]),
+        }
+        self.stdout.write(f"startup: median {results['startup_ms']} ms, peak RSS {results['max_rss_mb']} MB "
+                          f"(n={len(runs)})")
+        self.stdout.write(f"heavy modules imported: {', '.join(results['heavy_modules']) or 'none'}")
+        for name, ms in results['slowest_imports_ms'].items():
+            self.stdout.write(f"{name:>50}: {ms:8.1f} ms")
+
+        rev = _git_rev()
+        report = {
+            'meta': {
+                'git_rev': rev,
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'params': {'repeat': opts['repeat']},
+            },
+            'results': results,
+        }
+        out = Path(opts['out'] or Path(settings.BASE_DIR) / 'benchmarks' / f'startup_{rev}.json')
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        self.stdout.write(f"Saved {out}")
+
+        if opts['baseline']:
+            base = json.loads(Path(opts['baseline']).read_text(encoding='utf-8'))
+            self.stdout.write(f"\nAgainst baseline {base.get('meta', {}).get('git_rev', '?')}:")
+            for key, unit in (('startup_ms', 'ms'), ('max_rss_mb', 'MB')):
+                b, c = base['results'][key], results[key]
+                self.stdout.write(f"{key:>12}: {b}{unit} -> {c}{unit} ({c / b - 1:+.1%})" if b else f"{key}: {c}{unit}")
+            self.stdout.write(f"heavy modules: {', '.join(base['results']['heavy_modules']) or 'none'} -> "
+                              f"{', '.join(results['heavy_modules']) or 'none'}")
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from docx import Document
+
+from pm_app.documents_helper import _ensure_table_style
+from pm_app.docx_render import template_path
+
+# (style, text) per paragraph; "{{ name }}" marks a placeholder
+SKELETONS = {
+    "comm_plan": [
+        ("Heading 1", "Communication Plan – {{ project_name }}"),
+        ("Heading 2", "Summary"),
+        (None, "{{ objective }}"),
+        ("Heading 2", "Stakeholders"),
+        (None, "{{ stakeholders }}"),
+        ("Heading 2", "Channels"),
+        (None, "{{ channels }}"),
+    ],
+    "financial_plan": [
+        ("Heading 1", "Financial Plan – {{ project_name }}"),
+        ("Heading 2", "Summary"),
+        (None, "{{ summary }}"),
+        ("Heading 2", "Stages"),
+        (None, "{{ stages }}"),
+        ("Heading 2", "Schedule"),
+        (None, "{{ gantt }}"),
+        ("Heading 2", "Expenses"),
+        (None, "{{ expenses }}"),
+        ("Heading 2", "Cashflow – Monthly Phasing"),
+        (None, "{{ cashflow }}"),
+        ("Heading 2", "Tolerance"),
+        (None, "{{ tolerance }}"),
+        ("Heading 2", "Governance"),
+        (None, "{{ governance }}"),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = 'Writes the default .docx skeletons used to render the plan documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Overwrite existing skeletons')
+
+    def handle(self, *args, **opts):
+        for name, paragraphs in SKELETONS.items():
+            path = template_path(name)
+            if path.exists() and not opts['force']:
+                self.stdout.write(self.style.WARNING(f"Skipping {path} (exists, use --force)"))
+                continue
+            doc = Document()
+            _ensure_table_style(doc)
+            for style, text in paragraphs:
+                doc.add_paragraph(text, style=style)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            doc.save(str(path))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
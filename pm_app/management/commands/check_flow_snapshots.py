@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from pm_app.helper import serialize_project_flow, refresh_flow_snapshot
+from pm_app.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Checks every Project.flow_snapshot against its relational rows (and optionally rebuilds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild missing or stale snapshots')
+
+    def handle(self, *args, **opts):
+        projects = Project.objects.prefetch_related('outcomes__benefits__deliverables__tasks')
+        checked = missing = stale = 0
+
+        for project in projects.iterator(chunk_size=200):
+            checked += 1
+            expected = serialize_project_flow(project)
+            if project.flow_snapshot is None:
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"Project {project.id}: no snapshot"))
+            elif project.flow_snapshot != expected:
+                stale += 1
+                self.stdout.write(self.style.ERROR(
+                    f"Project {project.id}: snapshot v{project.flow_version} differs from relational rows"
+                ))
+            else:
+                continue
+            if opts['fix']:
+                refresh_flow_snapshot(project)
+
+        summary = f"Checked {checked} projects: {missing} missing, {stale} stale."
+        if opts['fix'] and (missing or stale):
+            summary += f" Rebuilt {missing + stale}."
+        style = self.style.SUCCESS if not (missing or stale) else self.style.WARNING
+        self.stdout.write(style(summary))
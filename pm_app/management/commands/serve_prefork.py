@@ -0,0 +1,226 @@
+import gc
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ServerHandler, ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from pm_app import metrics, warmup
+
+
+class _CloseServerHandler(ServerHandler):
+    def cleanup_headers(self):
+        super().cleanup_headers()
+        self.headers["Connection"] = "close"
+        self.request_handler.close_connection = True
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """
+    One request per connection, like gunicorn's sync workers: the worker sits
+    behind a proxy, and a stopping worker must not wait on idle keep-alive
+    connections.
+    """
+
+    def handle_one_request(self):
+        # As Django's, with a ServerHandler that always sends "Connection: close"
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+        handler = _CloseServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ())
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+class WorkerServer(ThreadedWSGIServer):
+    """
+    Django's threaded server with two changes for the prefork workers:
+
+    - Requests run on a fixed pool of threads instead of a new thread each,
+      and connections are not closed after every request. Each pool thread
+      keeps its database connection until Django's request_finished handler
+      finds it older than CONN_MAX_AGE, so persistent connections (and the
+      per-connection pragmas of DB_PROFILE=production) take effect.
+    - Requests in flight are counted, so a stopping worker can wait for them
+      before os._exit() instead of cutting their responses off.
+    """
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='request')
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            self._active += 1
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        request.setblocking(True)  # the listening socket is non-blocking, see _serve()
+        return request, client_address
+
+    def _close_connections(self):
+        # request_finished (close_old_connections) already closed what CONN_MAX_AGE says to
+        pass
+
+    def drain(self, timeout) -> bool:
+        """Waits up to `timeout` seconds for requests in flight; False if some are still running."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+
+def _serve(sock, app, host, port, graceful_timeout=30, threads=8):
+    """
+    A worker: serves the inherited listening socket until SIGTERM, then stops
+    accepting, lets requests in flight finish (up to graceful_timeout seconds)
+    and exits.
+    """
+    server = WorkerServer((host, port), WorkerRequestHandler, bind_and_activate=False, threads=threads)
+    server.socket.close()
+    server.socket = sock
+    # Every worker is woken for each connection and only one gets it; the others
+    # must not block in accept(), where they would miss a shutdown()
+    sock.setblocking(False)
+    server.server_address = sock.getsockname()
+    server.server_name, server.server_port = socket.getfqdn(host), port
+    server.setup_environ()
+    server.set_app(app)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it can't run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent forwards Ctrl-C as SIGTERM
+    code = 0
+    try:
+        server.serve_forever()
+        if not server.drain(graceful_timeout):
+            code = 1
+    except Exception:
+        code = 1
+    finally:
+        from pm_app import telemetry
+        telemetry.sink.flush()
+        os._exit(code)
+
+
+class Command(BaseCommand):
+    help = ('Serves the app from N forked worker processes that share one warmed-up parent: the embedding '
+            'model, Matplotlib and the .docx templates are loaded once before forking (see pm_app/warmup.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000', help='host:port to listen on')
+        parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1))
+        parser.add_argument('--no-warmup', action='store_true', help='Fork straight away; features load on first use')
+        parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+        parser.add_argument('--graceful-timeout', type=float, default=30,
+                            help='Seconds a stopping worker waits for requests in flight')
+
+    def handle(self, *args, **opts):
+        host, _, port = opts['bind'].rpartition(':')
+        if not host or not port.isdigit():
+            raise CommandError(f"--bind must be host:port, got {opts['bind']!r}")
+        port = int(port)
+
+        # Before anything loads: state that must be fork-safe
+        settings.EMBEDDING_THREADS = 1
+        os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+        if settings.METRICS_ENABLED and not metrics.REGISTRY.multiproc_dir:
+            # Each worker writes its own file; /metrics in any worker sums them all
+            metrics.REGISTRY.multiproc_dir = tempfile.mkdtemp(prefix='pm_metrics_')
+
+        app = get_wsgi_application()
+        if opts['no_warmup']:
+            warmup.run({})  # nothing to load up front; /ready still reports the workers as ready
+        else:
+            for name, step in warmup.run()['steps'].items():
+                status = 'ok' if step['ok'] else self.style.WARNING(f"failed ({step['error']})")
+                self.stdout.write(f"warm-up {name}: {status} in {step['seconds']}s")
+
+        # Nothing the workers can't share: no open DB connections, and the warmed
+        # objects moved out of the collector's reach so they stay copy-on-write
+        connections.close_all()
+        gc.collect()
+        gc.freeze()
+
+        sock = socket.create_server((host, port), backlog=128)
+        sock.set_inheritable(True)
+        self.stdout.write(f"Listening on http://{host}:{port}/ with {opts['workers']} workers (parent pid {os.getpid()})")
+        self.stdout.flush()
+
+        workers = {}
+
+        def spawn():
+            pid = os.fork()
+            if pid == 0:
+                _serve(sock, app, host, port, opts['graceful_timeout'], opts['threads'])
+            workers[pid] = time.monotonic()
+
+        for _ in range(opts['workers']):
+            spawn()
+
+        stopping = False
+
+        def stop(signum, frame):
+            # Workers finish their requests and exit; waitpid() below then returns
+            nonlocal stopping
+            stopping = True
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        try:
+            while not stopping:
+                try:
+                    pid, status = os.waitpid(-1, 0)
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                if pid not in workers:
+                    continue
+                started = workers.pop(pid)
+                if not stopping:
+                    self.stderr.write(f"Worker {pid} exited (status {status}) after "
+                                      f"{time.monotonic() - started:.0f}s; starting a new one")
+                    if time.monotonic() - started < 1:
+                        time.sleep(1)  # don't spin if workers die on start
+                    spawn()
+        finally:
+            for pid in list(workers):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            sock.close()
+            self.stdout.write("Stopped")
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from docx import Document
+
+from pm_app.documents_helper import docx_response, _docx_add_table
+
+
+def _tempdir_usage():
+    """(entries, bytes) currently in the system temp directory."""
+    entries = size = 0
+    with os.scandir(tempfile.gettempdir()) as it:
+        for e in it:
+            entries += 1
+            try:
+                if e.is_file(follow_symlinks=False):
+                    size += e.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return entries, size
+
+
+def _open_fd_count():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class Command(BaseCommand):
+    help = 'Renders and streams DOCX downloads in a loop and checks temp-dir usage stays flat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=10_000, help='Number of downloads')
+        parser.add_argument('--rows', type=int, default=40,
+                            help='Table rows per document (large values spill the buffer to disk)')
+        parser.add_argument('--every', type=int, default=1000, help='Report interval')
+
+    def handle(self, *args, **opts):
+        rows = [["month", "planned_outflow"]] + [[f"Month {i}", f"£{i * 1000:,}"] for i in range(opts['rows'])]
+        entries0, bytes0 = _tempdir_usage()
+        fds0 = _open_fd_count()
+        self.stdout.write(f"start: tmp entries={entries0} bytes={bytes0} fds={fds0}")
+
+        t0 = time.perf_counter()
+        for i in range(1, opts['n'] + 1):
+            doc = Document()
+            doc.add_heading("Soak test", level=1)
+            _docx_add_table(doc, rows, header=True)
+            resp = docx_response(doc, f"soak_{i}.docx")
+            body = b"".join(resp.streaming_content)
+            resp.close()
+            if not body.startswith(b"PK"):
+                raise CommandError(f"Download {i} is not a DOCX/ZIP payload")
+            if i % opts['every'] == 0:
+                entries, size = _tempdir_usage()
+                self.stdout.write(
+                    f"{i:>6}: tmp entries={entries} bytes={size} fds={_open_fd_count()} "
+                    f"({i / (time.perf_counter() - t0):.1f} downloads/s)"
+                )
+
+        entries1, bytes1 = _tempdir_usage()
+        fds1 = _open_fd_count()
+        self.stdout.write(f"end:   tmp entries={entries1} bytes={bytes1} fds={fds1}")
+        if entries1 > entries0 or fds1 > fds0:
+            raise CommandError("Temp files or file descriptors leaked during the soak run")
+        self.stdout.write(self.style.SUCCESS(f"{opts['n']} downloads, temp usage flat."))
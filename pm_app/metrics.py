@@ -0,0 +1,271 @@
+"""
+In-process metrics (counters, gauges, fixed-bucket histograms) exposed in the
+Prometheus text format at /metrics.
+
+By default values live in a dict in this process. With several worker
+processes, set METRICS_MULTIPROC_DIR to a directory shared by all of them
+(empty it on each deploy): every process then keeps its values in its own
+mmap'd file there, <kind>_<pid>.db, and /metrics sums them across files.
+Counters and histograms from exited workers keep counting; gauges only
+include live processes.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INITIAL_FILE_SIZE = 64 * 1024
+
+
+# ---- storage ----
+def _read_entries(buf, used):
+    """Yields (key, value, value_offset) for the entries of an mmap'd values file."""
+    pos = 8
+    while pos < used:
+        (klen,) = struct.unpack_from("i", buf, pos)
+        key = bytes(buf[pos + 4:pos + 4 + klen]).decode("utf-8")
+        pos += 4 + klen + (-(4 + klen) % 8)
+        (value,) = struct.unpack_from("d", buf, pos)
+        yield key, value, pos
+        pos += 8
+
+
+class _MmapValues:
+    """
+    Float slots in a growable mmap'd file owned by one process:
+    [uint32 used bytes][pad] then entries [uint32 key length][key, padded to 8][float64].
+    The used counter is bumped after an entry is complete, so readers in other
+    processes never see a half-written one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a+b")
+        if os.path.getsize(path) == 0:
+            self._f.truncate(_INITIAL_FILE_SIZE)
+        self._capacity = os.path.getsize(path)
+        self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._used = struct.unpack_from("i", self._m, 0)[0] or 8
+        self._positions = {key: pos for key, _, pos in _read_entries(self._m, self._used)}
+
+    def _slot(self, key):
+        pos = self._positions.get(key)
+        if pos is not None:
+            return pos
+        encoded = key.encode("utf-8")
+        entry = 4 + len(encoded) + (-(4 + len(encoded)) % 8) + 8
+        while self._used + entry > self._capacity:
+            self._capacity *= 2
+            self._f.truncate(self._capacity)
+            self._m.close()
+            self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        struct.pack_into(f"i{len(encoded)}s", self._m, self._used, len(encoded), encoded)
+        pos = self._used + entry - 8
+        struct.pack_into("d", self._m, pos, 0.0)
+        self._used += entry
+        struct.pack_into("i", self._m, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def add(self, key, amount):
+        pos = self._slot(key)
+        struct.pack_into("d", self._m, pos, struct.unpack_from("d", self._m, pos)[0] + amount)
+
+    def set(self, key, value):
+        struct.pack_into("d", self._m, self._slot(key), value)
+
+
+def read_values_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    used = struct.unpack_from("i", data, 0)[0]
+    return [(k, v) for k, v, _ in _read_entries(data, used)]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self, multiproc_dir=None):
+        self.metrics = {}
+        self.multiproc_dir = multiproc_dir
+        self._lock = threading.Lock()
+        self._values = {}   # in-process mode: key -> float
+        self._files = {}    # multi-process mode: kind -> _MmapValues
+        self._pid = os.getpid()
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def _file(self, kind):
+        if self._pid != os.getpid():
+            # Forked worker: start its own files rather than writing into the parent's
+            self._files, self._pid = {}, os.getpid()
+        f = self._files.get(kind)
+        if f is None:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            f = self._files[kind] = _MmapValues(os.path.join(self.multiproc_dir, f"{kind}_{self._pid}.db"))
+        return f
+
+    def add(self, kind, key, amount):
+        with self._lock:
+            if self.multiproc_dir:
+                self._file(kind).add(key, amount)
+            else:
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, kind, key, value):
+        with self._lock:
+            if self.multiproc_dir:
+                self._file(kind).set(key, value)
+            else:
+                self._values[key] = value
+
+    def collect(self) -> dict:
+        """key -> value, summed across processes in multi-process mode."""
+        if not self.multiproc_dir:
+            with self._lock:
+                return dict(self._values)
+        totals = {}
+        for path in glob.glob(os.path.join(self.multiproc_dir, "*.db")):
+            kind, _, pid = os.path.basename(path)[:-3].rpartition("_")
+            if kind == "gauge" and not _pid_alive(int(pid)):
+                continue
+            for key, value in read_values_file(path):
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> str:
+        """The Prometheus text exposition of every registered metric."""
+        samples = {}
+        for key, value in self.collect().items():
+            name, suffix, labels = json.loads(key)
+            samples.setdefault(name, []).append((suffix, tuple(map(tuple, labels)), value))
+        out = []
+        for name, metric in sorted(self.metrics.items()):
+            out.append(f"# HELP {name} {metric.help}")
+            out.append(f"# TYPE {name} {metric.kind}")
+            out.extend(metric.expose(samples.get(name, [])))
+        return "\n".join(out) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _fmt_value(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+# ---- metric types ----
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _key(self, suffix, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return json.dumps([self.name, suffix, [[k, str(labels[k])] for k in self.labelnames]])
+
+    def expose(self, samples):
+        return [f"{self.name}{_fmt_labels(labels)} {_fmt_value(v)}" for _, labels, v in sorted(samples)]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self.registry.add("counter", self._key("", labels), amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.registry.set("gauge", self._key("", labels), value)
+
+    def inc(self, amount=1, **labels):
+        self.registry.add("gauge", self._key("", labels), amount)
+
+    def dec(self, amount=1, **labels):
+        self.registry.add("gauge", self._key("", labels), -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, value, **labels):
+        i = bisect.bisect_left(self.buckets, value)
+        le = self.buckets[i] if i < len(self.buckets) else float("inf")
+        reg = self.registry
+        reg.add("histogram", self._key(f"bucket:{le}", labels), 1)
+        reg.add("histogram", self._key("sum", labels), value)
+        reg.add("histogram", self._key("count", labels), 1)
+
+    def expose(self, samples):
+        series = {}
+        for suffix, labels, v in samples:
+            series.setdefault(labels, {})[suffix] = v
+        lines = []
+        for labels, values in sorted(series.items()):
+            running = 0.0
+            for le in self.buckets + (float("inf"),):
+                running += values.get(f"bucket:{le}", 0.0)
+                lines.append(f"{self.name}_bucket{_fmt_labels(labels + (('le', _fmt_value(le)),))} {_fmt_value(running)}")
+            lines.append(f"{self.name}_sum{_fmt_labels(labels)} {_fmt_value(values.get('sum', 0.0))}")
+            lines.append(f"{self.name}_count{_fmt_labels(labels)} {_fmt_value(values.get('count', 0.0))}")
+        return lines
+
+
+REGISTRY = Registry(os.getenv("METRICS_MULTIPROC_DIR") or None)
+
+
+# ---- the app's metrics ----
+HTTP_REQUESTS = Counter("pm_http_requests_total", "HTTP requests by view, method and status.",
+                        ("view", "method", "status"))
+HTTP_LATENCY = Histogram("pm_http_request_duration_seconds", "Time spent in the Django view stack.", ("view",))
+DB_QUERIES = Counter("pm_db_queries_total", "Database queries run while serving requests.", ("view",))
+LLM_REQUESTS = Counter("pm_llm_requests_total", "LLM calls by model, feature and outcome.",
+                       ("model", "feature", "outcome"))
+LLM_LATENCY = Histogram("pm_llm_request_duration_seconds", "LLM call latency.", ("model",))
+LLM_TTFT = Histogram("pm_llm_time_to_first_token_seconds", "LLM time to first streamed token.", ("model",))
+LLM_TOKENS = Counter("pm_llm_tokens_total", "LLM tokens by model and direction (in/out).", ("model", "direction"))
+DOCUMENT_CACHE = Counter("pm_document_cache_requests_total", "Plan document cache lookups (hit/miss).",
+                         ("doc_type", "result"))
+DOCGEN_QUEUED = Gauge("pm_docgen_jobs_queued", "Document LLM jobs waiting for a docgen worker thread.")
+DOCGEN_RUNNING = Gauge("pm_docgen_jobs_running", "Document LLM jobs currently running.")
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm_app', '0002_rename_benefit_deliverable_benefitid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='benefit',
+            name='projectID',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='benefits', to='pm_app.project'),
+        ),
+        migrations.AddField(
+            model_name='deliverable',
+            name='projectID',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='deliverables', to='pm_app.project'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='projectID',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='pm_app.project'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:05
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_project_fk(apps, schema_editor):
+    """Copy the owning project down onto every existing benefit, deliverable and task."""
+    Outcome = apps.get_model('pm_app', 'Outcome')
+    Benefit = apps.get_model('pm_app', 'Benefit')
+    Deliverable = apps.get_model('pm_app', 'Deliverable')
+    Task = apps.get_model('pm_app', 'Task')
+
+    Benefit.objects.filter(projectID__isnull=True).update(projectID=Subquery(
+        Outcome.objects.filter(pk=OuterRef('outcomeID')).values('projectID')[:1]
+    ))
+    Deliverable.objects.filter(projectID__isnull=True).update(projectID=Subquery(
+        Benefit.objects.filter(pk=OuterRef('benefitID')).values('projectID')[:1]
+    ))
+    Task.objects.filter(projectID__isnull=True, deliverableID__isnull=False).update(projectID=Subquery(
+        Deliverable.objects.filter(pk=OuterRef('deliverableID')).values('projectID')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm_app', '0003_denormalize_project_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_project_fk, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm_app', '0004_backfill_project_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='flow_snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='flow_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
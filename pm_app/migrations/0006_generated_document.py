@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm_app', '0005_project_flow_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=50)),
+                ('flow_version', models.PositiveIntegerField()),
+                ('ai_json', models.JSONField(blank=True, null=True)),
+                ('docx', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('projectID', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='pm_app.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='generateddocument',
+            constraint=models.UniqueConstraint(fields=('projectID', 'doc_type', 'flow_version'), name='unique_document_per_version'),
+        ),
+    ]
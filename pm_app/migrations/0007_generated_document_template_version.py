@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm_app', '0006_generated_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generateddocument',
+            name='template_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
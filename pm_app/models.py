@@ -5,6 +5,10 @@ class Project(models.Model):
     name = models.CharField(max_length=255)
     vision = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Materialized copy of the whole plan tree (see helper.save_project_flow),
+    # so whole-plan readers load it in one row fetch. Bumped on every plan write.
+    flow_snapshot = models.JSONField(null=True, blank=True)
+    flow_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -17,19 +21,40 @@ class Outcome(models.Model):
 class Benefit(models.Model):
     """A specific benefit achieved from an outcome. A project can have many benefits."""
     outcomeID = models.ForeignKey(Outcome, related_name='benefits', on_delete=models.CASCADE)
+    # Denormalized copy of outcomeID.projectID so project-wide lookups skip the join.
+    projectID = models.ForeignKey(Project, related_name='benefits', on_delete=models.CASCADE, null=True, blank=True)
     description = models.TextField()
 
 class Deliverable(models.Model):
     """A tangible item produced to realize benefits. A project can have many deliverables."""
     benefitID = models.ForeignKey(Benefit, related_name='deliverables', on_delete=models.CASCADE)
+    # Denormalized copy of benefitID.outcomeID.projectID.
+    projectID = models.ForeignKey(Project, related_name='deliverables', on_delete=models.CASCADE, null=True, blank=True)
     description = models.TextField()
 
 class Task(models.Model):
     """A specific task required to create a deliverable. A deliverable has many tasks."""
     # This links a task to a specific deliverable.
     deliverableID = models.ForeignKey(Deliverable, related_name='tasks', on_delete=models.CASCADE, null=True, blank=True)
+    # Denormalized copy of deliverableID.benefitID.outcomeID.projectID.
+    projectID = models.ForeignKey(Project, related_name='tasks', on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=255)
     responsible_team = models.CharField(max_length=255, default='Unassigned')
     duration = models.CharField(max_length=50, default='1 day')  
     start_date = models.DateField(null=True, blank=True)  
-    end_date = models.DateField(null=True, blank=True)  
\ No newline at end of file
+    end_date = models.DateField(null=True, blank=True)  
+
+class GeneratedDocument(models.Model):
+    """A rendered plan document (AI JSON + DOCX bytes) cached for one version of a project's flow."""
+    projectID = models.ForeignKey(Project, related_name='documents', on_delete=models.CASCADE)
+    doc_type = models.CharField(max_length=50)
+    flow_version = models.PositiveIntegerField()
+    ai_json = models.JSONField(null=True, blank=True)
+    docx = models.BinaryField()
+    template_version = models.CharField(max_length=40, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['projectID', 'doc_type', 'flow_version'], name='unique_document_per_version'),
+        ]
@@ -1,31 +1,78 @@
 import json, re
-import openai
+import threading
 from dotenv import load_dotenv
 from datetime import date
 from .schemas import ProjectFlow
 from pydantic import ValidationError
+from django.conf import settings
+from .telemetry import call_llm
 
 load_dotenv()
-client = openai.Client()
+_client = None
+_client_lock = threading.Lock()
 today = date.today().isoformat()
+FLOW_MODEL = "gpt-4o-2024-08-06"
 
 
 
-def parse_llm_response(response):
-    """A helper to safely extract and parse JSON from the LLM response."""
+def get_client():
+    """The shared OpenAI client, created on first use so importing this module does not load openai."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                _client = openai.Client(base_url=settings.OPENAI_BASE_URL)
+    return _client
+
+
+def parse_llm_response(content):
+    """A helper to safely parse JSON from the LLM response text."""
     try:
-        content = response.choices[0].message.content
         clean_content = content.strip().replace("```json", "").replace("```", "")
         return json.loads(clean_content)
-    except (json.JSONDecodeError, IndexError, KeyError):
+    except (json.JSONDecodeError, AttributeError):
         print("Error: Failed to decode or parse JSON from LLM response.")
         return None
 
 
-def generate_flow_from_vision(vision_text, sample_project, teams_data) -> dict:
+def validate_flow(content):
     """
-    Generates the initial project flow from a user's vision statement.
+    Parses the LLM's reply and validates it against ProjectFlow. Returns the
+    clean dict (`mode='json'` turns dates back into "YYYY-MM-DD" strings), or
+    None if the reply is not a valid flow; telemetry records which it was.
+    """
+    data_dict = parse_llm_response(content)
+    if not data_dict:
+        return None
+    try:
+        return ProjectFlow.model_validate(data_dict).model_dump(mode='json')
+    except ValidationError as e:
+        # If the LLM returns bad data, this will catch it.
+        print("--- Pydantic Validation Error ---")
+        print("The LLM returned data that did not match the required format.")
+        print(e)
+        print("-------------------------------")
+        return None
+
+
+def record_prompt_inputs(kind, inputs):
     """
+    Appends the inputs of one flow prompt to settings.FLOW_PROMPT_CORPUS (if set),
+    so pm_eval/flow_benchmark.py can replay the prompts users actually send.
+    """
+    path = getattr(settings, "FLOW_PROMPT_CORPUS", "")
+    if not path:
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"kind": kind, "inputs": inputs}, default=str) + "\n")
+    except OSError as e:
+        print(f"Could not record prompt inputs: {e}")
+
+
+def generate_flow_messages(vision_text, sample_project, teams_data) -> list:
+    """The chat messages generate_flow_from_vision sends."""
     system_prompt = (
     """
     You are a project management assistant. Your task is to generate a project flow based on the provided vision.
@@ -56,45 +103,30 @@ def generate_flow_from_vision(vision_text, sample_project, teams_data) -> dict:
     #print("sample_project: ", sample_project)
     #print("teams_data: ", teams_data)   
 
-    response = client.chat.completions.create(
-        model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
 
-    data_dict = parse_llm_response(response)
-    if not data_dict:
-        print("Error: Failed to parse LLM response.")
-        return None
-    # 2. Validate the data using your Pydantic model
-    try:
-        # This is the magic step. Pydantic checks everything.
-        validated_flow = ProjectFlow.model_validate(data_dict)
-        
-        # 3. Convert the validated model back to a dictionary
-        # The view can now use this clean, guaranteed-to-be-correct data.
-        # `mode='json'` ensures dates are converted back to "YYYY-MM-DD" strings.
-        return validated_flow.model_dump(mode='json')
 
-    except ValidationError as e:
-        # If the LLM returns bad data, this will catch it.
-        print("--- Pydantic Validation Error ---")
-        print("The LLM returned data that did not match the required format.")
-        print(e)
-        print("-------------------------------")
-        return {} # Return an empty dict so the app doesn't crash
-
-    #print("LLM response: ", parse_llm_response(response))
-    return parse_llm_response(response)
-
-def update_flow_with_llm(payload):
+def generate_flow_from_vision(vision_text, sample_project, teams_data) -> dict:
     """
-    Takes the current project flow and the name of the field the user just edited,
-    and returns a fully reconciled, logically consistent project flow.
+    Generates the initial project flow from a user's vision statement.
     """
+    record_prompt_inputs("generate_flow", {
+        "vision_text": vision_text, "sample_project": sample_project, "teams_data": teams_data,
+    })
+    result = call_llm(
+        get_client(), feature="generate_flow", model=FLOW_MODEL,
+        messages=generate_flow_messages(vision_text, sample_project, teams_data),
+        response_format={"type": "json_object"},
+        validate=validate_flow,
+    )
+    # An empty dict (rather than None) keeps the view from crashing on bad data
+    return result.data or {}
+
+def update_flow_messages(payload) -> list:
+    """The chat messages update_flow_with_llm sends for an edit payload."""
     edited_field = payload['edited_field']
     user_edit = payload['user_edit']
     current_values = payload['current_flow']
@@ -132,22 +164,22 @@ def update_flow_with_llm(payload):
         f"A user has just edited one part of a project plan, and your critical task is to update the rest of the plan to ensure it remains logically coherent. You can add new items, modify existing ones, or remove items as necessary to ensure the entire project plan is logically consistent and coherent.\n\n"
     )
 
-    response = client.chat.completions.create(
-        model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    data_dict = parse_llm_response(response)
-    if not data_dict:
-        return {} 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
 
-    try:
-        validated_flow = ProjectFlow.model_validate(data_dict)
-        return validated_flow.model_dump(mode='json')
-    except ValidationError as e:
-        print(f"--- Pydantic Validation Error in update_flow_with_llm: {e} ---")
-        return {}
\ No newline at end of file
+
+def update_flow_with_llm(payload):
+    """
+    Takes the current project flow and the name of the field the user just edited,
+    and returns a fully reconciled, logically consistent project flow.
+    """
+    record_prompt_inputs("update_flow", payload)
+    result = call_llm(
+        get_client(), feature="update_flow", model=FLOW_MODEL,
+        messages=update_flow_messages(payload),
+        response_format={"type": "json_object"},
+        validate=validate_flow,
+    )
+    return result.data or {}
@@ -1,14 +1,40 @@
-import chromadb 
+import threading
+
 from django.conf import settings
 
-#initialize persistent ChromaDB client
+# The persistent ChromaDB client and the embedding function are created on first
+# use: importing chromadb (and loading its ONNX model) is the slowest part of startup
+
+_client = None
+_embedding_function = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=settings.CHROMA_DB)
+    return _client
+
+
+def get_embedding_function():
+    """The embedding function for our collections (pm_app/embedding.py)."""
+    global _embedding_function
+    if _embedding_function is None:
+        with _lock:
+            if _embedding_function is None:
+                from .embedding import TimedEmbeddingFunction
+                _embedding_function = TimedEmbeddingFunction()
+    return _embedding_function
 
-client = chromadb.PersistentClient(path=settings.CHROMA_DB)
 
 def get_or_create_collection(collection_name: str):
     """
     Get or create a collection in the ChromaDB client.
     This method is idempotent, its safe to call multiple times without creating duplicates.
     """
-    collection = client.get_or_create_collection(name=collection_name)
-    return collection
\ No newline at end of file
+    collection = get_client().get_or_create_collection(name=collection_name, embedding_function=get_embedding_function())
+    return collection
@@ -0,0 +1,345 @@
+"""
+One instrumented entry point for OpenAI chat calls, shared by the app
+(openapi_client, documents_helper) and the evaluation scripts (pm_eval/perf.py).
+
+call_llm() streams the completion so it can measure time to first token,
+collects token usage, prices the call from PRICES_PER_1K_GBP, runs an optional
+validator and writes one record per call to a buffered, rotated JSONL sink.
+The records use the same fields as pm_eval's api_metrics.jsonl (and by
+default the same file), so summarise_metrics.py covers production traffic too.
+Every record carries a unique "id"; iter_records() reads the live file and its
+rotated segments oldest first and drops records seen before.
+
+This module must stay importable without Django settings configured, because
+the eval scripts import it directly.
+"""
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, batches rely on O_APPEND
+    fcntl = None
+
+from . import cassettes, metrics as m
+from .instrumentation import span, record_llm_usage
+
+# From the OpenAI pricing page (Standard, gpt-4o): $2.50 / $10.00 per 1M tokens.
+# At ~0.79 GBP/USD that is £1.98 / £7.90 per 1M, i.e. the per-1K prices below.
+PRICES_PER_1K_GBP = {
+    "gpt-4o": {"input": 0.00198, "output": 0.00790},  # £ per 1K tokens
+    "gpt-4o-2024-08-06": {"input": 0.00198, "output": 0.00790},
+}
+
+
+def estimate_cost_gbp(usage: dict, model: str) -> float:
+    price = PRICES_PER_1K_GBP.get(model)
+    if not price:
+        return 0.0
+    # Prefer prompt/completion; fall back to input/output if present
+    tin  = usage.get("prompt_tokens")     or usage.get("input_tokens")      or 0
+    tout = usage.get("completion_tokens") or usage.get("output_tokens")     or 0
+    return (tin / 1000.0) * price["input"] + (tout / 1000.0) * price["output"]
+
+
+def default_log_dir() -> Path:
+    """Same location pm_eval/perf.py writes to: $EVAL_OUTPUT_DIR or ~/pm_eval_private/logs."""
+    return Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs")))
+
+
+def _segment(path: Path, i: int, compressed: bool) -> Path:
+    return path.with_name(f"{path.name}.{i}.gz" if compressed else f"{path.name}.{i}")
+
+
+def segments(path) -> list:
+    """The live file and its rotated segments (path.N[.gz]), oldest first."""
+    path = Path(path)
+    rotated = []
+    for p in path.parent.glob(f"{path.name}.*"):
+        index = p.name[len(path.name) + 1:].removesuffix(".gz")
+        if index.isdigit():
+            rotated.append((int(index), p))
+    out = [p for _, p in sorted(rotated, reverse=True)]
+    return out + [path] if path.exists() else out
+
+
+def iter_records(path, dedupe=True):
+    """
+    Streams the records of a sink's file across its rotated segments, oldest
+    first. Lines that are not valid JSON (a crash mid-write) are skipped and,
+    with dedupe, so are records whose id was already seen. Only the ids are
+    kept in memory.
+    """
+    seen = set()
+    for seg in segments(path):
+        opener = gzip.open if seg.suffix == ".gz" else open
+        try:
+            f = opener(seg, "rt", encoding="utf-8")
+        except FileNotFoundError:  # rotated away while we were listing
+            continue
+        with f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                rid = rec.get("id") if dedupe else None
+                if rid is not None:
+                    if rid in seen:
+                        continue
+                    seen.add(rid)
+                yield rec
+
+
+class JsonlSink:
+    """
+    Appends JSON records to a file in batches. A batch is written when it
+    reaches flush_every records, at the latest flush_interval seconds after
+    its first record (a daemon thread flushes a quiet sink), and at
+    interpreter exit.
+
+    The file is rotated to path.1 .. path.<backups> (oldest dropped, like
+    RotatingFileHandler) when it passes max_bytes or, with rotate_every, when
+    its segment is older than that many seconds; with compress, rotated
+    segments are gzipped. Batches and rotation happen under an flock on
+    path.lock, so several processes can share one file without interleaving
+    lines. Records already written by this sink (same "id") are not written again.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5, flush_every=20, flush_interval=5.0,
+                 rotate_every=None, compress=False, remember=10000):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.rotate_every = rotate_every
+        self.compress = compress
+        self.remember = remember
+        self._buffer = []
+        self._written = OrderedDict()  # recently written ids, oldest first
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer_pid = None
+        atexit.register(self.flush)
+
+    def write(self, rec: dict):
+        with self._lock:
+            rid = rec.get("id")
+            if rid is not None:
+                if rid in self._written:
+                    return
+                self._written[rid] = None
+                if len(self._written) > self.remember:
+                    self._written.popitem(last=False)
+            self._buffer.append(json.dumps(rec, default=str))
+            due = (len(self._buffer) >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+            # Started on first use, and again in a forked worker, which inherits no threads
+            start_timer = self.flush_interval and self._timer_pid != os.getpid()
+            if start_timer:
+                self._timer_pid = os.getpid()
+        if start_timer:
+            threading.Thread(target=self._flush_periodically, name="jsonl-sink-flush", daemon=True).start()
+        if due:
+            self.flush()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._buffer:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not lines:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            with open(self.path.with_name(self.path.name + ".lock"), "a+") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._maybe_rotate(lock)
+                    # One write() of the whole batch on an O_APPEND descriptor
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, data)
+                    finally:
+                        os.close(fd)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _maybe_rotate(self, lock):
+        """Called with the lock held; the lock file stores when the live segment was started."""
+        lock.seek(0)
+        started = float(lock.read().strip() or 0)
+        now = time.time()
+        if not self.path.exists():
+            due = False
+        elif self.max_bytes and self.path.stat().st_size >= self.max_bytes:
+            due = True
+        else:
+            due = bool(self.rotate_every and started and now - started >= self.rotate_every)
+        if due:
+            self._rotate()
+        if due or not started or not self.path.exists():
+            lock.truncate(0)
+            lock.write(str(now))
+            lock.flush()
+
+    def _rotate(self):
+        if not self.backups:
+            self.path.unlink()
+            return
+        for compressed in (False, True):
+            _segment(self.path, self.backups, compressed).unlink(missing_ok=True)
+        for i in range(self.backups - 1, 0, -1):
+            for compressed in (False, True):
+                src = _segment(self.path, i, compressed)
+                if src.exists():
+                    src.replace(_segment(self.path, i + 1, compressed))
+        if not self.compress:
+            self.path.replace(_segment(self.path, 1, False))
+            return
+        tmp = self.path.with_name(self.path.name + ".rotating")
+        self.path.replace(tmp)
+        with open(tmp, "rb") as src, gzip.open(_segment(self.path, 1, True), "wb") as dst:
+            while chunk := src.read(1024 * 1024):
+                dst.write(chunk)
+        tmp.unlink()
+
+
+sink = JsonlSink(
+    os.getenv("LLM_METRICS_LOG") or default_log_dir() / "api_metrics.jsonl",
+    rotate_every=float(os.getenv("LLM_METRICS_ROTATE_S") or 0) or None,
+    compress=os.getenv("LLM_METRICS_GZIP", "false").lower() == "true",
+)
+
+
+@dataclass
+class LLMResult:
+    text: str
+    data: object   # validator output, or None if there was no validator or it failed
+    record: dict
+
+
+def base_record(*, feature: str, model: str, temperature=None, source="app") -> dict:
+    """The api_metrics.jsonl fields, with the per-call values still empty."""
+    return {
+        "id": uuid.uuid4().hex,
+        "ts": datetime.utcnow().isoformat(),
+        "source": source,
+        "feature": feature,
+        "model": model,
+        "temperature": temperature,
+        "latency_s": None,
+        "ttft_s": None,
+        "tokens_in": None,
+        "tokens_out": None,
+        "est_cost": 0.0,     # in GBP
+        "currency": "GBP",
+        "raw_len": 0,
+        "pricing_model_key": model,
+        "pricing_applied": model in PRICES_PER_1K_GBP,
+        "used_mock": False,
+        "cache_hit": False,
+        "ok": None,
+        "schema_ok": None,
+        "error": None,
+    }
+
+
+def log_record(rec: dict):
+    sink.write(rec)
+
+
+def record_cache_hit(*, feature: str, model: str, source="app"):
+    """Logs a call that was answered from a cache instead of the API."""
+    rec = base_record(feature=feature, model=model, source=source)
+    rec.update(cache_hit=True, latency_s=0.0, ok=True)
+    log_record(rec)
+
+
+def call_llm(client, *, feature: str, model: str, messages: list, temperature=None,
+             response_format=None, validate=None, source="app", log=True) -> LLMResult:
+    """
+    Runs one chat completion and logs it. `validate(text)` may return parsed
+    data or raise; its outcome is recorded as schema_ok. API errors are logged
+    and re-raised. With log=False a successful call's record is returned
+    unlogged, for callers that add fields first and then call log_record().
+    Recorded responses are replayed instead of calling the API when a
+    cassette mode is on (see cassettes.py); replayed records have used_mock set.
+    """
+    rec = base_record(feature=feature, model=model, temperature=temperature, source=source)
+    kwargs = {"model": model, "messages": messages, "stream": True, "stream_options": {"include_usage": True}}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+
+    parts, usage, take = [], None, None
+    t0 = time.perf_counter()
+    try:
+        with span("llm"):
+            take = cassettes.store.lookup(kwargs)
+            if take is not None:
+                text, rec["ttft_s"], usage = cassettes.store.play(take, t0)
+                parts.append(text)
+                rec["used_mock"] = True
+            else:
+                for chunk in client.chat.completions.create(**kwargs):
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if rec["ttft_s"] is None:
+                            rec["ttft_s"] = round(time.perf_counter() - t0, 3)
+                        parts.append(chunk.choices[0].delta.content)
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+    except Exception as e:
+        rec.update(latency_s=round(time.perf_counter() - t0, 3), ok=False, error=type(e).__name__)
+        log_record(rec)
+        m.LLM_REQUESTS.inc(model=model, feature=feature, outcome="error")
+        raise
+    text = "".join(parts)
+    rec["latency_s"] = round(time.perf_counter() - t0, 3)
+    rec["raw_len"] = len(text)
+    if take is None:
+        cassettes.store.record(kwargs, text, usage, rec["ttft_s"], rec["latency_s"])
+
+    if usage is not None:
+        record_llm_usage(usage)
+        u = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        rec.update(tokens_in=u["prompt_tokens"], tokens_out=u["completion_tokens"],
+                   est_cost=round(estimate_cost_gbp(u, model), 6))
+
+    data = None
+    rec["ok"] = bool(text)
+    if validate is not None:
+        try:
+            data = validate(text)
+            rec["schema_ok"] = data is not None
+        except Exception as e:
+            rec["schema_ok"] = False
+            rec["error"] = type(e).__name__
+    if log:
+        log_record(rec)
+
+    m.LLM_REQUESTS.inc(model=model, feature=feature, outcome="invalid" if rec["schema_ok"] is False else "ok")
+    m.LLM_LATENCY.observe(rec["latency_s"], model=model)
+    if rec["ttft_s"] is not None:
+        m.LLM_TTFT.observe(rec["ttft_s"], model=model)
+    m.LLM_TOKENS.inc(rec["tokens_in"] or 0, model=model, direction="in")
+    m.LLM_TOKENS.inc(rec["tokens_out"] or 0, model=model, direction="out")
+    return LLMResult(text=text, data=data, record=rec)
@@ -1,3 +1,443 @@
-from django.test import TestCase
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import cassettes, metrics, openapi_client, telemetry, warmup
+from .db import apply_sqlite_pragmas
+from .documents_helper import build_project_facts
+from .helper import save_project_flow
+from .management.commands.serve_prefork import _serve
+from .models import GeneratedDocument, Project
+
+
+def _flow(size: int) -> dict:
+    """A flow shaped like the LLM output with `size` items at every level."""
+    start = date(2025, 1, 6)
+    return {
+        "title": f"Plan {size}",
+        "outcomes": [{
+            "description": f"Outcome {o}",
+            "benefits": [{
+                "description": f"Benefit {o}.{b}",
+                "deliverables": [{
+                    "description": f"Deliverable {o}.{b}.{d}",
+                    "tasks": [{
+                        "name": f"Task {o}.{b}.{d}.{t}",
+                        "responsible_team": "Delivery",
+                        "duration": "5 days",
+                        "start_date": (start + timedelta(days=7 * t)).isoformat(),
+                        "end_date": (start + timedelta(days=7 * t + 5)).isoformat(),
+                    } for t in range(size)],
+                } for d in range(size)],
+            } for b in range(size)],
+        } for o in range(size)],
+    }
+
+
+def _project(size: int) -> Project:
+    project = Project.objects.create(name="Untitled Project", vision="Budget £250,000 for 2026")
+    save_project_flow(project, _flow(size))
+    return Project.objects.get(pk=project.pk)
+
+
+class ProjectFactsTests(TestCase):
+
+    def test_facts_from_snapshot_and_one_task_query(self):
+        project = _project(2)
+        with self.assertNumQueries(1):
+            facts = build_project_facts(project)
+        self.assertEqual(facts.outcome_count, 2)
+        self.assertEqual(facts.deliverable_count, 8)
+        self.assertEqual(len(facts.tasks), 16)
+        self.assertEqual(facts.schedule_start, date(2025, 1, 6))
+        self.assertEqual(facts.schedule_end, date(2025, 1, 18))
+        self.assertEqual(facts["Total Budget"], "£250,000")
+        self.assertEqual(facts.as_dict()["Objectives"], ["Outcome 0", "Outcome 1"])
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+class DocumentDownloadQueryTests(TestCase):
+
+    def _download(self, size: int):
+        project = _project(size)
+        url = reverse("download_financial_plan_docx", args=[project.pk])
+        # project, cache lookup, tasks, then update_or_create's select + insert
+        # inside its two savepoints
+        with mock.patch("pm_app.views.documents.generate_financial_plan", return_value={}), \
+                self.assertNumQueries(9):
+            response = self.client.get(url)
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+    def test_financial_plan_query_count_does_not_grow_with_plan(self):
+        self._download(1)
+        self._download(3)
+
+    def test_fallback_after_a_failed_llm_call_is_not_cached(self):
+        project = _project(1)
+        url = reverse("download_financial_plan_docx", args=[project.pk])
+        with mock.patch("pm_app.views.documents.generate_financial_plan", side_effect=RuntimeError("429")):
+            response = self.client.get(url)
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(GeneratedDocument.objects.filter(projectID=project).exists())
+
+        # The next download calls the LLM again and caches its result
+        with mock.patch("pm_app.views.documents.generate_financial_plan", return_value={"summary": "ok"}) as llm:
+            b"".join(self.client.get(url).streaming_content)
+        llm.assert_called_once()
+        self.assertEqual(GeneratedDocument.objects.get(projectID=project).ai_json, {"summary": "ok"})
+
+    def test_template_change_rerenders_the_cached_document(self):
+        import docx
+
+        project = _project(1)
+        url = reverse("download_comm_plan_docx", args=[project.pk])
+        original = Path(settings.DOCX_TEMPLATE_DIR) / "comm_plan.docx"
+        with tempfile.TemporaryDirectory() as tmp, override_settings(DOCX_TEMPLATE_DIR=tmp), \
+                mock.patch("pm_app.views.documents.generate_comm_plan", return_value={}) as llm:
+            path = Path(shutil.copy(original, tmp))
+            b"".join(self.client.get(url).streaming_content)
+
+            # Restyle the template as ops would, then download again
+            template = docx.Document(str(path))
+            template.add_paragraph("Revised layout")
+            template.save(str(path))
+            mtime = path.stat().st_mtime_ns + 1_000_000_000
+            os.utime(path, ns=(mtime, mtime))
+            response = self.client.get(url)
+            text = [p.text for p in docx.Document(BytesIO(b"".join(response.streaming_content))).paragraphs]
+
+        llm.assert_called_once()  # the cached JSON is rendered again, not regenerated
+        self.assertIn("Revised layout", text)
+        cached = GeneratedDocument.objects.get(projectID=project)
+        self.assertIn(cached.ai_json["Objective"], text)
+        self.assertEqual(cached.template_version, str(mtime))
+
+
+class RequestMetricsTests(TestCase):
+
+    def test_breakdown_is_logged_and_sent_as_server_timing(self):
+        project = _project(2)
+        url = reverse("download_financial_plan_docx", args=[project.pk])
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / "request_metrics.jsonl"
+            with override_settings(ALLOWED_HOSTS=["*"], REQUEST_METRICS_LOG=str(log),
+                                   REQUEST_METRICS_SERVER_TIMING=True), \
+                    mock.patch("pm_app.views.documents.generate_financial_plan", return_value={}):
+                response = self.client.get(url)
+            record = json.loads(log.read_text().splitlines()[-1])
+
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("docx;dur=", response["Server-Timing"])
+        self.assertEqual(record["view"], "download_financial_plan_docx")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["db_queries"], 9)
+        self.assertGreater(record["docx_ms"], 0)
+        self.assertEqual(record["llm_calls"], 0)
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def _inc_in_child(counter, gauge):
+    counter.inc(2, feature="child")
+    gauge.set(7)
+
+
+class MetricsTests(TestCase):
+
+    def test_request_is_counted_and_exposed(self):
+        project = _project(1)
+        url = reverse("download_financial_plan_docx", args=[project.pk])
+        view = 'view="download_financial_plan_docx"'
+        requests = f'pm_http_requests_total{{{view},method="GET",status="200"}}'
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            before = self.client.get(reverse("metrics")).content.decode()
+            with mock.patch("pm_app.views.documents.generate_financial_plan", return_value={}):
+                self.client.get(url)
+            response = self.client.get(reverse("metrics"))
+        text = response.content.decode()
+
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        self.assertEqual(_sample(text, requests) - _sample(before, requests), 1)
+        self.assertEqual(_sample(text, f"pm_db_queries_total{{{view}}}")
+                         - _sample(before, f"pm_db_queries_total{{{view}}}"), 9)
+        self.assertIn(f'pm_http_request_duration_seconds_bucket{{{view},le="+Inf"}}', text)
+        self.assertIn('pm_document_cache_requests_total{doc_type="financial_plan",result="miss"}', text)
+        self.assertIn("# TYPE pm_llm_request_duration_seconds histogram", text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.Registry()
+        hist = metrics.Histogram("t_seconds", "Test.", ("model",), buckets=(0.1, 1.0), registry=registry)
+        for value in (0.05, 0.5, 0.5, 3.0):
+            hist.observe(value, model="m")
+        text = registry.render()
+        self.assertIn('t_seconds_bucket{model="m",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{model="m",le="1"} 3', text)
+        self.assertIn('t_seconds_bucket{model="m",le="+Inf"} 4', text)
+        self.assertIn('t_seconds_sum{model="m"} 4.05', text)
+        self.assertIn('t_seconds_count{model="m"} 4', text)
+
+    def test_values_are_summed_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = metrics.Registry(tmp)
+            counter = metrics.Counter("t_total", "Test.", ("feature",), registry=registry)
+            gauge = metrics.Gauge("t_gauge", "Test.", registry=registry)
+            counter.inc(feature="child")
+            gauge.set(1)
+
+            child = multiprocessing.get_context("fork").Process(target=_inc_in_child, args=(counter, gauge))
+            child.start()
+            child.join()
+            text = registry.render()
+
+        self.assertEqual(child.exitcode, 0)
+        # The child's counter survives it; its gauge does not
+        self.assertIn('t_total{feature="child"} 3', text)
+        self.assertIn("t_gauge 1", text)
+
+
+def _write_in_child(path, worker):
+    sink = telemetry.JsonlSink(path, max_bytes=4096, backups=50, flush_every=7)
+    for i in range(200):
+        sink.write({"id": f"{worker}-{i}", "payload": "x" * 50})
+    sink.flush()
+
+
+class JsonlSinkTests(TestCase):
+
+    def test_rotated_gzip_segments_are_read_in_order_without_duplicates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "api_metrics.jsonl"
+            sink = telemetry.JsonlSink(path, max_bytes=500, backups=100, flush_every=5, compress=True)
+            recs = [{"id": str(i), "n": i} for i in range(100)]
+            for rec in recs + recs[:10]:  # rewrites of the same id are dropped
+                sink.write(rec)
+            sink.flush()
+            # A record that reached the file twice anyway is read once
+            with path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(recs[-1]) + "\n" + '{"truncated": \n')
+
+            segments = telemetry.segments(path)
+            read = [r["n"] for r in telemetry.iter_records(path)]
+
+        self.assertGreater(len(segments), 2)
+        self.assertTrue(all(p.suffix == ".gz" for p in segments[:-1]))
+        self.assertEqual(read, list(range(100)))
+
+    def test_quiet_sink_is_flushed_after_flush_interval(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "api_metrics.jsonl"
+            sink = telemetry.JsonlSink(path, flush_every=20, flush_interval=0.1)
+            sink.write({"id": "a"})
+            self.assertFalse(path.exists())
+            deadline = time.monotonic() + 5
+            while not path.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(list(telemetry.iter_records(path)), [{"id": "a"}])
+
+    def test_time_based_rotation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "api_metrics.jsonl"
+            sink = telemetry.JsonlSink(path, flush_every=1, rotate_every=60)
+            sink.write({"id": "a"})
+            with mock.patch("pm_app.telemetry.time.time", return_value=telemetry.time.time() + 61):
+                sink.write({"id": "b"})
+            self.assertEqual([p.name for p in telemetry.segments(path)],
+                             ["api_metrics.jsonl.1", "api_metrics.jsonl"])
+
+    def test_processes_sharing_a_file_do_not_interleave_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "api_metrics.jsonl"
+            ctx = multiprocessing.get_context("fork")
+            workers = [ctx.Process(target=_write_in_child, args=(path, w)) for w in range(4)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            lines = [line for seg in telemetry.segments(path) for line in seg.read_text().splitlines()]
+
+        self.assertEqual(len(lines), 800)
+        self.assertEqual(len({json.loads(line)["id"] for line in lines}), 800)
+
+
+class FlowPromptCorpusTests(TestCase):
+
+    def test_recorded_update_prompt_replays_to_the_same_messages(self):
+        payload = {
+            "edited_field": "benefits",
+            "user_edit": {"id": "7", "description": "Faster launches"},
+            "current_flow": _flow(1),
+            "similar_projects": {"id": "p1", "title": "Sample", "outcomes": []},
+            "similar_teams": ["Delivery builds things"],
+        }
+        result = telemetry.LLMResult(text="", data=None, record={})
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp) / "flow_corpus.jsonl"
+            with override_settings(FLOW_PROMPT_CORPUS=str(corpus)), \
+                    mock.patch.object(openapi_client, "get_client", return_value=None), \
+                    mock.patch.object(openapi_client, "call_llm", return_value=result) as call:
+                self.assertEqual(openapi_client.update_flow_with_llm(payload), {})
+            recorded = json.loads(corpus.read_text())
+
+        self.assertEqual(recorded["kind"], "update_flow")
+        self.assertEqual(openapi_client.update_flow_messages(recorded["inputs"]), call.call_args.kwargs["messages"])
+
+
+def _stream(text, prompt_tokens=12):
+    """What client.chat.completions.create(stream=True) yields, for a fake client."""
+    def chunk(content=None, usage=None):
+        choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content else []
+        return SimpleNamespace(choices=choices, usage=usage)
+    return iter([chunk(text[:4]), chunk(text[4:]),
+                 chunk(usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(text)))])
+
+
+class CassetteTests(TestCase):
+
+    def test_recorded_calls_replay_without_a_client(self):
+        messages = [{"role": "user", "content": "Plan a launch"}]
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = [_stream('{"title": "A"}'), _stream('{"title": "B"}')]
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(telemetry, "log_record"):
+            with mock.patch.object(cassettes, "store", cassettes.CassetteStore(tmp, mode="record")):
+                for _ in range(2):
+                    telemetry.call_llm(client, feature="t", model="gpt-4o", messages=messages)
+            with mock.patch.object(cassettes, "store", cassettes.CassetteStore(tmp, mode="replay")):
+                replayed = [telemetry.call_llm(None, feature="t", model="gpt-4o", messages=messages)
+                            for _ in range(3)]
+                with self.assertRaises(cassettes.CassetteMiss):
+                    telemetry.call_llm(None, feature="t", model="gpt-4o", messages=messages, temperature=0.5)
+
+        self.assertEqual([r.text for r in replayed], ['{"title": "A"}', '{"title": "B"}', '{"title": "A"}'])
+        self.assertEqual(replayed[0].record["tokens_in"], 12)
+        self.assertTrue(replayed[0].record["used_mock"])
+
+
+class ReadinessTests(TestCase):
+
+    def test_ready_reports_warmup_steps(self):
+        def broken():
+            raise OSError("model download failed")
+
+        with mock.patch.dict(warmup.state, {"status": "idle", "steps": {}}):
+            self.assertEqual(self.client.get(reverse("ready")).status_code, 503)  # no warm-up ran
+            warmup.run({"fine": lambda: None, "broken": broken})
+            resp = self.client.get(reverse("ready"))
+
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual(body["warmup"], "done")
+        self.assertTrue(body["steps"]["fine"]["ok"])
+        self.assertEqual(body["steps"]["broken"], {"ok": False, "error": "OSError: model download failed",
+                                                   "seconds": body["steps"]["broken"]["seconds"]})
+
+
+class PreforkWorkerTests(TestCase):
+
+    def test_sigterm_lets_the_request_in_flight_finish(self):
+        def slow_app(environ, start_response):
+            time.sleep(1)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"done"]
+
+        sock = socket.create_server(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve(sock, slow_app, "127.0.0.1", port, graceful_timeout=10)
+            finally:
+                os._exit(1)
+        sock.close()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", "/")
+            time.sleep(0.3)  # the worker is inside slow_app now
+            os.kill(pid, signal.SIGTERM)
+            response = conn.getresponse()
+            self.assertEqual((response.status, response.read()), (200, b"done"))
+        finally:
+            _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+@mock.patch("pm_app.views.flow.find_similar_teams", return_value=[])
+@mock.patch("pm_app.views.flow.find_similar_projects", return_value={})
+class UpdateFlowTests(TestCase):
+
+    def _post(self, project):
+        return self.client.post(reverse("update_flow_ajax", args=[project.pk]), content_type="application/json",
+                                data={"edited_field": "vision", "payload": {"vision": "Budget £300,000"}})
+
+    def test_llm_call_runs_outside_a_transaction(self, *_):
+        project = _project(1)
+
+        seen = {}
+
+        def llm(payload):
+            seen.update(vision=payload["current_flow"]["vision"], atomic_blocks=len(connection.atomic_blocks))
+            return _flow(2)
+
+        outer = len(connection.atomic_blocks)  # TestCase's own transactions
+        with mock.patch("pm_app.views.flow.update_flow_with_llm", llm):
+            response = self._post(project)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, {"vision": "Budget £300,000", "atomic_blocks": outer})
+        project.refresh_from_db()
+        self.assertEqual((project.name, project.vision), ("Plan 2", "Budget £300,000"))
+
+    def test_concurrent_update_discards_the_llm_result(self, *_):
+        project = _project(1)
+
+        def llm(payload):
+            save_project_flow(Project.objects.get(pk=project.pk), _flow(3))  # another request saved meanwhile
+            return _flow(2)
+
+        with mock.patch("pm_app.views.flow.update_flow_with_llm", llm):
+            response = self._post(project)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Project.objects.get(pk=project.pk).name, "Plan 3")
+
+    def test_unknown_field_is_rejected_before_anything_is_written(self, *_):
+        project = _project(1)
+        with mock.patch("pm_app.views.flow.update_flow_with_llm") as llm:
+            response = self.client.post(reverse("update_flow_ajax", args=[project.pk]),
+                                        content_type="application/json",
+                                        data={"edited_field": "tasks", "payload": {"id": 1, "description": "x"}})
+        self.assertEqual(response.status_code, 400)
+        llm.assert_not_called()
+        self.assertEqual(Project.objects.get(pk=project.pk).flow_version, project.flow_version)
+
+
+class SqlitePragmaTests(TestCase):
+
+    def test_pragmas_from_settings_run_on_connect(self):
+        with connection.cursor() as cursor:
+            default = cursor.execute("PRAGMA cache_size").fetchone()[0]
+            with override_settings(SQLITE_PRAGMAS={"cache_size": -4321}):
+                apply_sqlite_pragmas(None, connection)
+            self.assertEqual(cursor.execute("PRAGMA cache_size").fetchone()[0], -4321)
+            cursor.execute(f"PRAGMA cache_size = {default}")
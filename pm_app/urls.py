@@ -12,5 +12,12 @@ urlpatterns = [
 
     path('project/<int:project_id>/download-comm-plan.docx/', views.download_comm_plan_docx, name='download_comm_plan_docx'),
     path('project/<int:project_id>/download-financial-plan.docx/', views.download_financial_plan_docx, name='download_financial_plan_docx'),
-    path('project/<int:project_id>/gantt-data/', views.gantt_chart_data, name='gantt_chart_data')
+    path('project/<int:project_id>/download-plans.zip/', views.download_plan_bundle, name='download_plan_bundle'),
+    path('project/<int:project_id>/gantt-data/', views.gantt_chart_data, name='gantt_chart_data'),
+
+    # Prometheus scrape target (pm_app/metrics.py)
+    path('metrics', views.metrics_view, name='metrics'),
+
+    # Readiness probe; reports the prefork server's warm-up (pm_app/warmup.py)
+    path('ready', views.ready_view, name='ready'),
 ]
\ No newline at end of file
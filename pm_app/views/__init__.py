@@ -0,0 +1,9 @@
+"""
+The app's views, one module per feature. Heavy libraries (Matplotlib,
+python-docx, openai, chromadb) are imported on first use rather than when the
+URLconf loads, so a worker starts quickly and only pays for what it serves.
+"""
+from .documents import download_comm_plan_docx, download_financial_plan_docx, download_plan_bundle
+from .flow import index, get_project_flow, update_flow_ajax
+from .gantt import gantt_chart_data
+from .ops import metrics_view, ready_view
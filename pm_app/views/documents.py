@@ -0,0 +1,228 @@
+"""Communication and financial plan downloads (DOCX, or both as a ZIP)."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.shortcuts import get_object_or_404
+
+from ..documents_helper import build_project_facts, ProjectFacts, build_project_desc, _normalize_stages_for_doc, _expenses_from_deliverables, _parse_money, _monthly_cashflow, generate_comm_plan, generate_financial_plan, normalize_comm_obj, docx_response, docx_bytes, cached_document, store_document, zip_response, submit_document_job
+from ..docx_render import render_docx_template, template_version
+from ..helper import load_project_flow
+from ..models import Project
+from .gantt import _gantt_rows, _render_gantt_png
+
+if TYPE_CHECKING:
+    from docx.document import Document
+
+
+def _wants_regenerate(request) -> bool:
+    return request.GET.get("regenerate", "").lower() in ("1", "true", "yes")
+
+
+def _layout_is_current(cached) -> bool:
+    """False when the document's template changed after the cached copy was rendered."""
+    return cached.template_version == template_version(cached.doc_type)
+
+
+def _comm_plan_ai(facts: dict, desc: str) -> tuple[dict, bool]:
+    """
+    Calls the LLM for the communication plan and returns the normalized JSON,
+    and whether the call succeeded (the JSON is the empty fallback otherwise).
+    """
+    try:
+        comm_raw, generated = generate_comm_plan(desc), True
+    except Exception:
+        comm_raw, generated = {}, False
+    return normalize_comm_obj(comm_raw or {}, facts.get("Project Name", "Project")), generated
+
+
+def _financial_plan_ai(facts: dict, desc: str) -> tuple[dict, bool]:
+    """Calls the LLM for the financial plan; falls back to an empty dict. The flag is False on fallback."""
+    try:
+        return generate_financial_plan(desc) or {}, True
+    except Exception:
+        return {}, False
+
+
+def _build_comm_plan_doc(facts: dict, comm: dict) -> Document:
+    stakeholders = comm.get("Stakeholders") or []
+    rows = []
+    if stakeholders:
+        headers = list(stakeholders[0].keys())
+        rows = [headers] + [[s.get(h, "") for h in headers] for s in stakeholders]
+
+    return render_docx_template("comm_plan", {
+        "project_name": facts.get("Project Name", "Project"),
+        "objective": comm.get("Objective") or "Ensure alignment and timely decisions across stakeholders.",
+        "stakeholders": rows,
+        "channels": comm.get("Channels") or [],
+    })
+
+
+def _gantt_png_or_none(facts: ProjectFacts):
+    """PNG bytes of the project's Gantt chart, or None if there is nothing to draw."""
+    rows = _gantt_rows(facts.tasks)
+    if not rows:
+        return None
+    try:
+        return _render_gantt_png(rows)
+    except Exception:
+        return None
+
+
+def _build_financial_plan_doc(facts: ProjectFacts, ai_fin: dict, gantt_png: bytes = None) -> Document:
+    # --- Summary ---
+    summary_text = ""
+    s = ai_fin.get("summary")
+    if isinstance(s, dict):
+        summary_text = s.get("Text") or s.get("text") or ""
+    elif isinstance(s, str):
+        summary_text = s
+    if not summary_text:
+        summary_text = (
+            f"The financial plan for {facts.get('Project Name','this project')} covers stages, "
+            f"costs, monthly phasing, tolerances and governance. Values below include sensible defaults "
+            f"if AI data was unavailable."
+        )
+
+    # --- Stages ---
+    stages = _normalize_stages_for_doc(ai_fin.get("stages"), facts)
+
+    # --- Expenses ---
+    # Accept either a list of dicts from AI or fall back to deliverable-based defaults
+    expenses_rows = []
+    expenses_obj = ai_fin.get("expenses") or ai_fin.get("costs") or ai_fin.get("Costs")
+    if isinstance(expenses_obj, list) and expenses_obj and isinstance(expenses_obj[0], dict):
+        headers = list(expenses_obj[0].keys())
+        expenses_rows = [headers] + [[row.get(h, "") for h in headers] for row in expenses_obj]
+    if not expenses_rows:
+        expenses_rows = [["category", "cost"]] + [[c, v] for c, v in _expenses_from_deliverables(facts)]
+
+    # --- Cashflow ---
+    total_cost = 0.0
+    for r in expenses_rows[1:]:
+        # second column assumed to be money-like "£123,456"
+        val = _parse_money(r[1]) if len(r) > 1 else None
+        total_cost += (val or 0.0)
+    months, per_month, total_guess = _monthly_cashflow(facts, total_cost if total_cost else None)
+    cashflow_rows = [["month", "planned_outflow"]] + [[m.strftime("%b %Y"), f"£{per_month:,.0f}"] for m in months]
+
+    # --- Build the DOCX ---
+    gov_text = (
+        f"Executive Sponsor: {facts['Executive Sponsor']}; PM: {facts['Project Manager']}. "
+        f"Board cadence: {facts['Board Cadence']}; highlights: {facts['Highlight Frequency']}."
+    )
+    return render_docx_template("financial_plan", {
+        "project_name": facts.get("Project Name", "Project"),
+        "summary": summary_text,
+        "stages": stages,
+        "gantt": gantt_png,
+        "expenses": expenses_rows,
+        "cashflow": cashflow_rows,
+        "tolerance": [["Field", "Value"], ["time_tolerance", "10%"], ["cost_tolerance", "15%"], ["quality_tolerance", "5%"]],
+        "governance": [["Text", gov_text]],
+    })
+
+
+def download_comm_plan_docx(request, project_id: int):
+    """
+    Generate Communication Plan (DOCX) with Stakeholders + Channels sections.
+    The AI JSON and rendered file are cached per flow version; pass
+    ?regenerate=1 to force a fresh LLM call. If the template changed since,
+    the cached JSON is rendered again with the new layout. A document built
+    from the fallback after a failed LLM call is served but not cached.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    load_project_flow(project)  # make sure flow_version reflects the current plan
+    filename = f"project_{project_id}_communication_plan.docx"
+
+    cached = None if _wants_regenerate(request) else cached_document(project, "comm_plan")
+    if cached and _layout_is_current(cached):
+        return docx_response(bytes(cached.docx), filename)
+
+    facts = build_project_facts(project)
+    if cached:
+        comm, generated = cached.ai_json, True
+    else:
+        comm, generated = _comm_plan_ai(facts, build_project_desc(facts))
+    data = docx_bytes(_build_comm_plan_doc(facts, comm))
+    if generated:
+        store_document(project, "comm_plan", comm, data)
+    return docx_response(data, filename)
+
+
+
+def download_financial_plan_docx(request, project_id: int):
+    """
+    Generate the Financial Plan (DOCX). Cached per flow version like the
+    communication plan; ?regenerate=1 forces a fresh LLM call.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    load_project_flow(project)  # make sure flow_version reflects the current plan
+    filename = f"project_{project_id}_financial_plan.docx"
+
+    cached = None if _wants_regenerate(request) else cached_document(project, "financial_plan")
+    if cached and _layout_is_current(cached):
+        return docx_response(bytes(cached.docx), filename)
+
+    facts = build_project_facts(project)
+    if cached:
+        ai_fin, generated = cached.ai_json, True
+    else:
+        ai_fin, generated = _financial_plan_ai(facts, build_project_desc(facts))
+    data = docx_bytes(_build_financial_plan_doc(facts, ai_fin, _gantt_png_or_none(facts)))
+    if generated:
+        store_document(project, "financial_plan", ai_fin, data)
+    return docx_response(data, filename)
+
+
+
+def download_plan_bundle(request, project_id: int):
+    """
+    Returns a ZIP with both plan documents. Documents missing from the cache
+    are generated together: the project facts are built once and the two
+    LLM calls run concurrently, so the wait is roughly the slower call.
+    ?regenerate=1 forces both to be rebuilt. Like the single downloads, a
+    document whose template changed is rendered again from the cached JSON,
+    and one whose LLM call failed is not cached.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    load_project_flow(project)  # make sure flow_version reflects the current plan
+    regenerate = _wants_regenerate(request)
+
+    docs, reuse = {}, {}
+    for doc_type in ("comm_plan", "financial_plan"):
+        cached = None if regenerate else cached_document(project, doc_type)
+        if cached and _layout_is_current(cached):
+            docs[doc_type] = bytes(cached.docx)
+        elif cached:
+            reuse[doc_type] = cached.ai_json
+
+    if len(docs) < 2:
+        facts = build_project_facts(project)
+        desc = build_project_desc(facts)
+        ai = {doc_type: (ai_json, True) for doc_type, ai_json in reuse.items()}
+        futures = {}
+        for doc_type, fn in (("comm_plan", _comm_plan_ai), ("financial_plan", _financial_plan_ai)):
+            if doc_type not in docs and doc_type not in ai:
+                futures[doc_type] = submit_document_job(fn, facts, desc)
+        if "financial_plan" not in docs:
+            # Render the chart while the LLM calls are in flight
+            gantt_png = _gantt_png_or_none(facts)
+        ai.update((doc_type, future.result()) for doc_type, future in futures.items())
+
+        if "comm_plan" in ai:
+            comm, generated = ai["comm_plan"]
+            docs["comm_plan"] = docx_bytes(_build_comm_plan_doc(facts, comm))
+            if generated:
+                store_document(project, "comm_plan", comm, docs["comm_plan"])
+        if "financial_plan" in ai:
+            ai_fin, generated = ai["financial_plan"]
+            docs["financial_plan"] = docx_bytes(_build_financial_plan_doc(facts, ai_fin, gantt_png))
+            if generated:
+                store_document(project, "financial_plan", ai_fin, docs["financial_plan"])
+
+    return zip_response({
+        f"project_{project_id}_communication_plan.docx": docs["comm_plan"],
+        f"project_{project_id}_financial_plan.docx": docs["financial_plan"],
+    }, f"project_{project_id}_plans.zip")
@@ -0,0 +1,145 @@
+"""Prompt page, the editable project flow and its AJAX updates."""
+import json
+import traceback
+
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+
+from ..forms import InputForm
+from ..helper import find_similar_projects, find_similar_teams, validate_and_serialize_sample_project, save_project_flow, refresh_flow_snapshot, load_project_flow
+from ..models import Project, Outcome, Benefit, Deliverable
+from ..openapi_client import generate_flow_from_vision, update_flow_with_llm
+
+# edited_field values that edit a row's description in place
+EDITABLE_MODELS = {'outcomes': Outcome, 'benefits': Benefit, 'deliverables': Deliverable}
+
+
+def index(request):
+    """
+    Handles the initial prompt submission page.
+    """
+    if request.method == 'POST':
+        form = InputForm(request.POST)
+        if form.is_valid():
+            prompt = form.cleaned_data['prompt']
+
+            #Create new project with the vision from the prompt
+            project = Project.objects.create(name='initial project', vision=prompt)
+            
+
+            #find relevant past projects and organizational team/data
+            similar_projects = find_similar_projects(prompt)
+            teams_data = find_similar_teams(project.vision)
+
+            # Validate and serialize the sample project into a clean JSON string
+            sample_project_json = validate_and_serialize_sample_project(similar_projects)
+
+
+            #generate the initial project flow
+            project_flow_data = generate_flow_from_vision(prompt, sample_project_json, teams_data)
+
+            #Persist the flow (and its title) in one pass; untitled flows keep a placeholder name
+            project.name = 'Untitled Project'
+            save_project_flow(project, project_flow_data)
+
+            # Redirect to the editable project flow page
+            return redirect('project_flow', project_id=project.id)
+        else:
+            return render(request, 'pm_app/index.html', {'form': form, 'error': 'Invalid form submission'})
+            
+    return render(request, 'pm_app/index.html')
+
+
+
+
+def get_project_flow(request, project_id):
+    """
+    Handles the page where the user can see and edit the project flow.
+    """
+    project = get_object_or_404(Project, id=project_id)
+    # The whole tree comes from the materialized snapshot (one row fetch)
+    flow = load_project_flow(project)
+
+    return render(request, "pm_app/project_flow.html", {
+        "project": project,
+        "outcomes": flow.get("outcomes", []),
+    })
+
+
+
+def update_flow_ajax(request, project_id):
+    """
+    Handles AJAX requests for project flow updates. It retrieves the entire current
+    project flow from the database, combines it with the user's edit, and sends
+    the full context to an LLM to generate the complete, updated flow.
+
+    The edit and the new flow are written in two short transactions; the LLM call
+    in between runs outside any transaction so it never holds the database lock.
+    If the flow changed in the meantime the LLM output is discarded (409).
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            project = get_object_or_404(Project, id=project_id)
+            edited_field = data.get('edited_field')
+            payload = data.get('payload')
+
+            if not edited_field or not payload:
+                return JsonResponse({'status': 'error', 'message': 'Missing edited_field or payload.'}, status=400)
+            if edited_field != 'vision' and edited_field not in EDITABLE_MODELS:
+                return JsonResponse({'status': 'error', 'message': f'Unknown edited_field: {edited_field}.'}, status=400)
+
+            # Look the edited item up before the transaction, so that it starts with a write
+            item = None
+            if edited_field in EDITABLE_MODELS:
+                item = get_object_or_404(EDITABLE_MODELS[edited_field], id=payload.get('id'))
+
+            # First, update the specific item in the database so the change is reflected,
+            # and re-materialize the snapshot so it reflects the edit.
+            with transaction.atomic():
+                if edited_field == 'vision':
+                    project.vision = payload.get('vision')
+                    project.save(update_fields=['vision'])
+                else:
+                    item.description = payload.get('description')
+                    item.save(update_fields=['description'])
+                current_project_flow = refresh_flow_snapshot(project)
+            edited_version = project.flow_version
+
+            similar_projects = find_similar_projects(project.vision)
+            similar_teams = find_similar_teams(project.vision)
+
+            llm_payload = {
+                'edited_field': edited_field,
+                'user_edit': payload,
+                'current_flow': current_project_flow,
+                'similar_projects': similar_projects,
+                'similar_teams': similar_teams,
+            }
+
+            # Call the LLM to get the complete, re-aligned project flow
+            updated_flow_data = update_flow_with_llm(llm_payload)
+
+            if not updated_flow_data:
+                return JsonResponse({'status': 'error', 'message': 'LLM failed to return valid data.'}, status=500)
+
+            with transaction.atomic():
+                # A no-op write: takes the write lock and checks nobody saved the flow since our edit
+                if not Project.objects.filter(pk=project.pk, flow_version=edited_version).update(
+                        flow_version=F('flow_version')):
+                    return JsonResponse({'status': 'error', 'message': 'The project flow was changed by another '
+                                         'update; reload the page and try again.'}, status=409)
+
+                # Clear old data and repopulate with the new, LLM-generated data.
+                # The vision is already up-to-date; the title comes from the LLM.
+                save_project_flow(project, updated_flow_data)
+
+            return JsonResponse({'status': 'success', 'message': 'Project flow updated successfully.'})
+
+        except Exception as e:
+            traceback.print_exc()
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+    return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
@@ -0,0 +1,26 @@
+"""Operational endpoints."""
+import os
+
+from django.http import HttpResponse, JsonResponse
+
+from .. import metrics, warmup
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the app's counters and histograms."""
+    return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def ready_view(request):
+    """
+    Readiness probe: 200 with what was warmed and how long each step took once
+    the warm-up (pm_app/warmup.py) has finished, 503 before. serve_prefork
+    warms up before it forks the workers, so its workers are always ready;
+    runserver and gunicorn have no warm-up and always answer 503.
+    """
+    return JsonResponse({
+        "ready": warmup.is_ready(),
+        "pid": os.getpid(),
+        "warmup": warmup.state["status"],
+        "steps": warmup.state["steps"],
+    }, status=200 if warmup.is_ready() else 503)
@@ -0,0 +1,64 @@
+"""
+Loads what the first requests of a fresh worker would otherwise pay for: the
+Chroma embedding model, Matplotlib (font cache and Agg renderer, by drawing a
+small Gantt chart) and the parsed .docx templates.
+
+manage.py serve_prefork runs this in the parent process before forking, so the
+workers share the warmed memory copy-on-write; /ready reports the outcome.
+A step that fails is reported and skipped: the feature then loads on first use,
+as it would without warm-up.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+
+_lock = threading.Lock()
+state = {"status": "idle", "steps": {}}  # idle -> running -> done
+
+
+def _embedding_model():
+    from .services import get_embedding_function
+    get_embedding_function()(["Warm up the embedding model"])
+
+
+def _matplotlib():
+    from .views.gantt import _render_gantt_png
+    start = date.today()
+    _render_gantt_png([{"task": "Warm-up", "team": "Ops", "start": start, "end": start + timedelta(days=30)}])
+
+
+def _docx_templates():
+    from .docx_render import load_template
+    for path in sorted(Path(settings.DOCX_TEMPLATE_DIR).glob("*.docx")):
+        load_template(path.stem)
+
+
+STEPS = {
+    "embedding_model": _embedding_model,
+    "matplotlib": _matplotlib,
+    "docx_templates": _docx_templates,
+}
+
+
+def run(steps=None) -> dict:
+    """Runs the warm-up steps in this thread and returns the state."""
+    with _lock:
+        state.update(status="running", steps={})
+        for name, step in (steps or STEPS).items():
+            t0 = time.perf_counter()
+            try:
+                step()
+                result = {"ok": True}
+            except Exception as e:
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            state["steps"][name] = {**result, "seconds": round(time.perf_counter() - t0, 3)}
+        state["status"] = "done"
+    return state
+
+
+def is_ready() -> bool:
+    """True once a warm-up has finished. Only serve_prefork runs one, so under runserver or gunicorn this stays False."""
+    return state["status"] == "done"
@@ -0,0 +1,248 @@
+# pm_eval/accuracy_batch.py — accuracy checks over large output corpora
+#
+# Same checks and report files as accuracy_tests.py, built for tens of
+# thousands of outputs and before/after pairs:
+#   - files and pairs are scored in a process pool (--workers, default: all cores);
+#   - each worker keeps parsed documents keyed by (path, mtime, size), so a
+#     "before" plan shared by many pairs is read once per worker;
+#   - results are cached in $EVAL_OUTPUT_DIR/accuracy_cache.sqlite3 under the
+#     same key plus a fingerprint of the thresholds, required tags and scoring
+#     code, so a rerun only re-scores files that changed (or everything, after
+#     a threshold or a check is changed);
+#   - report rows are written as they are produced, in input order.
+#
+#   python -m pm_eval.accuracy_batch --workers 8
+#
+# --similarity semantic scores pairs in this process instead, so the embedding
+# model is loaded once (pm_eval/embeddings.py batches and caches its vectors).
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from pm_eval.accuracy_tests import (
+    BASE_DIR, OUTPUT_DIR, PROPAGATION_PAIRS_CSV, SIMILARITY_MODE, EDIT_THRESHOLDS, SEMANTIC_THRESHOLDS, REQUIRED_TAGS,
+    completeness_row, parse_pair_row, score_pair, read_json, write_summary, _section_texts,
+)
+
+CACHE_PATH = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "accuracy_cache.sqlite3"
+DOC_CACHE_SIZE = 4096   # parsed documents kept per worker
+CHUNKSIZE = 64          # items handed to a worker at a time
+
+_docs = OrderedDict()   # per process: (path, mtime_ns, size) -> parsed JSON
+
+
+def scoring_fingerprint() -> str:
+    """
+    Hash of what decides a row besides its input files: the required tags, both
+    threshold sets and the scoring modules' source.
+    """
+    h = hashlib.sha256(json.dumps([REQUIRED_TAGS, EDIT_THRESHOLDS, SEMANTIC_THRESHOLDS], sort_keys=True).encode())
+    for module in ("accuracy_tests.py", "similarity.py", "embeddings.py"):
+        h.update((BASE_DIR / module).read_bytes())
+    return h.hexdigest()[:16]
+
+
+SCORING = scoring_fingerprint()
+
+
+def file_key(path: Path) -> tuple:
+    st = path.stat()
+    return str(path.resolve()), st.st_mtime_ns, st.st_size
+
+
+def load_doc(path: Path) -> dict:
+    """read_json with a per-process cache that is invalidated when the file's mtime or size changes."""
+    key = file_key(path)
+    doc = _docs.get(key)
+    if doc is None:
+        doc = _docs[key] = read_json(path)
+        if len(_docs) > DOC_CACHE_SIZE:
+            _docs.popitem(last=False)
+    else:
+        _docs.move_to_end(key)
+    return doc
+
+
+class ResultCache:
+    """Report rows keyed by what they were computed from."""
+
+    def __init__(self, path=CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, row TEXT)")
+        self._pending = []
+
+    def get(self, key: str):
+        hit = self._conn.execute("SELECT row FROM results WHERE key = ?", (key,)).fetchone()
+        return tuple(json.loads(hit[0])) if hit else None
+
+    def put(self, key: str, row: tuple):
+        self._pending.append((key, json.dumps(row)))
+        if len(self._pending) >= 1000:
+            self.commit()
+
+    def commit(self):
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO results (key, row) VALUES (?, ?)", self._pending)
+        self._pending = []
+
+
+# ---- worker tasks (module level so they pickle) ----
+def _completeness_task(path: str) -> tuple:
+    p = Path(path)
+    try:
+        return completeness_row(p, load_doc(p))
+    except Exception:
+        return completeness_row(p)  # reports the read/parse error
+
+
+def _pair_task(item: tuple) -> tuple:
+    pid, utype, before_p, after_p = item
+    try:
+        before, after = load_doc(Path(before_p)), load_doc(Path(after_p))
+    except Exception as e:
+        return (pid, utype, "ERROR", str(e), "", "", "")
+    return score_pair(pid, utype, before, after, None, EDIT_THRESHOLDS)
+
+
+def _ordered(items, keys, task, cache, pool, run_local=None):
+    """
+    Yields (item, row) in input order: cached rows straight away, the rest
+    computed in the pool (imap keeps order) or by run_local.
+    """
+    todo = [i for i, k in enumerate(keys) if k is None or cache.get(k) is None]
+    todo_set = set(todo)
+    if run_local is not None:
+        fresh = (run_local(items[i]) for i in todo)
+    else:
+        fresh = pool.imap(task, [items[i] for i in todo], chunksize=CHUNKSIZE)
+    for i, item in enumerate(items):
+        if i in todo_set:
+            row = next(fresh)
+            if keys[i] is not None:
+                cache.put(keys[i], row)
+        else:
+            row = cache.get(keys[i])
+        yield item, row
+
+
+def run_completeness_batch(output_dir: Path, cache: ResultCache, pool, out_csv: Path) -> dict:
+    files = sorted(output_dir.glob("*.json"))
+    keys = []
+    for f in files:
+        try:
+            keys.append(json.dumps(["completeness", SCORING, *file_key(f)]))
+        except OSError:
+            keys.append(None)
+    total = complete = 0
+    with open(out_csv, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(["file", "status", "missing_tags", "notes"])
+        for _, row in _ordered([str(f) for f in files], keys, _completeness_task, cache, pool):
+            w.writerow(row)
+            total += 1
+            complete += row[1] == "OK"
+    return {"total_files": total, "complete_count": complete,
+            "completeness_pct": round(100.0 * complete / total, 2) if total else 0.0}
+
+
+PROPAGATION_HEADER = ["id", "update_type", "result", "error", "metric_1", "metric_2", "metric_3"]
+
+
+def run_propagation_batch(pairs_csv: Path, cache: ResultCache, pool, out_csv: Path, mode: str) -> dict:
+    items, keys, errors = [], [], {}
+    if pairs_csv.exists():
+        with open(pairs_csv, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames:
+                reader.fieldnames = [fn.strip().lstrip("\ufeff").lower() for fn in reader.fieldnames]
+            needed = {"id", "update_type", "before_path", "after_path"}
+            if not reader.fieldnames or not needed.issubset(set(reader.fieldnames)):
+                missing = needed - set(reader.fieldnames or [])
+                # Same report as accuracy_tests.run_propagation: one error row, zero totals
+                with open(out_csv, "w", newline="", encoding="utf-8") as fh:
+                    w = csv.writer(fh)
+                    w.writerow(PROPAGATION_HEADER)
+                    w.writerow(["?", "?", "ERROR", f"Missing columns: {', '.join(sorted(missing))}", "", "", ""])
+                return {"pairs_total": 0, "passed": 0, "passed_pct": 0.0}
+            for raw_row in reader:
+                pid, utype, before_p, after_p, errs = parse_pair_row(raw_row)
+                if errs:
+                    errors[len(items)] = (pid or "?", utype or "?", "ERROR", "; ".join(errs), "", "", "")
+                    keys.append(None)
+                else:
+                    keys.append(json.dumps(["propagation", SCORING, mode, pid, utype,
+                                           *file_key(before_p), *file_key(after_p)]))
+                items.append((pid, utype, str(before_p), str(after_p)))
+
+    run_local = None
+    if mode == "semantic":
+        from pm_eval.embeddings import SemanticScorer
+        scorer = SemanticScorer()
+        todo = [it for it, k in zip(items, keys) if k is not None and cache.get(k) is None]
+        texts = []
+        for _, _, b, a in todo:
+            for p in (b, a):
+                try:
+                    texts += _section_texts(load_doc(Path(p)))
+                except Exception:
+                    pass
+        scorer.prefetch(texts)
+
+        def run_local(item):
+            pid, utype, b, a = item
+            try:
+                before, after = load_doc(Path(b)), load_doc(Path(a))
+            except Exception as e:
+                return (pid, utype, "ERROR", str(e), "", "", "")
+            return score_pair(pid, utype, before, after, scorer, SEMANTIC_THRESHOLDS)
+
+    # Rows with validation errors are not scored; give them their row directly
+    valid = [i for i, k in enumerate(keys) if k is not None]
+    rows = dict(errors)
+    total = passed = 0
+    with open(out_csv, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(PROPAGATION_HEADER)
+        scored = _ordered([items[i] for i in valid], [keys[i] for i in valid], _pair_task, cache, pool, run_local)
+        for i in range(len(items)):
+            row = rows[i] if i in rows else next(scored)[1]
+            w.writerow(row)
+            total += 1
+            passed += row[2] == "PASS"
+    return {"pairs_total": total, "passed": passed,
+            "passed_pct": round(100.0 * passed / total, 2) if total else 0.0}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch completeness/propagation checks with a process pool and a result cache.")
+    ap.add_argument("--outputs", default=str(OUTPUT_DIR), help="directory of output JSON files")
+    ap.add_argument("--pairs", default=str(PROPAGATION_PAIRS_CSV), help="propagation pairs CSV")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--similarity", choices=["edit", "semantic"], default=SIMILARITY_MODE)
+    ap.add_argument("--cache", default=str(CACHE_PATH))
+    args = ap.parse_args()
+
+    cache = ResultCache(args.cache)
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(max(1, args.workers)) as pool:
+        comp = run_completeness_batch(Path(args.outputs), cache, pool, BASE_DIR / "accuracy_completeness_report.csv")
+        prop = run_propagation_batch(Path(args.pairs), cache, pool, BASE_DIR / "accuracy_propagation_report.csv",
+                                     args.similarity)
+    cache.commit()
+    write_summary(comp, prop)
+    print(f"Scored {comp['total_files']} files and {prop['pairs_total']} pairs in {time.perf_counter() - t0:.1f}s "
+          f"({args.workers} workers)")
+    print("Saved: accuracy_completeness_report.csv, accuracy_propagation_report.csv, accuracy_summary.txt")
+
+
+if __name__ == "__main__":
+    main()
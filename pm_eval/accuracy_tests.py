@@ -1,8 +1,9 @@
 # pm_eval/accuracy_tests.py
 from __future__ import annotations
 from pathlib import Path
-import json, csv
-from difflib import SequenceMatcher
+import json, csv, os, argparse
+
+from pm_eval.similarity import edit_similarity
 
 # ========= CONFIG =========
 BASE_DIR = Path(__file__).parent
@@ -18,6 +19,23 @@ DOWNSTREAM_CHANGED_SIM_TH   = 0.95
 TASKS_CHANGED_SIM_TH        = 0.85
 DELIVERABLES_CHANGED_SIM_TH = 0.95
 
+# "edit": character-level similarity of the flattened sections (thresholds above).
+# "semantic": cosine similarity of sentence embeddings (pm_eval/embeddings.py);
+# list sections are compared item-to-item by best match, thresholds below.
+SIMILARITY_MODE = os.getenv("ACCURACY_SIMILARITY", "edit")
+SEMANTIC_THRESHOLDS = {
+    "vision": 0.90,
+    "downstream": 0.95,
+    "tasks": 0.92,
+    "deliverables": 0.95,
+}
+EDIT_THRESHOLDS = {
+    "vision": VISION_CHANGED_SIM_TH,
+    "downstream": DOWNSTREAM_CHANGED_SIM_TH,
+    "tasks": TASKS_CHANGED_SIM_TH,
+    "deliverables": DELIVERABLES_CHANGED_SIM_TH,
+}
+
 
 # ---------- helpers ----------
 def read_json(p: Path) -> dict:
@@ -33,7 +51,27 @@ def textify(x) -> str:
     return str(x)
 
 def sim(a: str, b: str) -> float:
-    return SequenceMatcher(None, a, b).ratio()
+    # SequenceMatcher ratio for short texts, shingle-based approximation for long plans
+    return edit_similarity(a, b)
+
+def section_similarities(before: dict, after: dict, fields: list, scorer=None) -> dict:
+    """field -> similarity of that section before/after; semantic when a SemanticScorer is given."""
+    if scorer is None:
+        return {f: sim(textify(before.get(f)), textify(after.get(f))) for f in fields}
+    out = {}
+    if "Vision" in fields:
+        out["Vision"] = scorer.text_similarity(textify(before.get("Vision")), textify(after.get("Vision")))
+    rest = [f for f in fields if f != "Vision"]
+    if rest:
+        out.update(scorer.set_similarities(before, after, rest))
+    return out
+
+def _section_texts(doc: dict) -> list:
+    texts = [textify(doc.get("Vision"))]
+    for f in REQUIRED_TAGS[1:]:
+        xs = doc.get(f)
+        texts += [str(x) for x in (xs if isinstance(xs, list) else [xs] if xs else [])]
+    return texts
 
 def resolve_existing(path_str: str) -> Path:
     """
@@ -58,6 +96,16 @@ def check_completeness_one(doc: dict) -> tuple[bool, list[str]]:
     missing = [k for k in REQUIRED_TAGS if k not in doc or doc[k] in (None, "", [])]
     return (len(missing) == 0, missing)
 
+def completeness_row(jf: Path, doc: dict | None = None) -> tuple:
+    """The completeness report row for one output file (doc: already parsed content)."""
+    try:
+        if doc is None:
+            doc = read_json(jf)
+    except Exception as e:
+        return (jf.name, "ERROR", str(e), "")
+    ok, missing = check_completeness_one(doc)
+    return (jf.name, "OK" if ok else "MISSING", "" if ok else ",".join(missing), "")
+
 def run_completeness(output_dir: Path) -> dict:
     rows = []
     json_files = sorted(output_dir.glob("*.json"))
@@ -65,15 +113,9 @@ def run_completeness(output_dir: Path) -> dict:
     complete_count = 0
 
     for jf in json_files:
-        try:
-            doc = read_json(jf)
-        except Exception as e:
-            rows.append((jf.name, "ERROR", str(e), ""))
-            continue
-
-        ok, missing = check_completeness_one(doc)
-        if ok: complete_count += 1
-        rows.append((jf.name, "OK" if ok else "MISSING", "" if ok else ",".join(missing), ""))
+        row = completeness_row(jf)
+        if row[1] == "OK": complete_count += 1
+        rows.append(row)
 
     completeness_pct = 100.0 * complete_count / total if total else 0.0
     return {
@@ -84,7 +126,54 @@ def run_completeness(output_dir: Path) -> dict:
     }
 
 # 8.5.2 Forward–Backward Propagation 
-def run_propagation(pairs_csv: Path) -> dict:
+def parse_pair_row(raw_row: dict) -> tuple:
+    """(id, update_type, before_path, after_path, errors) for one propagation_pairs.csv row."""
+    # Normalize row keys/values
+    row = {
+        (k.strip().lstrip("\ufeff").lower() if isinstance(k, str) else k):
+        (v.strip() if isinstance(v, str) else v)
+        for k, v in raw_row.items()
+    }
+    pid   = row.get("id")
+    utype = (row.get("update_type") or "")
+    bpath = (row.get("before_path") or "")
+    apath = (row.get("after_path") or "")
+
+    before_p = resolve_existing(bpath)
+    after_p  = resolve_existing(apath)
+
+    errs = []
+    if not pid:   errs.append("missing id")
+    if not utype: errs.append("missing update_type")
+    if not bpath: errs.append("missing before_path")
+    if not apath: errs.append("missing after_path")
+    if bpath and not before_p.exists(): errs.append(f"not found: {before_p}")
+    if apath and not after_p.exists():  errs.append(f"not found: {after_p}")
+    return pid, utype, before_p, after_p, errs
+
+def score_pair(pid, utype, before: dict, after: dict, scorer=None, th=EDIT_THRESHOLDS) -> tuple:
+    """The propagation report row for one parsed before/after pair."""
+    if utype == "vision_edit":
+        s = section_similarities(before, after, ["Vision", "Outcomes", "Benefits"], scorer)
+        s_vision, s_outcomes, s_benefits = s["Vision"], s["Outcomes"], s["Benefits"]
+        materially_changed  = (s_vision < th["vision"])
+        downstream_changed  = (s_outcomes < th["downstream"]) or (s_benefits < th["downstream"])
+        ok = (not materially_changed) or downstream_changed
+        return (pid, utype, "PASS" if ok else "FAIL", "",
+                f"s_vision={s_vision:.3f}", f"s_outcomes={s_outcomes:.3f}", f"s_benefits={s_benefits:.3f}")
+
+    if utype == "tasks_edit":
+        s = section_similarities(before, after, ["Tasks", "Deliverables"], scorer)
+        s_tasks, s_deliv = s["Tasks"], s["Deliverables"]
+        materially_changed = (s_tasks < th["tasks"])
+        downstream_changed = (s_deliv < th["deliverables"])
+        ok = (not materially_changed) or downstream_changed
+        return (pid, utype, "PASS" if ok else "FAIL", "",
+                f"s_tasks={s_tasks:.3f}", f"s_deliverables={s_deliv:.3f}", "")
+
+    return (pid or "?", utype or "?", "ERROR", "unknown update_type", "", "", "")
+
+def run_propagation(pairs_csv: Path, mode: str = SIMILARITY_MODE) -> dict:
     """
     Robust CSV reader:
     - utf-8-sig to strip BOM
@@ -92,6 +181,7 @@ def run_propagation(pairs_csv: Path) -> dict:
     - strip whitespace
     - tolerate 'pm_eval/...' vs './...' relative paths
     - report errors per row instead of crashing
+    mode is "edit" or "semantic" (see SIMILARITY_MODE).
     """
     if not pairs_csv.exists():
         return {"pairs_total": 0, "passed": 0, "passed_pct": 0.0, "detail_rows": []}
@@ -114,66 +204,39 @@ def run_propagation(pairs_csv: Path) -> dict:
             missing = needed - set(reader.fieldnames or [])
             detail_rows.append(("?", "?", "ERROR", f"Missing columns: {', '.join(sorted(missing))}", "", "", ""))
             return {"pairs_total": 0, "passed": 0, "passed_pct": 0.0, "detail_rows": detail_rows}
+        raw_rows = list(reader)
+
+    scorer, th = None, EDIT_THRESHOLDS
+    if mode == "semantic":
+        from pm_eval.embeddings import SemanticScorer
+        scorer, th = SemanticScorer(), SEMANTIC_THRESHOLDS
+        # Embed every section text of every pair in one batched pass (cached across runs)
+        texts = []
+        for raw_row in raw_rows:
+            for key in ("before_path", "after_path"):
+                try:
+                    texts += _section_texts(read_json(resolve_existing(raw_row.get(key) or "")))
+                except Exception:
+                    pass  # reported per row below
+        scorer.prefetch(texts)
+
+    for raw_row in raw_rows:
+        total += 1
+        pid, utype, before_p, after_p, errs = parse_pair_row(raw_row)
+        if errs:
+            detail_rows.append((pid or "?", utype or "?", "ERROR", "; ".join(errs), "", "", ""))
+            continue
+
+        try:
+            before = read_json(before_p)
+            after  = read_json(after_p)
+        except Exception as e:
+            detail_rows.append((pid, utype, "ERROR", str(e), "", "", ""))
+            continue
 
-        for raw_row in reader:
-            # Normalize row keys/values
-            row = {
-                (k.strip().lstrip("\ufeff").lower() if isinstance(k, str) else k):
-                (v.strip() if isinstance(v, str) else v)
-                for k, v in raw_row.items()
-            }
-
-            total += 1
-            pid   = row.get("id")
-            utype = (row.get("update_type") or "")
-            bpath = (row.get("before_path") or "")
-            apath = (row.get("after_path") or "")
-
-            before_p = resolve_existing(bpath)
-            after_p  = resolve_existing(apath)
-
-            errs = []
-            if not pid:   errs.append("missing id")
-            if not utype: errs.append("missing update_type")
-            if not bpath: errs.append("missing before_path")
-            if not apath: errs.append("missing after_path")
-            if bpath and not before_p.exists(): errs.append(f"not found: {before_p}")
-            if apath and not after_p.exists():  errs.append(f"not found: {after_p}")
-
-            if errs:
-                detail_rows.append((pid or "?", utype or "?", "ERROR", "; ".join(errs), "", "", ""))
-                continue
-
-            try:
-                before = read_json(before_p)
-                after  = read_json(after_p)
-            except Exception as e:
-                detail_rows.append((pid, utype, "ERROR", str(e), "", "", ""))
-                continue
-
-            if utype == "vision_edit":
-                s_vision   = sim(textify(before.get("Vision")),     textify(after.get("Vision")))
-                s_outcomes = sim(textify(before.get("Outcomes")),   textify(after.get("Outcomes")))
-                s_benefits = sim(textify(before.get("Benefits")),   textify(after.get("Benefits")))
-                materially_changed  = (s_vision < VISION_CHANGED_SIM_TH)
-                downstream_changed  = (s_outcomes < DOWNSTREAM_CHANGED_SIM_TH) or (s_benefits < DOWNSTREAM_CHANGED_SIM_TH)
-                ok = (not materially_changed) or downstream_changed
-                detail_rows.append((pid, utype, "PASS" if ok else "FAIL", "",
-                                    f"s_vision={s_vision:.3f}", f"s_outcomes={s_outcomes:.3f}", f"s_benefits={s_benefits:.3f}"))
-                if ok: passed += 1
-
-            elif utype == "tasks_edit":
-                s_tasks = sim(textify(before.get("Tasks")),        textify(after.get("Tasks")))
-                s_deliv = sim(textify(before.get("Deliverables")), textify(after.get("Deliverables")))
-                materially_changed = (s_tasks < TASKS_CHANGED_SIM_TH)
-                downstream_changed = (s_deliv < DELIVERABLES_CHANGED_SIM_TH)
-                ok = (not materially_changed) or downstream_changed
-                detail_rows.append((pid, utype, "PASS" if ok else "FAIL", "",
-                                    f"s_tasks={s_tasks:.3f}", f"s_deliverables={s_deliv:.3f}", ""))
-                if ok: passed += 1
-
-            else:
-                detail_rows.append((pid or "?", utype or "?", "ERROR", "unknown update_type", "", "", ""))
+        detail = score_pair(pid, utype, before, after, scorer, th)
+        detail_rows.append(detail)
+        if detail[2] == "PASS": passed += 1
 
     passed_pct = 100.0 * passed / total if total else 0.0
     return {"pairs_total": total, "passed": passed, "passed_pct": round(passed_pct, 2), "detail_rows": detail_rows}
@@ -187,6 +250,9 @@ def save_reports(completeness: dict, propagation: dict) -> None:
         w = csv.writer(f); w.writerow(["id", "update_type", "result", "error", "metric_1", "metric_2", "metric_3"])
         w.writerows(propagation["detail_rows"])
 
+    write_summary(completeness, propagation)
+
+def write_summary(completeness: dict, propagation: dict) -> None:
     with open(BASE_DIR / "accuracy_summary.txt", "w", encoding="utf-8") as f:
         f.write(
             f"=== 8.5.1 Completeness ===\n"
@@ -201,8 +267,12 @@ def save_reports(completeness: dict, propagation: dict) -> None:
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Completeness and propagation checks on saved plan outputs.")
+    ap.add_argument("--similarity", choices=["edit", "semantic"], default=SIMILARITY_MODE,
+                    help="how 'materially changed' is judged (default: $ACCURACY_SIMILARITY or edit)")
+    args = ap.parse_args()
     comp = run_completeness(OUTPUT_DIR)
-    prop = run_propagation(PROPAGATION_PAIRS_CSV)
+    prop = run_propagation(PROPAGATION_PAIRS_CSV, args.similarity)
     save_reports(comp, prop)
     print("Saved: accuracy_completeness_report.csv, accuracy_propagation_report.csv, accuracy_summary.txt")
 
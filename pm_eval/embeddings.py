@@ -0,0 +1,136 @@
+# pm_eval/embeddings.py — semantic similarity with cached sentence embeddings
+#
+# Uses the embedding model behind our Chroma collections (chromadb's default,
+# all-MiniLM-L6-v2 on ONNX Runtime, which DefaultEmbeddingFunction delegates
+# to), so "similar" means the same thing here as in find_similar_projects.
+# Vectors are kept in a SQLite cache keyed by sha256(model, text), so each
+# distinct text is embedded once across runs; misses are embedded in batches.
+#
+#   scorer = SemanticScorer()
+#   scorer.prefetch(all_texts)              # one batched pass, fills the cache
+#   scorer.text_similarity(a, b)            # cosine
+#   scorer.set_similarities(before, after)  # {field: score} from one matrix product
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BATCH_SIZE = 64
+CACHE_PATH = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "embedding_cache.sqlite3"
+
+
+def default_embedding_function():
+    # Imported lazily: chromadb and onnxruntime are heavy and only needed on a cache miss
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+    return ONNXMiniLM_L6_V2()
+
+
+def text_key(text: str, model: str = MODEL_NAME) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent text-hash -> float32 vector store."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, dim INTEGER, vec BLOB)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):  # stay under SQLite's host-parameter limit
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+        return found
+
+    def put_many(self, items: dict):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, dim, vec) VALUES (?, ?, ?)",
+                [(k, len(v), np.asarray(v, dtype=np.float32).tobytes()) for k, v in items.items()])
+
+
+class SemanticScorer:
+    def __init__(self, embedding_function=None, cache: EmbeddingCache | None = None, model: str = MODEL_NAME):
+        self._ef = embedding_function
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.model = model
+        self._memory = {}  # text -> unit vector, for this run
+
+    def embed(self, texts: list) -> np.ndarray:
+        """(len(texts), dim) unit vectors; only texts not in memory or the cache reach the model."""
+        missing = list(dict.fromkeys(t for t in texts if t not in self._memory))
+        if missing:
+            keys = {t: text_key(t, self.model) for t in missing}
+            cached = self.cache.get_many(list(keys.values()))
+            todo = [t for t in missing if keys[t] not in cached]
+            if todo:
+                if self._ef is None:
+                    self._ef = default_embedding_function()
+                fresh = {}
+                for i in range(0, len(todo), BATCH_SIZE):
+                    batch = todo[i:i + BATCH_SIZE]
+                    fresh.update(zip(batch, (np.asarray(v, dtype=np.float32) for v in self._ef(batch))))
+                self.cache.put_many({keys[t]: v for t, v in fresh.items()})
+                cached.update((keys[t], v) for t, v in fresh.items())
+            for t in missing:
+                v = cached[keys[t]]
+                norm = np.linalg.norm(v)
+                self._memory[t] = v / norm if norm else v
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self._memory[t] for t in texts])
+
+    def prefetch(self, texts):
+        self.embed([t for t in texts if t])
+
+    def text_similarity(self, a: str, b: str) -> float:
+        if not a and not b:
+            return 1.0
+        if not a or not b:
+            return 0.0
+        va, vb = self.embed([a, b])
+        return float(va @ vb)
+
+    def set_similarities(self, before: dict, after: dict, fields=None) -> dict:
+        """
+        Symmetric best-match cosine between the item lists of each field: the
+        mean over items of their best match on the other side, averaged both
+        ways. All fields come out of one (before items x after items) product.
+        """
+        fields = list(fields or before.keys() | after.keys())
+        items = {side: {f: [str(x) for x in _as_list(doc.get(f)) if str(x).strip()] for f in fields}
+                 for side, doc in (("before", before), ("after", after))}
+        flat_b = [t for f in fields for t in items["before"][f]]
+        flat_a = [t for f in fields for t in items["after"][f]]
+        sims = self.embed(flat_b) @ self.embed(flat_a).T if flat_b and flat_a else None
+
+        out, rb, ra = {}, 0, 0
+        for f in fields:
+            nb, na = len(items["before"][f]), len(items["after"][f])
+            if not nb and not na:
+                out[f] = 1.0
+            elif not nb or not na:
+                out[f] = 0.0
+            else:
+                block = sims[rb:rb + nb, ra:ra + na]
+                out[f] = float((block.max(axis=1).mean() + block.max(axis=0).mean()) / 2)
+            rb, ra = rb + nb, ra + na
+        return out
+
+
+def _as_list(x) -> list:
+    if x is None:
+        return []
+    return x if isinstance(x, list) else [x]
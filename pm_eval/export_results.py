@@ -1,26 +1,29 @@
-import os, json, csv, statistics
+import os, csv, statistics
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+from pm_app.telemetry import iter_records, segments
+
 def main():
     eval_dir = Path(os.environ.get("EVAL_OUTPUT_DIR", Path.home() / "pm_eval_private" / "logs"))
     src = eval_dir / "api_metrics.jsonl"
-    if not src.exists():
+    if not segments(src):
         raise SystemExit(f"No log file found at {src}")
 
-    records = [json.loads(line) for line in src.open(encoding="utf-8")]
     results_dir = Path(__file__).resolve().parents[1] / "results"
     results_dir.mkdir(parents=True, exist_ok=True)
 
+    # Stream the log (and its rotated segments): rows go straight to the CSV
     csv_path = results_dir / "evaluation_summary.csv"
     fields = ["ts","feature","model","temperature","latency_s","tokens_in","tokens_out","est_cost","ok","schema_ok"]
+    latencies, wf, sv, n = [], 0, 0, 0
     with csv_path.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=fields); w.writeheader()
-        for r in records: w.writerow({k: r.get(k) for k in fields})
-
-    latencies = [r["latency_s"] for r in records if r.get("latency_s") is not None]
-    wf = sum(1 for r in records if r.get("ok")); sv = sum(1 for r in records if r.get("schema_ok"))
-    n = len(records) or 1
+        for r in iter_records(src):
+            w.writerow({k: r.get(k) for k in fields})
+            n += 1; wf += bool(r.get("ok")); sv += bool(r.get("schema_ok"))
+            if r.get("latency_s") is not None: latencies.append(r["latency_s"])
+    n = n or 1
 
     plt.figure(); plt.hist(latencies, bins=20); plt.title("Latency distribution")
     plt.xlabel("seconds"); plt.ylabel("count"); plt.tight_layout()
@@ -0,0 +1,232 @@
+# pm_eval/flow_benchmark.py — regression benchmark for the flow prompts
+#
+# Replays the generate_flow_from_vision / update_flow_with_llm prompts from a
+# recorded corpus, built with the app's own prompt builders (so prompt changes
+# are measured), against a real model or pm_eval/mock_openai_server.py.
+# Replies are validated with pm_app.schemas.ProjectFlow. Results are stored in
+# $EVAL_OUTPUT_DIR/flow_benchmark.sqlite3 keyed by git revision and model, and
+# each run is compared with a baseline revision: latency, token counts and the
+# validity rate are flagged when they get worse by more than the tolerances.
+#
+#   python -m pm_eval.flow_benchmark --model gpt-4o-2024-08-06 --runs 3
+#   python -m pm_eval.flow_benchmark --baseline 313793e      # compare with a given revision
+#
+# The corpus is JSONL, one {"kind": "generate_flow" | "update_flow", "inputs": {...}}
+# per line. pm_eval/flow_corpus.jsonl is seeded from pm_app's sample data; set
+# FLOW_PROMPT_CORPUS=<path> on the app to record the prompts real users send.
+# Exits with status 1 when a regression is found, so it can gate CI.
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pm_tool.settings")
+import django  # noqa: E402
+django.setup()
+
+from openai import OpenAI  # noqa: E402
+from pm_app.openapi_client import FLOW_MODEL, generate_flow_messages, update_flow_messages, validate_flow  # noqa: E402
+from pm_app.telemetry import call_llm  # noqa: E402
+
+BASE_DIR = Path(__file__).parent
+CORPUS_PATH = BASE_DIR / "flow_corpus.jsonl"
+DB_PATH = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "flow_benchmark.sqlite3"
+
+BUILDERS = {
+    "generate_flow": lambda inputs: generate_flow_messages(
+        inputs["vision_text"], inputs["sample_project"], inputs["teams_data"]),
+    "update_flow": update_flow_messages,
+}
+
+# A metric regresses when it is worse than the baseline by more than this
+LATENCY_TOL = 0.20       # relative, on median and p95 latency
+MIN_LATENCY_DELTA = 0.05  # seconds; smaller moves are noise
+TOKENS_TOL = 0.10        # relative, on mean tokens in / out
+VALIDITY_TOL = 0.05      # absolute drop in the valid-reply rate
+
+
+# ---- corpus ----
+def load_corpus(path: Path) -> list:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            if case.get("kind") not in BUILDERS:
+                print(f"Skipping corpus entry with unknown kind: {case.get('kind')!r}")
+                continue
+            # Recorded entries have no id; hash the inputs so it is stable as the corpus grows
+            case.setdefault("id", f"{case['kind']}-" + hashlib.sha1(
+                json.dumps(case["inputs"], sort_keys=True).encode("utf-8")).hexdigest()[:10])
+            cases.append(case)
+    return cases
+
+
+def git_revision() -> str:
+    """Short HEAD hash, with -dirty when tracked files have uncommitted changes."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=BASE_DIR).returncode != 0
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---- results store ----
+def open_db(path=DB_PATH) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            rev TEXT, model TEXT, case_id TEXT, kind TEXT, run INTEGER, ts TEXT,
+            latency_s REAL, ttft_s REAL, tokens_in INTEGER, tokens_out INTEGER, valid INTEGER, error TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS results_rev_model ON results (rev, model)")
+    return conn
+
+
+def run_case(client, case: dict, model: str, run: int) -> dict:
+    row = {"case_id": case["id"], "kind": case["kind"], "run": run, "ts": datetime.utcnow().isoformat(),
+           "latency_s": None, "ttft_s": None, "tokens_in": None, "tokens_out": None, "valid": 0, "error": None}
+    try:
+        result = call_llm(
+            client, feature=f"benchmark:{case['kind']}", model=model, source="benchmark", log=False,
+            messages=BUILDERS[case["kind"]](case["inputs"]),
+            response_format={"type": "json_object"},
+            validate=validate_flow,
+        )
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    rec = result.record
+    row.update(latency_s=rec["latency_s"], ttft_s=rec["ttft_s"], tokens_in=rec["tokens_in"],
+               tokens_out=rec["tokens_out"], valid=int(result.data is not None), error=rec["error"])
+    return row
+
+
+def run_benchmark(conn, client, cases: list, model: str, rev: str, runs: int):
+    # A rerun at the same revision replaces that revision's results
+    with conn:
+        conn.execute("DELETE FROM results WHERE rev = ? AND model = ?", (rev, model))
+    for case in cases:
+        for run in range(runs):
+            row = run_case(client, case, model, run)
+            with conn:
+                conn.execute(
+                    "INSERT INTO results VALUES (:rev, :model, :case_id, :kind, :run, :ts, :latency_s, :ttft_s,"
+                    " :tokens_in, :tokens_out, :valid, :error)", {"rev": rev, "model": model, **row})
+            status = "valid" if row["valid"] else (row["error"] or "invalid")
+            print(f"  {case['id']} run {run + 1}/{runs}: {row['latency_s']}s, "
+                  f"{row['tokens_in']}/{row['tokens_out']} tokens, {status}")
+
+
+# ---- summaries and comparison ----
+def _p95(xs):
+    xs = sorted(xs)
+    return xs[int(0.95 * (len(xs) - 1))]
+
+
+def summarise(conn, rev: str, model: str) -> dict:
+    """kind -> {n, valid_rate, latency_p50, latency_p95, ttft_p50, tokens_in, tokens_out}."""
+    rows = conn.execute("SELECT kind, latency_s, ttft_s, tokens_in, tokens_out, valid FROM results "
+                        "WHERE rev = ? AND model = ?", (rev, model)).fetchall()
+    out = {}
+    for kind in sorted({r[0] for r in rows}):
+        rs = [r for r in rows if r[0] == kind]
+        lat = [r[1] for r in rs if r[1] is not None]
+        ttft = [r[2] for r in rs if r[2] is not None]
+        tin = [r[3] for r in rs if r[3] is not None]
+        tout = [r[4] for r in rs if r[4] is not None]
+        out[kind] = {
+            "n": len(rs),
+            "valid_rate": round(sum(r[5] for r in rs) / len(rs), 3),
+            "latency_p50": round(statistics.median(lat), 3) if lat else None,
+            "latency_p95": round(_p95(lat), 3) if lat else None,
+            "ttft_p50": round(statistics.median(ttft), 3) if ttft else None,
+            "tokens_in": round(statistics.fmean(tin), 1) if tin else None,
+            "tokens_out": round(statistics.fmean(tout), 1) if tout else None,
+        }
+    return out
+
+
+def latest_other_revision(conn, rev: str, model: str):
+    hit = conn.execute("SELECT rev FROM results WHERE model = ? AND rev != ? GROUP BY rev ORDER BY MAX(ts) DESC LIMIT 1",
+                       (model, rev)).fetchone()
+    return hit[0] if hit else None
+
+
+def regressions(current: dict, baseline: dict) -> list:
+    """Human-readable findings for every metric that got worse than the tolerances allow."""
+    found = []
+    for kind, cur in current.items():
+        base = baseline.get(kind)
+        if not base:
+            continue
+        for key in ("latency_p50", "latency_p95"):
+            if cur[key] is not None and base[key] is not None \
+                    and cur[key] > base[key] * (1 + LATENCY_TOL) and cur[key] - base[key] > MIN_LATENCY_DELTA:
+                found.append(f"{kind}: {key} {base[key]}s -> {cur[key]}s")
+        for key in ("tokens_in", "tokens_out"):
+            if cur[key] is not None and base[key] is not None and cur[key] > base[key] * (1 + TOKENS_TOL):
+                found.append(f"{kind}: {key} {base[key]} -> {cur[key]}")
+        if cur["valid_rate"] < base["valid_rate"] - VALIDITY_TOL:
+            found.append(f"{kind}: valid_rate {base['valid_rate']} -> {cur['valid_rate']}")
+    return found
+
+
+def print_summary(label: str, summary: dict):
+    print(f"\n=== {label} ===")
+    for kind, s in summary.items():
+        print(f"{kind:14} " + "  ".join(f"{k}={v}" for k, v in s.items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded flow prompts and flag latency/token/validity regressions.")
+    ap.add_argument("--model", default=os.getenv("EVAL_MODEL", FLOW_MODEL))
+    ap.add_argument("--runs", type=int, default=3, help="replays of each corpus entry")
+    ap.add_argument("--corpus", default=str(CORPUS_PATH))
+    ap.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="e.g. the mock server's /v1 URL")
+    ap.add_argument("--rev", default=None, help="label for this run (default: git HEAD, -dirty if modified)")
+    ap.add_argument("--baseline", default=None, help="revision to compare with (default: the latest other one)")
+    ap.add_argument("--compare-only", action="store_true", help="don't call the model; compare stored results")
+    ap.add_argument("--db", default=str(DB_PATH))
+    args = ap.parse_args()
+
+    conn = open_db(args.db)
+    rev = args.rev or git_revision()
+    if not args.compare_only:
+        cases = load_corpus(Path(args.corpus))
+        print(f"Replaying {len(cases)} prompt(s) x {args.runs} against {args.model} at {rev}")
+        t0 = time.perf_counter()
+        run_benchmark(conn, OpenAI(base_url=args.base_url or None), cases, args.model, rev, args.runs)
+        print(f"Done in {time.perf_counter() - t0:.1f}s")
+
+    current = summarise(conn, rev, args.model)
+    print_summary(f"{rev} / {args.model}", current)
+    baseline_rev = args.baseline or latest_other_revision(conn, rev, args.model)
+    if not baseline_rev:
+        print("\nNo baseline revision stored for this model yet; these results are the baseline.")
+        return
+    baseline = summarise(conn, baseline_rev, args.model)
+    print_summary(f"baseline {baseline_rev} / {args.model}", baseline)
+
+    found = regressions(current, baseline)
+    if found:
+        print("\nREGRESSIONS:")
+        for line in found:
+            print(f"  - {line}")
+        raise SystemExit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,32 @@ def is_well_formed(json_str: str) -> bool:
         return False
 
 
+# The flat shape pm_eval/perf.py's EVAL_SYSTEM_PROMPT asks for
+EVAL_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vision": {"type": "string"},
+        "outcomes": {"type": "array", "items": {"type": "string"}},
+        "benefits": {"type": "array", "items": {"type": "string"}},
+        "deliverables": {"type": "array", "items": {"type": "string"}},
+        "tasks": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["vision", "outcomes", "benefits", "deliverables", "tasks"],
+    "additionalProperties": False,
+}
+
+
 def validate_against_schema(json_str: str, schema: dict = None) -> bool:
     """
-    Validate JSON against a given schema (if provided).
-    For now, just checks if it’s valid JSON.
+    Validate JSON against a JSON Schema (a dict, e.g. EVAL_JSON_SCHEMA or
+    pm_app.schemas.ProjectFlow.model_json_schema()).
+    With no schema, just checks that it is valid JSON.
     """
     try:
         obj = json.loads(json_str)
-        # If no schema provided, just return True if JSON is valid
-        if schema is None:
-            return True
-        # TODO: Add schema validation (using `jsonschema` library) if needed
-        return True
     except Exception:
         return False
+    if schema is None:
+        return True
+    from jsonschema import Draft202012Validator
+    return Draft202012Validator(schema).is_valid(obj)
@@ -0,0 +1,191 @@
+# pm_eval/load_test.py — end-to-end load test of the Django endpoints
+#
+# scalability_test.py only measures the OpenAI API. This drives our own views
+# the way a user session does (create a plan, view it, edit it, load the Gantt
+# chart, download both plans) with a concurrency ramp, so worker saturation,
+# SQLite lock contention and Matplotlib/DOCX render cost show up.
+#
+# Run the app against the mock LLM so results are about our server, not OpenAI:
+#
+#   python -m pm_eval.mock_openai_server --latency lognormal:-0.7,0.3 &
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python manage.py runserver --noreload &
+#   python -m pm_eval.load_test --ramp 1,5,10,20 --stage-seconds 60 --mix full
+#
+# Results go to load_test_results.csv (per stage and endpoint) next to
+# scalability_results.csv; plot_scalability_all.py picks both up.
+
+import argparse
+import asyncio
+import csv
+import random
+import re
+import time
+from pathlib import Path
+
+import httpx
+
+HERE = Path(__file__).parent
+CSV_NAME = HERE / "load_test_results.csv"
+REQUEST_TIMEOUT_S = 120
+
+ENDPOINTS = ["create", "view", "edit", "gantt", "comm_plan", "financial_plan"]
+
+# Probability that a session performs each step. Sessions that skip "create"
+# reuse a project created earlier in the run (or one passed with --projects).
+MIXES = {
+    "full":       {"create": 1.0, "view": 1.0, "edit": 1.0, "gantt": 1.0, "comm_plan": 1.0, "financial_plan": 1.0},
+    "read_heavy": {"create": 0.1, "view": 1.0, "edit": 0.1, "gantt": 1.0, "comm_plan": 0.5, "financial_plan": 0.5},
+    "edit_heavy": {"create": 0.2, "view": 1.0, "edit": 1.0, "gantt": 0.3, "comm_plan": 0.1, "financial_plan": 0.1},
+    "documents":  {"create": 0.05, "view": 0.0, "edit": 0.0, "gantt": 1.0, "comm_plan": 1.0, "financial_plan": 1.0},
+}
+
+VISIONS = [
+    "Transition from a manual to fully automated product launch process.",
+    "Consolidate disparate data sources into a single source of truth.",
+    "Transition the client service team away from administrative activities towards sales.",
+    "Launch a customer self-service portal to cut support call volume by a third.",
+]
+
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+PROJECT_URL_RE = re.compile(r"/project/(\d+)/")
+OUTCOME_ID_RE = re.compile(r'class="outcome-item" data-id="(\d+)"')
+
+
+class Recorder:
+    """Collects (endpoint, latency, ok) samples for the current stage."""
+
+    def __init__(self):
+        self.samples = []
+
+    async def timed(self, endpoint, coro):
+        t0 = time.perf_counter()
+        try:
+            resp = await coro
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            resp, ok = None, False
+        self.samples.append((endpoint, time.perf_counter() - t0, ok))
+        return resp if ok else None
+
+
+async def run_session(client: httpx.AsyncClient, rec: Recorder, mix: dict, projects: list, rng: random.Random):
+    """One user session; steps are skipped when an earlier one failed."""
+    do = {step: rng.random() < p for step, p in mix.items()}
+    if do["create"] or not projects:
+        page = await client.get("/")
+        m = CSRF_INPUT_RE.search(page.text)
+        token = m.group(1) if m else client.cookies.get("csrftoken", "")
+        resp = await rec.timed("create", client.post(
+            "/", data={"prompt": rng.choice(VISIONS), "csrfmiddlewaretoken": token},
+            headers={"Referer": str(client.base_url)}, follow_redirects=False))
+        m = PROJECT_URL_RE.search(resp.headers.get("location", "")) if resp is not None else None
+        if not m:
+            return
+        project_id = int(m.group(1))
+        projects.append(project_id)
+    else:
+        project_id = rng.choice(projects)
+
+    base = f"/project/{project_id}"
+    outcome_ids = []
+    if do["view"] or do["edit"]:  # editing needs the item ids from the page
+        resp = await rec.timed("view", client.get(f"{base}/"))
+        if resp is None:
+            return
+        outcome_ids = OUTCOME_ID_RE.findall(resp.text)
+
+    if do["edit"]:
+        if outcome_ids:
+            body = {"edited_field": "outcomes", "source_of_change": "user",
+                    "payload": {"id": rng.choice(outcome_ids), "description": f"Revised outcome {rng.randint(1, 999)}"}}
+        else:
+            body = {"edited_field": "vision", "source_of_change": "user",
+                    "payload": {"vision": rng.choice(VISIONS)}}
+        await rec.timed("edit", client.post(f"{base}/update-flow/", json=body,
+                                            headers={"X-CSRFToken": client.cookies.get("csrftoken", "")}))
+
+    if do["gantt"]:
+        await rec.timed("gantt", client.get(f"{base}/gantt-data/"))
+    if do["comm_plan"]:
+        await rec.timed("comm_plan", client.get(f"{base}/download-comm-plan.docx/"))
+    if do["financial_plan"]:
+        await rec.timed("financial_plan", client.get(f"{base}/download-financial-plan.docx/"))
+
+
+async def virtual_user(base_url, rec, mix, projects, deadline, seed):
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+        while time.perf_counter() < deadline:
+            await run_session(client, rec, mix, projects, rng)
+
+
+async def run_stage(base_url, users, seconds, mix, projects, seed):
+    rec = Recorder()
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    await asyncio.gather(*(virtual_user(base_url, rec, mix, projects, deadline, seed * 1000 + i)
+                           for i in range(users)))
+    return rec.samples, time.perf_counter() - t0
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (same convention as scalability_test.p95)."""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[int(round(q * (len(values) - 1)))]
+
+
+def summarise_stage(stage, users, samples, elapsed):
+    rows = []
+    for endpoint in ENDPOINTS + ["all"]:
+        picked = [s for s in samples if endpoint == "all" or s[0] == endpoint]
+        if not picked:
+            continue
+        lat = [s[1] for s in picked]
+        errors = sum(1 for s in picked if not s[2])
+        rows.append({
+            "Stage": stage, "ConcurrentUsers": users, "Endpoint": endpoint,
+            "Requests": len(picked), "Errors": errors,
+            "ErrorRate_%": round(100.0 * errors / len(picked), 2),
+            "Throughput_rps": round(len(picked) / elapsed, 3),
+            "AvgLatency_s": round(sum(lat) / len(lat), 4),
+            "P50Latency_s": round(percentile(lat, 0.50), 4),
+            "P95Latency_s": round(percentile(lat, 0.95), 4),
+            "P99Latency_s": round(percentile(lat, 0.99), 4),
+        })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Drive realistic user sessions against a running pm_tool server.")
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--ramp", default="1,5,10,20", help="comma-separated concurrent users per stage")
+    ap.add_argument("--stage-seconds", type=float, default=60)
+    ap.add_argument("--mix", choices=sorted(MIXES), default="full")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--projects", default="", help="comma-separated ids of existing projects to include in the pool")
+    ap.add_argument("--out", default=str(CSV_NAME))
+    args = ap.parse_args()
+
+    mix, rows = MIXES[args.mix], []
+    projects = [int(x) for x in args.projects.split(",") if x.strip()]
+    for stage, users in enumerate(int(x) for x in args.ramp.split(",")):
+        samples, elapsed = asyncio.run(run_stage(args.base_url, users, args.stage_seconds, mix, projects, args.seed + stage))
+        stage_rows = summarise_stage(stage, users, samples, elapsed)
+        rows += stage_rows
+        for r in stage_rows:
+            print(f"[n={users:>3}] {r['Endpoint']:<15} req={r['Requests']:>5}  rps={r['Throughput_rps']:>7.2f}  "
+                  f"p50={r['P50Latency_s']:.3f}s  p95={r['P95Latency_s']:.3f}s  p99={r['P99Latency_s']:.3f}s  "
+                  f"err={r['ErrorRate_%']:.1f}%")
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["Stage"])
+        w.writeheader()
+        w.writerows(rows)
+    print(f"\nSaved CSV -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
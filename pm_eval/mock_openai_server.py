@@ -0,0 +1,337 @@
+# pm_eval/mock_openai_server.py — local stand-in for the OpenAI chat-completions API
+#
+# Speaks enough of /v1/chat/completions (plain and SSE streaming) for the app,
+# perf.py and scalability_test.py to run offline. Latency, token rate and
+# failures are configurable so load tests can reproduce slow or flaky upstreams.
+#
+#   python -m pm_eval.mock_openai_server --port 8765 --latency lognormal:-0.5,0.4 \
+#       --tokens-per-s 60 --error-rate 0.02 --rate-limit-rate 0.05
+#
+# then point the clients at it:
+#
+#   export OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock
+#   python manage.py runserver
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+TEAMS = ["Engineering", "Product", "Marketing", "Operations", "Finance", "Data & Analytics"]
+CHARS_PER_TOKEN = 4  # rough English average, good enough for usage numbers
+
+
+# ---- latency distributions ----
+def parse_latency(spec: str):
+    """
+    Turns a spec into a sampler returning seconds:
+      "0.2"                 fixed
+      "uniform:0.1,0.6"     uniform between the bounds
+      "normal:0.8,0.2"      mean, stdev (clipped at 0)
+      "lognormal:-0.5,0.4"  mu, sigma of the underlying normal
+      "exp:0.5"             exponential with the given mean
+    """
+    kind, _, args = (spec or "0").partition(":")
+    if not args:
+        fixed = float(kind)
+        return lambda rng: fixed
+    a = [float(x) for x in args.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(a[0], a[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(a[0], a[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(a[0], a[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / a[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# ---- synthetic payloads ----
+def synthetic_flow(rng: random.Random, outcomes=5, benefits=2, deliverables=2, tasks=3) -> dict:
+    """A flow that validates against pm_app.schemas.ProjectFlow."""
+    return {
+        "title": f"Mock project {rng.randint(1000, 9999)}",
+        "outcomes": [{
+            "description": f"Outcome {o + 1}: improve delivery capability area {o + 1}",
+            "benefits": [{
+                "description": f"Benefit {o + 1}.{b + 1}: measurable gain in area {o + 1}",
+                "deliverables": [{
+                    "description": f"Deliverable {o + 1}.{b + 1}.{d + 1}",
+                    "tasks": [{
+                        "name": f"Task {o + 1}.{b + 1}.{d + 1}.{t + 1}",
+                        "responsible_team": rng.choice(TEAMS),
+                        "duration": rng.randint(2, 20),
+                    } for t in range(tasks)],
+                } for d in range(deliverables)],
+            } for b in range(benefits)],
+        } for o in range(outcomes)],
+    }
+
+
+def synthetic_comm_plan(rng: random.Random) -> dict:
+    roles = ["Sponsor", "Delivery Lead", "Product", "Technology", "Finance", "Operations",
+             "Legal", "Customer Success", "Marketing", "Supplier"]
+    return {
+        "Objective": "Keep stakeholders aligned on scope, schedule, risks and decisions.",
+        "Stakeholders": [{
+            "Name": f"{role} Lead", "Role": role,
+            "CommunicationMethod": rng.choice(["Status Email", "Standup", "SteerCo", "Board Pack"]),
+            "Frequency": rng.choice(["Weekly", "Fortnightly", "Monthly"]),
+            "Responsible": "Project Manager", "Priority": rng.choice(["High", "Medium", "Low"]),
+            "PreferredDeliveryMethod": rng.choice(["Email", "MS Teams", "Slack"]),
+            "CommunicationGoal": f"Keep {role.lower()} informed",
+        } for role in roles],
+        "Channels": ["Email", "MS Teams", "Standup", "SteerCo"],
+        "Notes": "Generated by the mock OpenAI server.",
+    }
+
+
+def synthetic_financial_plan(rng: random.Random) -> dict:
+    return {
+        "summary": "The plan phases spend across four stages with a contingency reserve.",
+        "stages": [{"name": n, "duration": f"{rng.randint(4, 16)} weeks", "cost": f"£{rng.randint(20, 200) * 1000:,}"}
+                   for n in ("Initiation", "Planning", "Execution", "Closure")],
+        "expenses": [{"category": c, "cost": f"£{rng.randint(10, 120) * 1000:,}"}
+                     for c in ("Staff", "Software", "Training", "Marketing", "Contingency")],
+        "cashflow": {"initial_investment": "£150,000", "monthly_outflow": "£25,000",
+                     "expected_return_on_investment_roi": "18%", "break_even_point": "Month 14"},
+        "tolerance": {"time_tolerance": "10%", "cost_tolerance": "15%", "quality_tolerance": "5%"},
+        "governance": "Monthly financial reviews with the sponsor; changes over tolerance go to the board.",
+    }
+
+
+def synthetic_eval_json(rng: random.Random) -> dict:
+    """The flat shape pm_eval/perf.py asks for."""
+    return {
+        "vision": "Mock vision",
+        "outcomes": [f"Outcome {i + 1}" for i in range(3)],
+        "benefits": [f"Benefit {i + 1}" for i in range(3)],
+        "deliverables": [f"Deliverable {i + 1}" for i in range(4)],
+        "tasks": [f"Task {i + 1}" for i in range(6)],
+    }
+
+
+def synthetic_content(messages: list, rng: random.Random, flow_size: dict) -> str:
+    """Picks the payload by looking at what the prompt asks for."""
+    text = " ".join(str(m.get("content") or "") for m in messages)
+    if "Communication Plan" in text:
+        obj = synthetic_comm_plan(rng)
+    elif "Financial Plan" in text:
+        obj = synthetic_financial_plan(rng)
+    elif "Required keys: vision" in text:
+        obj = synthetic_eval_json(rng)
+    else:
+        obj = synthetic_flow(rng, **flow_size)
+    return json.dumps(obj)
+
+
+def load_canned(path: str | None) -> dict:
+    """
+    Canned responses: {"<substring of the prompt>": <object or string>, "default": ...}.
+    The first key found in the prompt wins; "default" is used when nothing matches.
+    """
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r".{1,%d}" % CHARS_PER_TOKEN, text, re.S)
+
+
+# ---- server ----
+class MockState:
+    def __init__(self, args):
+        self.latency = parse_latency(args.latency)
+        self.tokens_per_s = args.tokens_per_s
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.canned = load_canned(args.canned)
+        self.flow_size = {"outcomes": args.outcomes, "benefits": args.benefits,
+                          "deliverables": args.deliverables, "tasks": args.tasks}
+        self._rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors_500": 0, "errors_429": 0}
+
+    def rng(self) -> random.Random:
+        # One seeded parent, a child per request: reproducible without sharing state across threads
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def content_for(self, messages, rng) -> str:
+        text = " ".join(str(m.get("content") or "") for m in messages)
+        for key, value in self.canned.items():
+            if key != "default" and key in text:
+                return value if isinstance(value, str) else json.dumps(value)
+        if "default" in self.canned:
+            value = self.canned["default"]
+            return value if isinstance(value, str) else json.dumps(value)
+        return synthetic_content(messages, rng, self.flow_size)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, err_type: str, headers: dict = None):
+        self._json(status, {"error": {"message": message, "type": err_type, "param": None, "code": err_type}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/health"):
+            return self._json(200, {"status": "ok", **self.state.stats})
+        if self.path.rstrip("/") in ("/models", "/v1/models"):
+            return self._json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "owned_by": "mock"} for m in ("gpt-4o", "gpt-4o-2024-08-06", "gpt-4o-mini")]})
+        self._error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._error(400, "Request body is not valid JSON", "invalid_request_error")
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            return self._error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+        state = self.state
+        state.count("requests")
+        rng = state.rng()
+        roll = rng.random()
+        if roll < state.rate_limit_rate:
+            state.count("errors_429")
+            return self._error(429, "Rate limit reached (mock)", "rate_limit_exceeded",
+                               {"Retry-After": str(state.retry_after)})
+        if roll < state.rate_limit_rate + state.error_rate:
+            state.count("errors_500")
+            time.sleep(state.latency(rng))
+            return self._error(500, "The server had an error (mock)", "server_error")
+
+        messages = body.get("messages") or []
+        model = body.get("model") or "gpt-4o"
+        content = state.content_for(messages, rng)
+        usage = {
+            "prompt_tokens": max(1, sum(len(str(m.get("content") or "")) for m in messages) // CHARS_PER_TOKEN),
+            "completion_tokens": max(1, len(content) // CHARS_PER_TOKEN),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:24]}"
+
+        # time to first token
+        time.sleep(state.latency(rng))
+        if body.get("stream"):
+            state.count("streamed")
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return self._stream(completion_id, model, content, usage if include_usage else None)
+
+        if state.tokens_per_s:
+            time.sleep(usage["completion_tokens"] / state.tokens_per_s)
+        self._json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id, model, content, usage, tokens_per_chunk=4):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(**fields):
+            payload = {"id": completion_id, "object": "chat.completion.chunk",
+                       "created": int(time.time()), "model": model, **fields}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        def chunk(delta, finish=None):
+            send(choices=[{"index": 0, "delta": delta, "finish_reason": finish}])
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            toks = _tokens(content)
+            for i in range(0, len(toks), tokens_per_chunk):
+                if self.state.tokens_per_s:
+                    time.sleep(tokens_per_chunk / self.state.tokens_per_s)
+                chunk({"content": "".join(toks[i:i + tokens_per_chunk])})
+            chunk({}, "stop")
+            if usage:
+                send(choices=[], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-stream
+
+
+def make_server(args) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((args.host, args.port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.state = MockState(args)
+    server.verbose = args.verbose
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Local mock of the OpenAI chat-completions API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", default="0.2", help='time to first token, e.g. "0.2", "uniform:0.1,0.6", "lognormal:-0.5,0.4"')
+    ap.add_argument("--tokens-per-s", type=float, default=0.0, help="completion token rate (0 = instant)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    ap.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    ap.add_argument("--canned", help="JSON file of canned responses keyed by prompt substring")
+    ap.add_argument("--outcomes", type=int, default=5)
+    ap.add_argument("--benefits", type=int, default=2)
+    ap.add_argument("--deliverables", type=int, default=2)
+    ap.add_argument("--tasks", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--verbose", action="store_true")
+    return ap
+
+
+def main():
+    args = build_parser().parse_args()
+    server = make_server(args)
+    print(f"Mock OpenAI listening on http://{args.host}:{server.server_address[1]}/v1  (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,16 @@ import os
 import time
 import json
 import statistics
-from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv, find_dotenv
 from openai import OpenAI
 
+# Pricing, the JSONL sink and the instrumented call are shared with the app
+from pm_app.telemetry import (
+    PRICES_PER_1K_GBP, estimate_cost_gbp, call_llm, base_record, log_record, sink,
+)
+
 
 # ---- load .env (.env can live in cwd or project root) ----
 # Try auto-discovery first (current dir or parents)
@@ -26,6 +30,7 @@ if not os.getenv("OPENAI_API_KEY"):
 USE_MOCK   = os.getenv("USE_MOCK", "false").lower() == "true"
 EVAL_MODEL = os.getenv("EVAL_MODEL", "gpt-4o")
 API_KEY    = os.getenv("OPENAI_API_KEY")  # required for real runs
+BASE_URL   = os.getenv("OPENAI_BASE_URL") or None  # e.g. the local mock_openai_server
 
 # Fail fast if we’re not mocking and the key is missing
 if not USE_MOCK and not API_KEY:
@@ -35,7 +40,7 @@ if not USE_MOCK and not API_KEY:
     )
 
 # Create OpenAI client only for real runs (OpenAI 1.x syntax)
-client = OpenAI(api_key=API_KEY) if not USE_MOCK else None
+client = OpenAI(api_key=API_KEY, base_url=BASE_URL) if not USE_MOCK else None
 
 
 #write logs OUTSIDE the repo 
@@ -47,6 +52,7 @@ def _default_log_dir() -> Path:
 
 LOG_DIR = _default_log_dir()
 API_LOG = LOG_DIR / "api_metrics.jsonl"
+sink.path = API_LOG  # resolved after .env is loaded, so point the shared sink here
 
 
 # 1) LLM call (real or mock), returning JSON text 
@@ -75,100 +81,64 @@ def _mock_llm_call(prompt: str):
     return {"text": js, "usage": usage}
 
 
-def _real_llm_call(prompt: str, *, model: str = "gpt-4o", temperature: float = 0.2):
-    """
-    Real OpenAI call for openai>=1.x using Chat Completions.
-    Returns ONLY JSON (no prose, no code fences).
-    """
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "Return ONLY valid JSON (no surrounding text, no backticks). "
-                    "Required keys: vision (string), outcomes (array of strings), "
-                    "benefits (array of strings), deliverables (array of strings), "
-                    "tasks (array of strings). No extra keys, no comments."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-    )
-    text = resp.choices[0].message.content or ""
-    # In 1.x, usage is available as attributes; keep fallbacks just in case.
-    usage = {}
-    if getattr(resp, "usage", None):
-        usage = {
-            "prompt_tokens": getattr(resp.usage, "prompt_tokens", 0),
-            "completion_tokens": getattr(resp.usage, "completion_tokens", 0),
-            # Some endpoints use input/output tokens; keep optional fallbacks:
-            "input_tokens": getattr(resp.usage, "input_tokens", None),
-            "output_tokens": getattr(resp.usage, "output_tokens", None),
-        }
-    return {"text": text, "usage": usage}
-
-
-def llm_call(prompt: str, *, model: str = None, temperature: float = 0.2):
-    model = model or EVAL_MODEL
-    return _mock_llm_call(prompt) if USE_MOCK else _real_llm_call(
-        prompt, model=model, temperature=temperature
-    )
-
+EVAL_SYSTEM_PROMPT = (
+    "Return ONLY valid JSON (no surrounding text, no backticks). "
+    "Required keys: vision (string), outcomes (array of strings), "
+    "benefits (array of strings), deliverables (array of strings), "
+    "tasks (array of strings). No extra keys, no comments."
+)
 
-#  2) COSTING (per 1K tokens) in GBP 
-# From your screenshot (Standard pricing, gpt-4o): $2.50 / $10.00 per 1M.
-# Using ~0.79 GBP/USD → £1.98 / £7.90 per 1M → divide by 1000 for per 1K.
-PRICES_PER_1K_GBP = {
-    "gpt-4o": {"input": 0.00198, "output": 0.00790},  # £ per 1K tokens
-    # Add others here if you ever use them:
-    # "gpt-4.1": {"input": ..., "output": ...},
-    # "gpt-4":   {"input": ..., "output": ...},
-}
 
-def estimate_cost_gbp(usage: dict, model: str) -> float:
-    price = PRICES_PER_1K_GBP.get(model)
-    if not price:
-        return 0.0
-    # Prefer prompt/completion; fall back to input/output if present
-    tin  = usage.get("prompt_tokens")     or usage.get("input_tokens")      or 0
-    tout = usage.get("completion_tokens") or usage.get("output_tokens")     or 0
-    return (tin / 1000.0) * price["input"] + (tout / 1000.0) * price["output"]
+#  2) COSTING: PRICES_PER_1K_GBP and estimate_cost_gbp live in pm_app/telemetry.py
+#     (imported above) so production calls are priced the same way.
 
 
 #  3) timed call + log 
-def call_with_timing(prompt: str, *, model=None, temperature=0.2, feature="vision2plan"):
+def _apply_checks(rec: dict, text: str, checks):
+    for field, check in (checks or {}).items():
+        try:
+            rec[field] = bool(check(text))
+        except Exception:
+            rec[field] = False
+
+
+def call_with_timing(prompt: str, *, model=None, temperature=0.2, feature="vision2plan", checks=None):
+    """
+    One eval call, logged once to api_metrics.jsonl through the shared telemetry sink.
+    Real calls go through pm_app.telemetry.call_llm (latency, TTFT, tokens, cost).
+    `checks` maps record fields to predicates on the reply text (e.g. {"ok": is_well_formed});
+    they are applied before the record is logged.
+    """
     model = model or EVAL_MODEL
+    if not USE_MOCK:
+        result = call_llm(
+            client, feature=feature, model=model, temperature=temperature, source="eval", log=False,
+            messages=[
+                {"role": "system", "content": EVAL_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        )
+        _apply_checks(result.record, result.text, checks)
+        log_record(result.record)
+        return result.text, result.record
+
     t0 = time.perf_counter()
-    resp = llm_call(prompt, model=model, temperature=temperature)
+    resp = _mock_llm_call(prompt)
     latency = round(time.perf_counter() - t0, 3)
-
     text  = resp.get("text", "")
     usage = resp.get("usage", {}) or {}
-    cost_gbp = round(estimate_cost_gbp(usage, model), 6)
 
-    rec = {
-        "ts": datetime.utcnow().isoformat(),
-        "feature": feature,
-        "model": model,
-        "temperature": temperature,
+    rec = base_record(feature=feature, model=model, temperature=temperature, source="eval")
+    rec.update({
         "latency_s": latency,
         "tokens_in":  usage.get("prompt_tokens")     or usage.get("input_tokens"),
         "tokens_out": usage.get("completion_tokens") or usage.get("output_tokens"),
-        "est_cost": cost_gbp,     # in GBP
-        "currency": "GBP",
+        "est_cost": round(estimate_cost_gbp(usage, model), 6),     # in GBP
         "raw_len": len(text),
-        # helpful debug flags
-        "pricing_model_key": model,
-        "pricing_applied": model in PRICES_PER_1K_GBP,
-        "used_mock": USE_MOCK,
-        # filled by JSON checks in runner:
-        "ok": None,
-        "schema_ok": None,
-    }
-    with API_LOG.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
+        "used_mock": True,
+    })
+    _apply_checks(rec, text, checks)
+    log_record(rec)
     return text, rec
 
 
@@ -34,8 +34,46 @@ plt.ylabel("Failure Rate (%)")
 plt.title("Scalability Test - Failure Rate vs Concurrency")
 plt.savefig(here / "scalability_failure_rate.png", bbox_inches="tight", dpi=160)
 
+# 4) End-to-end load test (pm_eval/load_test.py), if it has been run
+load_csv = here / "load_test_results.csv"
+if load_csv.exists():
+    lt = pd.read_csv(load_csv).sort_values("ConcurrentUsers")
+    per_endpoint = lt[lt["Endpoint"] != "all"]
+
+    plt.figure()
+    for name, g in per_endpoint.groupby("Endpoint"):
+        plt.plot(g["ConcurrentUsers"], g["P95Latency_s"], marker="o", label=name)
+    plt.xlabel("Concurrent Users")
+    plt.ylabel("P95 Latency (s)")
+    plt.title("Load Test - P95 Latency per Endpoint")
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(here / "load_test_p95_latency.png", bbox_inches="tight", dpi=160)
+
+    plt.figure()
+    total = lt[lt["Endpoint"] == "all"]
+    plt.plot(total["ConcurrentUsers"], total["Throughput_rps"], marker="o")
+    plt.xlabel("Concurrent Users")
+    plt.ylabel("Throughput (requests/s)")
+    plt.title("Load Test - Throughput vs Concurrency")
+    plt.grid(True)
+    plt.savefig(here / "load_test_throughput.png", bbox_inches="tight", dpi=160)
+
+    plt.figure()
+    for name, g in per_endpoint.groupby("Endpoint"):
+        plt.plot(g["ConcurrentUsers"], g["ErrorRate_%"], marker="o", label=name)
+    plt.xlabel("Concurrent Users")
+    plt.ylabel("Error Rate (%)")
+    plt.title("Load Test - Error Rate per Endpoint")
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(here / "load_test_error_rate.png", bbox_inches="tight", dpi=160)
+
 print("Saved plots:")
 print(" - scalability_avg_latency.png")
 print(" - scalability_p95_latency.png")
 print(" - scalability_failure_rate.png")
-
+if load_csv.exists():
+    print(" - load_test_p95_latency.png")
+    print(" - load_test_throughput.png")
+    print(" - load_test_error_rate.png")
@@ -1,10 +1,7 @@
 # pm_eval/run_perf_suite.py  — JSON validity & performance runner
 
-from pathlib import Path
-import json
-
-from pm_eval.perf import call_with_timing, summarise_latencies, API_LOG
-from pm_eval.json_checks import is_well_formed, validate_against_schema  # <— use JSON checks
+from pm_eval.perf import call_with_timing, summarise_latencies
+from pm_eval.json_checks import is_well_formed, validate_against_schema, EVAL_JSON_SCHEMA  # <— use JSON checks
 
 # Test prompts (add more to broaden coverage)
 PROMPTS = [
@@ -16,26 +13,18 @@ PROMPTS = [
 def run_trials(prompts, n_per_prompt=5, *, model="gpt-4", temperature=0.2, use_schema=True):
     """
     Runs multiple trials and records latency + JSON validity.
-    If use_schema is True, validate_against_schema() is called (no external file needed).
+    If use_schema is True, replies are validated against EVAL_JSON_SCHEMA (no external file needed).
+    Each record is logged once, by call_with_timing, with the checks already applied.
     """
+    # JSON well-formed? JSON schema/structure check (see json_checks.py)
+    checks = {"ok": is_well_formed}
+    if use_schema:
+        checks["schema_ok"] = lambda text: validate_against_schema(text, EVAL_JSON_SCHEMA)
     records = []
     for p in prompts:
         for _ in range(n_per_prompt):
-            json_text, rec = call_with_timing(p, model=model, temperature=temperature)
-            # JSON well-formed?
-            rec["ok"] = is_well_formed(json_text)
-            # JSON schema/structure check (lightweight; see json_checks.py)
-            if use_schema:
-                try:
-                    rec["schema_ok"] = validate_against_schema(json_text)
-                except Exception:
-                    rec["schema_ok"] = False
+            json_text, rec = call_with_timing(p, model=model, temperature=temperature, checks=checks)
             records.append(rec)
-
-    # Append to the private JSONL log
-    with Path(API_LOG).open("a", encoding="utf-8") as f:
-        for r in records:
-            f.write(json.dumps(r) + "\n")
     return records
 
 def success_rates(records):
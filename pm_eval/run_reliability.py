@@ -1,10 +1,19 @@
 # pm_eval/run_reliability.py
-import os, json, itertools, csv
+#
+# Calls run concurrently (--concurrency, optionally paced by --rate calls/s).
+# Every finished (prompt, temperature, repeat) cell is appended to
+# reliability/checkpoint.jsonl, so an interrupted run picks up where it stopped
+# when started again; the checkpoint is removed once the summary is written.
+#
+#   python -m pm_eval.run_reliability --concurrency 8 --rate 5
+import os, json, csv, argparse, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from statistics import mean, pstdev
 from datetime import datetime
 
 from pm_eval.perf import call_with_timing, LOG_DIR, EVAL_MODEL  # uses your existing module
+from pm_eval.similarity import tokens, jaccard_matrix, upper_pairs
 
 # Prompts 
 CORE_PROMPTS = {
@@ -31,6 +40,7 @@ EDGE_PROMPTS = {
 
 TEMPS = [0.0, 0.2, 0.7]  # sampling settings to test
 REPEATS = 5              # runs per (prompt, temperature)
+CONCURRENCY = 8          # calls in flight at once
 
 # ---------- Helpers ----------
 def _try_parse_json(s: str):
@@ -41,9 +51,7 @@ def _try_parse_json(s: str):
 
 def _norm_text(s: str) -> set:
     # Lowercase, alnum-only tokens for simple Jaccard
-    import re
-    toks = re.findall(r"[a-z0-9]+", (s or "").lower())
-    return set(toks)
+    return set(tokens(s))
 
 def _norm_items(xs):
     out = set()
@@ -54,11 +62,6 @@ def _norm_items(xs):
             out.add(str(x))
     return out
 
-def jaccard(a: set, b: set) -> float:
-    if not a and not b: return 1.0
-    if not a or not b:  return 0.0
-    return len(a & b) / len(a | b)
-
 def pairwise_stats(values):
     """Return mean, std (population), min, max for a list; handle small samples."""
     if not values: return {"mean": None, "std": None, "min": None, "max": None}
@@ -71,23 +74,17 @@ def compare_batch(json_objs):
     Compute similarity across a batch of parsed JSON results from identical prompt runs.
     Returns metrics for: vision, outcomes, benefits, deliverables, tasks.
     """
-    vis_sims, out_sims, ben_sims, deliv_sims, task_sims = [], [], [], [], []
-
-    for a, b in itertools.combinations(json_objs, 2):
-        if not a or not b:  # skip invalid pairs
-            continue
+    valid = [o for o in json_objs if o]  # pairs with an invalid result are skipped
 
-        vis_a, vis_b = _norm_text(a.get("vision", "")), _norm_text(b.get("vision", ""))
-        outs_a, outs_b = _norm_items(a.get("outcomes")), _norm_items(b.get("outcomes"))
-        bens_a, bens_b = _norm_items(a.get("benefits")), _norm_items(b.get("benefits"))
-        dels_a, dels_b = _norm_items(a.get("deliverables")), _norm_items(b.get("deliverables"))
-        tasks_a, tasks_b = _norm_items(a.get("tasks")), _norm_items(b.get("tasks"))
+    def field_sims(key, norm):
+        # every pair of the batch at once (pm_eval/similarity.py), in combinations order
+        return upper_pairs(jaccard_matrix([norm(o.get(key)) for o in valid])) if len(valid) > 1 else []
 
-        vis_sims.append(jaccard(vis_a, vis_b))
-        out_sims.append(jaccard(outs_a, outs_b))
-        ben_sims.append(jaccard(bens_a, bens_b))
-        deliv_sims.append(jaccard(dels_a, dels_b))
-        task_sims.append(jaccard(tasks_a, tasks_b))
+    vis_sims = field_sims("vision", lambda v: _norm_text(v or ""))
+    out_sims = field_sims("outcomes", _norm_items)
+    ben_sims = field_sims("benefits", _norm_items)
+    deliv_sims = field_sims("deliverables", _norm_items)
+    task_sims = field_sims("tasks", _norm_items)
 
     return {
         "vision":  pairwise_stats(vis_sims),
@@ -98,11 +95,110 @@ def compare_batch(json_objs):
         "pairs": len(vis_sims)
     }
 
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads (rate <= 0: no limit)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _cell_key(pid, temp, repeat, model) -> str:
+    return f"{model}|{pid}|{temp}|{repeat}"
+
+
+def load_checkpoint(path: Path) -> dict:
+    """cell key -> {"text", "record"} for the cells finished by an earlier, interrupted run."""
+    done = {}
+    if path.exists():
+        for line in path.open(encoding="utf-8"):
+            try:
+                cell = json.loads(line)
+            except ValueError:  # torn last line from a kill mid-write
+                continue
+            done[cell["key"]] = cell
+    return done
+
+
+def _parse_check(text):
+    return _try_parse_json(text) is not None
+
+
+def run_cells(cells, concurrency: int, rate: float, checkpoint: Path) -> tuple:
+    """
+    Runs the (pid, prompt, temp, repeat) cells on a thread pool, appending each
+    finished one to the checkpoint. Returns ({key: cell}, failures, wall seconds).
+    """
+    limiter, lock, results, failures = RateLimiter(rate), threading.Lock(), {}, []
+    # treat JSON well-formed as schema_ok if you don’t run explicit schema
+    checks = {"ok": _parse_check, "schema_ok": _parse_check}
+
+    def run(pid, prompt, temp, repeat):
+        limiter.wait()
+        text, rec = call_with_timing(prompt, model=EVAL_MODEL, temperature=temp,
+                                     feature=f"reliability:{pid}", checks=checks)
+        cell = {"key": _cell_key(pid, temp, repeat, EVAL_MODEL), "text": text, "record": rec}
+        with lock, checkpoint.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(cell, default=str) + "\n")
+        return cell
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(run, *c): c for c in cells}
+        for i, fut in enumerate(as_completed(futures), 1):
+            try:
+                cell = fut.result()
+                results[cell["key"]] = cell
+            except Exception as e:
+                # The cell stays out of the checkpoint, so a rerun retries it
+                failures.append((futures[fut], e))
+            if i % 10 == 0 or i == len(futures):
+                print(f"  {i}/{len(futures)} calls finished ({len(failures)} failed)")
+    return results, failures, time.perf_counter() - t0
+
+
 # Runner
-def run_suite():
+def run_suite(concurrency=CONCURRENCY, rate=0.0, fresh=False):
     outputs_dir = Path(os.getenv("EVAL_OUTPUT_DIR", LOG_DIR)) / "reliability"
     outputs_dir.mkdir(parents=True, exist_ok=True)
 
+    all_prompts = {**{k: ("core", v) for k, v in CORE_PROMPTS.items()},
+                   **{k: ("edge", v) for k, v in EDGE_PROMPTS.items()}}
+
+    checkpoint = outputs_dir / "checkpoint.jsonl"
+    if fresh:
+        checkpoint.unlink(missing_ok=True)
+    done = load_checkpoint(checkpoint)
+    cells = [(pid, prompt, temp, k)
+             for temp in TEMPS for pid, (_, prompt) in all_prompts.items() for k in range(REPEATS)]
+    todo = [c for c in cells if _cell_key(c[0], c[2], c[3], EVAL_MODEL) not in done]
+    print(f"{len(cells)} calls in the suite: {len(cells) - len(todo)} resumed from {checkpoint.name}, "
+          f"{len(todo)} to run (concurrency={concurrency}, rate={rate or 'unlimited'}/s)")
+
+    new, failures, wall = run_cells(todo, concurrency, rate, checkpoint)
+    done.update(new)
+    if failures:
+        for (pid, _, temp, k), e in failures[:5]:
+            print(f"  failed: {pid} temp={temp} repeat={k}: {type(e).__name__}: {e}")
+        raise SystemExit(f"{len(failures)} call(s) failed; run again to retry them (finished calls are kept)")
+
+    # Sequential runtime would have been the sum of the call latencies
+    serial = sum(c["record"].get("latency_s") or 0.0 for c in new.values())
+    if new:
+        print(f"Ran {len(new)} calls in {wall:.1f}s wall vs {serial:.1f}s of call latency "
+              f"(~{serial / wall if wall else 0:.1f}x speedup over running them one by one)")
+
     # CSV summary file
     csv_path = outputs_dir / f"reliability_summary_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.csv"
     fieldnames = [
@@ -117,25 +213,17 @@ def run_suite():
         "sim_deliverables_mean", "sim_deliverables_std",
         "sim_tasks_mean", "sim_tasks_std",
     ]
-    writer = csv.DictWriter(csv_path.open("w", newline="", encoding="utf-8"), fieldnames=fieldnames)
+    csv_file = csv_path.open("w", newline="", encoding="utf-8")
+    writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
     writer.writeheader()
 
-    all_prompts = {**{k: ("core", v) for k, v in CORE_PROMPTS.items()},
-                   **{k: ("edge", v) for k, v in EDGE_PROMPTS.items()}}
-
+    # Rows in suite order regardless of the order the calls finished in
     for temp in TEMPS:
         for pid, (cat, prompt) in all_prompts.items():
-            records, parsed = [], []
-
-            # repeated calls
-            for _ in range(REPEATS):
-                text, rec = call_with_timing(prompt, model=EVAL_MODEL, temperature=temp, feature=f"reliability:{pid}")
-                # try parse & mark ok flags (don’t fail the run if parse fails)
-                jo = _try_parse_json(text)
-                rec["ok"] = jo is not None
-                rec["schema_ok"] = (jo is not None)  # treat JSON well-formed as schema_ok if you don’t run explicit schema
-                records.append(rec)
-                parsed.append(jo)
+            cells = [done[_cell_key(pid, temp, k, EVAL_MODEL)] for k in range(REPEATS)]
+            records = [c["record"] for c in cells]
+            # try parse (don’t fail the run if parse fails)
+            parsed = [_try_parse_json(c["text"]) for c in cells]
 
             # latency stats
             lats = [r["latency_s"] for r in records if r.get("latency_s") is not None]
@@ -186,7 +274,14 @@ def run_suite():
                 json.dumps({"records": records}, indent=2), encoding="utf-8"
             )
 
+    csv_file.close()
+    checkpoint.unlink(missing_ok=True)
     print(f"Reliability summary written to: {csv_path}")
 
 if __name__ == "__main__":
-    run_suite()
+    ap = argparse.ArgumentParser(description="Repeat each prompt per temperature and summarise JSON validity, latency and consistency.")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--rate", type=float, default=0.0, help="max calls started per second (0 = no limit)")
+    ap.add_argument("--fresh", action="store_true", help="ignore and delete an existing checkpoint")
+    args = ap.parse_args()
+    run_suite(concurrency=args.concurrency, rate=args.rate, fresh=args.fresh)
@@ -4,7 +4,8 @@ import aiohttp
 
 # CONFIG 
 API_KEY = ""
-URL = "https://api.openai.com/v1/chat/completions"
+# OPENAI_BASE_URL lets this run against pm_eval/mock_openai_server.py
+URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/chat/completions"
 
 sample_payload = {
     "model": "gpt-4o-mini",
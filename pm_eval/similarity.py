@@ -0,0 +1,129 @@
+# pm_eval/similarity.py — bulk pairwise similarity for the evaluation scripts
+#
+# Scripts that compare many outputs (run_reliability, llm_benchmark) or long
+# plans (accuracy_tests) used to loop over pairs with set operations or
+# difflib.SequenceMatcher, which is quadratic in text length. Here every input
+# is tokenised once and all pairs are scored together with NumPy:
+#
+#   jaccard_matrix(sets)          exact Jaccard via a 0/1 incidence matrix product,
+#                                 or a MinHash estimate when the batch is large
+#   edit_similarity_matrix(texts) SequenceMatcher.ratio() for short texts; otherwise
+#                                 Dice on character 5-gram shingles, 2J/(1+J), which
+#                                 tracks ratio() (also 2*matches/total) within a few
+#                                 points on prose without the quadratic alignment
+#                                 (shorter shingles saturate on long texts)
+#
+# method="exact", "shingle" or "minhash" forces a path; "auto" picks exact for
+# small inputs, so thresholds calibrated on the old numbers keep their meaning there.
+
+import itertools
+import re
+import zlib
+from difflib import SequenceMatcher
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SHINGLE_SIZE = 5
+NUM_PERM = 128                 # MinHash signature length (~0.09 std error on Jaccard)
+EXACT_MAX_CELLS = 5_000_000    # incidence matrix size (texts x distinct items) for exact Jaccard
+EXACT_MAX_CHARS = 2_000        # longest text still scored with SequenceMatcher
+
+_PRIME = (1 << 31) - 1
+
+
+def tokens(text: str) -> list:
+    """Lowercase alphanumeric tokens."""
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """Character k-grams of the whitespace-normalised text (the text itself if shorter)."""
+    s = " ".join((text or "").split())
+    if len(s) <= k:
+        return {s} if s else set()
+    return {s[i:i + k] for i in range(len(s) - k + 1)}
+
+
+def upper_pairs(matrix: np.ndarray) -> list:
+    """Values for i < j, in itertools.combinations order."""
+    return matrix[np.triu_indices(len(matrix), 1)].tolist()
+
+
+# ---- Jaccard ----
+def _incidence(sets: list) -> np.ndarray:
+    vocab = {}
+    rows, cols = [], []
+    for i, s in enumerate(sets):
+        for item in s:
+            rows.append(i)
+            cols.append(vocab.setdefault(item, len(vocab)))
+    x = np.zeros((len(sets), len(vocab)))
+    x[rows, cols] = 1.0
+    return x
+
+
+def exact_jaccard_matrix(sets: list) -> np.ndarray:
+    x = _incidence(sets)
+    inter = x @ x.T
+    sizes = x.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        j = np.where(union > 0, inter / union, 1.0)  # two empty sets count as identical
+    return j
+
+
+def minhash_signatures(sets: list, num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    """(len(sets), num_perm) MinHash signatures; items are hashed with crc32 so signatures are stable across runs."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    sig = np.full((len(sets), num_perm), _PRIME, dtype=np.uint64)
+    for i, s in enumerate(sets):
+        if not s:
+            continue
+        h = np.fromiter((zlib.crc32(str(item).encode("utf-8")) % _PRIME for item in s),
+                        dtype=np.uint64, count=len(s))
+        sig[i] = ((h[:, None] * a + b) % _PRIME).min(axis=0)
+    return sig
+
+
+def minhash_jaccard_matrix(sets: list, num_perm: int = NUM_PERM, chunk: int = 256) -> np.ndarray:
+    sig = minhash_signatures(sets, num_perm)
+    n = len(sets)
+    j = np.empty((n, n))
+    for start in range(0, n, chunk):  # bounds the (chunk, n, num_perm) comparison
+        j[start:start + chunk] = (sig[start:start + chunk, None, :] == sig[None, :, :]).mean(axis=2)
+    empty = np.array([not s for s in sets])
+    j[empty[:, None] != empty[None, :]] = 0.0
+    j[empty[:, None] & empty[None, :]] = 1.0
+    return j
+
+
+def jaccard_matrix(sets: list, method: str = "auto") -> np.ndarray:
+    """Pairwise Jaccard of sets of hashable items."""
+    sets = [set(s) for s in sets]
+    if method == "auto":
+        distinct = len(set().union(*sets)) if sets else 0
+        method = "exact" if len(sets) * distinct <= EXACT_MAX_CELLS else "minhash"
+    return exact_jaccard_matrix(sets) if method == "exact" else minhash_jaccard_matrix(sets)
+
+
+# ---- edit similarity ----
+def edit_similarity_matrix(texts: list, method: str = "auto") -> np.ndarray:
+    """Pairwise SequenceMatcher-style similarity in [0, 1]; see the module notes for the methods."""
+    texts = [t or "" for t in texts]
+    if method == "auto" and max(map(len, texts), default=0) <= EXACT_MAX_CHARS:
+        method = "exact"
+    if method == "exact":
+        n = len(texts)
+        m = np.eye(n)
+        for i, k in itertools.combinations(range(n), 2):
+            m[i, k] = m[k, i] = SequenceMatcher(None, texts[i], texts[k]).ratio()
+        return m
+    j = jaccard_matrix([shingles(t) for t in texts], "minhash" if method == "minhash" else "auto")
+    return 2 * j / (1 + j)
+
+
+def edit_similarity(a: str, b: str, method: str = "auto") -> float:
+    return float(edit_similarity_matrix([a, b], method)[0, 1])
@@ -1,14 +1,18 @@
 from __future__ import annotations
-import json
-from pathlib import Path
-from datetime import datetime
 import math
+import os
+from pathlib import Path
 
 import pandas as pd
 import matplotlib.pyplot as plt
 
-#config 
-LOG_PATH = Path.home() / "pm_eval_private" / "logs" / "api_metrics.jsonl"
+from pm_eval.telemetry_store import Agg, ingest, load_groups, scan_groups, hist_quantile, bin_value
+
+#config
+# Same file pm_eval/perf.py and the app's LLM telemetry write to
+LOG_PATH = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "api_metrics.jsonl"
+# Day-partitioned Parquet copy of the log with per-day aggregates (pm_eval/telemetry_store.py)
+STORE_DIR = LOG_PATH.parent / "telemetry_store"
 OUT_DIR  = Path(__file__).parent
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -16,126 +20,144 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 USERS_PER_DAY   = 50   # active users/day
 CALLS_PER_USER  = 5    # number of generations per user/day
 
-# load 
-if not LOG_PATH.exists():
-    raise SystemExit(f"Log file not found: {LOG_PATH}")
 
-df = pd.read_json(LOG_PATH, lines=True)
+# ------------------ helpers -----------------
+def _round(x, ndigits):
+    return None if x is None or math.isnan(x) else round(x, ndigits)
 
-# Keep only the fields we need
-cols = ["ts", "feature", "model", "temperature", "latency_s",
-        "tokens_in", "tokens_out", "est_cost", "currency",
-        "pricing_model_key", "used_mock"]
-df = df[[c for c in cols if c in df.columns]].copy()
 
-# Parse timestamp for optional resampling
-df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
+def _mean(total, n):
+    return total / n if n else float("nan")
 
-# ------------------ helpers -----------------
-def summary_block(frame: pd.DataFrame, label: str) -> pd.DataFrame:
-    """Return a one-row summary for a frame."""
-    if frame.empty:
+
+def summary_block(agg: Agg | None, label: str) -> pd.DataFrame:
+    """Return a one-row summary for a set of calls (quantiles are within 1% of exact)."""
+    if agg is None or not agg.n:
         return pd.DataFrame([{
             "label": label, "n": 0,
             "latency_mean": None, "latency_p50": None, "latency_p95": None, "latency_max": None,
             "tokens_in_mean": None, "tokens_out_mean": None, "cost_mean_gbp": None
         }])
-    q = frame["latency_s"].quantile
     return pd.DataFrame([{
         "label": label,
-        "n": int(len(frame)),
-        "latency_mean": round(frame["latency_s"].mean(), 3),
-        "latency_p50":  round(frame["latency_s"].median(), 3),
-        "latency_p95":  round(float(q(0.95)), 3),
-        "latency_max":  round(frame["latency_s"].max(), 3),
-        "tokens_in_mean":  round(frame["tokens_in"].mean(), 2),
-        "tokens_out_mean": round(frame["tokens_out"].mean(), 2),
-        "cost_mean_gbp":   round(frame["est_cost"].mean(), 6),
+        "n": int(agg.n),
+        "latency_mean": _round(_mean(agg.lat_sum, agg.lat_n), 3),
+        "latency_p50":  _round(hist_quantile(agg.lat_hist, 0.5), 3),
+        "latency_p95":  _round(hist_quantile(agg.lat_hist, 0.95), 3),
+        "latency_max":  _round(float(agg.lat_max), 3),
+        "tokens_in_mean":  _round(_mean(agg.tin_sum, agg.tin_n), 2),
+        "tokens_out_mean": _round(_mean(agg.tout_sum, agg.tout_n), 2),
+        "cost_mean_gbp":   _round(_mean(agg.cost_sum, agg.cost_n), 6),
     }])
 
-def percentiles(series: pd.Series, ps=(0.05,0.25,0.5,0.75,0.95)):
-    return {f"p{int(p*100)}": round(float(series.quantile(p)), 3) for p in ps}
-
-# ------------------ overall summary ------------------
-overall = summary_block(df, "overall")
-
-# Per-temperature
-per_temp = []
-for t, g in df.groupby("temperature", dropna=False):
-    per_temp.append(summary_block(g, f"temp={t}"))
-per_temp = pd.concat(per_temp, ignore_index=True)
-
-# Per-feature (e.g., reliability:p6_long, vision2plan)
-per_feat = []
-for f, g in df.groupby("feature", dropna=False):
-    per_feat.append(summary_block(g, f"feature={f}"))
-per_feat = pd.concat(per_feat, ignore_index=True).sort_values("n", ascending=False)
-
-#  outlier filtering (latency) 
-# Define outliers as > Q3 + 3*IQR (very conservative) — adjust if needed
-Q1 = df["latency_s"].quantile(0.25)
-Q3 = df["latency_s"].quantile(0.75)
-IQR = Q3 - Q1
-hi  = Q3 + 3*IQR
-df_nout = df[df["latency_s"] <= hi].copy()
-
-overall_nout = summary_block(df_nout, f"overall_no_outliers(≤{hi:.2f}s)")
-per_temp_nout = []
-for t, g in df_nout.groupby("temperature", dropna=False):
-    per_temp_nout.append(summary_block(g, f"temp={t}_no_outliers"))
-per_temp_nout = pd.concat(per_temp_nout, ignore_index=True)
-
-#save CSVs
-all_blocks = pd.concat([overall, per_temp, per_feat], ignore_index=True)
-all_blocks.to_csv(OUT_DIR / "metrics_summary.csv", index=False)
-
-all_blocks_nout = pd.concat([overall_nout, per_temp_nout], ignore_index=True)
-all_blocks_nout.to_csv(OUT_DIR / "metrics_summary_outlier_filtered.csv", index=False)
-
-# print console recap 
-print("\n=== OVERALL ===")
-print(overall.to_string(index=False))
-print("\n=== OVERALL (no outliers) ===")
-print(overall_nout.to_string(index=False))
-
-print("\n=== PER TEMPERATURE ===")
-print(per_temp.to_string(index=False))
-
-# Nice quick percentiles for latency & cost
-print("\nLatency percentiles:", percentiles(df["latency_s"]))
-print("Cost percentiles (GBP):", percentiles(df["est_cost"]))
-
-# simple plots 
-plt.figure()
-df["latency_s"].plot(kind="hist", bins=40)
-plt.xlabel("Latency (s)")
-plt.ylabel("Count")
-plt.title("Latency distribution")
-plt.savefig(OUT_DIR / "latency_hist.png", bbox_inches="tight", dpi=160)
-
-plt.figure()
-df["est_cost"].plot(kind="hist", bins=40)
-plt.xlabel("Cost per call (GBP)")
-plt.ylabel("Count")
-plt.title("Cost per call distribution")
-plt.savefig(OUT_DIR / "cost_hist.png", bbox_inches="tight", dpi=160)
-
-#  daily cost projection 
-daily_calls = USERS_PER_DAY * CALLS_PER_USER
-avg_cost = df["est_cost"].mean()
-daily_cost = daily_calls * avg_cost if not math.isnan(avg_cost) else None
-
-proj_path = OUT_DIR / "daily_cost_projection.txt"
-with proj_path.open("w", encoding="utf-8") as f:
-    f.write(
-        f"Users/day = {USERS_PER_DAY}\n"
-        f"Calls per user/day = {CALLS_PER_USER}\n"
-        f"Average cost per call (GBP) = {avg_cost:.6f}\n"
-        f"Estimated daily cost (GBP) = {daily_cost:.2f}\n"
-    )
-
-print(f"\nSaved: {OUT_DIR/'metrics_summary.csv'}")
-print(f"Saved: {OUT_DIR/'metrics_summary_outlier_filtered.csv'}")
-print(f"Saved: {OUT_DIR/'latency_hist.png'}")
-print(f"Saved: {OUT_DIR/'cost_hist.png'}")
-print(f"Saved: {proj_path}")
\ No newline at end of file
+def percentiles(hist: dict, ps=(0.05,0.25,0.5,0.75,0.95)):
+    return {f"p{int(p*100)}": round(float(hist_quantile(hist, p)), 3) for p in ps}
+
+def merged(groups: dict, by=None) -> dict:
+    """Merges the (temperature, feature) groups into label -> Agg; by=0 temperature, 1 feature, None all."""
+    out = {}
+    for key, agg in groups.items():
+        label = None if by is None else key[by]
+        out[label] = Agg().merge(agg) if label not in out else out[label].merge(agg)
+    return out
+
+def _sorted_labels(labels):
+    """groupby order: ascending, missing last."""
+    return sorted(labels, key=lambda v: (v is None, v if v is not None else 0))
+
+def _label(v):
+    return "nan" if v is None else v
+
+def hist_plot(hist: dict, xlabel: str, title: str, path: Path):
+    plt.figure()
+    plt.hist([bin_value(b) for b in hist], weights=list(hist.values()), bins=40)
+    plt.xlabel(xlabel)
+    plt.ylabel("Count")
+    plt.title(title)
+    plt.savefig(path, bbox_inches="tight", dpi=160)
+
+
+def main():
+    # load: fold new log lines into the columnar store, then work from its daily aggregates
+    result = ingest(LOG_PATH, STORE_DIR)
+    print(f"Ingested {result['rows']} new record(s) into {STORE_DIR}")
+    groups = load_groups(STORE_DIR)
+    if not groups:
+        raise SystemExit(f"No telemetry found in {LOG_PATH} or {STORE_DIR}")
+
+    # ------------------ overall summary ------------------
+    total = merged(groups)[None]
+    overall = summary_block(total, "overall")
+
+    # Per-temperature
+    by_temp = merged(groups, 0)
+    per_temp = pd.concat([summary_block(by_temp[t], f"temp={_label(t)}") for t in _sorted_labels(by_temp)],
+                         ignore_index=True)
+
+    # Per-feature (e.g., reliability:p6_long, vision2plan)
+    by_feat = merged(groups, 1)
+    per_feat = pd.concat([summary_block(by_feat[f], f"feature={_label(f)}") for f in _sorted_labels(by_feat)],
+                         ignore_index=True).sort_values("n", ascending=False, kind="stable")
+
+    #  outlier filtering (latency)
+    # Define outliers as > Q3 + 3*IQR (very conservative) — adjust if needed
+    Q1 = hist_quantile(total.lat_hist, 0.25)
+    Q3 = hist_quantile(total.lat_hist, 0.75)
+    IQR = Q3 - Q1
+    hi  = Q3 + 3*IQR
+    # The filtered blocks need the rows themselves: a column-pruned, predicate-pushed-down scan
+    nout = scan_groups(STORE_DIR, max_latency=hi)
+
+    overall_nout = summary_block(merged(nout).get(None), f"overall_no_outliers(≤{hi:.2f}s)")
+    by_temp_nout = merged(nout, 0)
+    per_temp_nout = pd.concat([summary_block(by_temp_nout[t], f"temp={_label(t)}_no_outliers")
+                               for t in _sorted_labels(by_temp_nout)] or [summary_block(None, "no_outliers")],
+                              ignore_index=True)
+
+    #save CSVs
+    all_blocks = pd.concat([overall, per_temp, per_feat], ignore_index=True)
+    all_blocks.to_csv(OUT_DIR / "metrics_summary.csv", index=False)
+
+    all_blocks_nout = pd.concat([overall_nout, per_temp_nout], ignore_index=True)
+    all_blocks_nout.to_csv(OUT_DIR / "metrics_summary_outlier_filtered.csv", index=False)
+
+    # print console recap
+    print("\n=== OVERALL ===")
+    print(overall.to_string(index=False))
+    print("\n=== OVERALL (no outliers) ===")
+    print(overall_nout.to_string(index=False))
+
+    print("\n=== PER TEMPERATURE ===")
+    print(per_temp.to_string(index=False))
+
+    # Nice quick percentiles for latency & cost
+    print("\nLatency percentiles:", percentiles(total.lat_hist))
+    print("Cost percentiles (GBP):", percentiles(total.cost_hist))
+
+    # simple plots
+    hist_plot(total.lat_hist, "Latency (s)", "Latency distribution", OUT_DIR / "latency_hist.png")
+    hist_plot(total.cost_hist, "Cost per call (GBP)", "Cost per call distribution", OUT_DIR / "cost_hist.png")
+
+    #  daily cost projection
+    daily_calls = USERS_PER_DAY * CALLS_PER_USER
+    avg_cost = _mean(total.cost_sum, total.cost_n)
+    daily_cost = daily_calls * avg_cost if not math.isnan(avg_cost) else None
+
+    proj_path = OUT_DIR / "daily_cost_projection.txt"
+    with proj_path.open("w", encoding="utf-8") as f:
+        f.write(
+            f"Users/day = {USERS_PER_DAY}\n"
+            f"Calls per user/day = {CALLS_PER_USER}\n"
+            f"Average cost per call (GBP) = {avg_cost:.6f}\n"
+            f"Estimated daily cost (GBP) = {daily_cost:.2f}\n"
+        )
+
+    print(f"\nSaved: {OUT_DIR/'metrics_summary.csv'}")
+    print(f"Saved: {OUT_DIR/'metrics_summary_outlier_filtered.csv'}")
+    print(f"Saved: {OUT_DIR/'latency_hist.png'}")
+    print(f"Saved: {OUT_DIR/'cost_hist.png'}")
+    print(f"Saved: {proj_path}")
+
+
+if __name__ == "__main__":
+    main()
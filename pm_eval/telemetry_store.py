@@ -0,0 +1,302 @@
+# pm_eval/telemetry_store.py — columnar store + pre-aggregates for api_metrics.jsonl
+#
+# The JSONL telemetry log (pm_app/telemetry.py) grows to millions of lines once
+# production traffic is logged. ingest() copies only the lines added since the
+# last run into Parquet files partitioned by day:
+#
+#   <store>/records/date=YYYY-MM-DD/part-*.parquet   one row per call
+#   <store>/daily/date=YYYY-MM-DD.parquet            per (temperature, feature) aggregates
+#   <store>/_ingest_state.json                       how far each log segment was read
+#
+# Only days that received new rows get their aggregates rebuilt, and
+# summarise_metrics.py works from the small daily tables. Quantiles come from
+# log-bucketed histograms (DDSketch-style) with REL_ACCURACY relative error.
+#
+#   python -m pm_eval.telemetry_store            # ingest the default log
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pm_app.telemetry import segments
+
+LOG_PATH = Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "api_metrics.jsonl"
+STORE_DIR = LOG_PATH.parent / "telemetry_store"
+
+CHUNK_ROWS = 100_000  # rows buffered before a Parquet part is written
+
+RECORD_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("ts", pa.timestamp("us")),
+    ("source", pa.string()),
+    ("feature", pa.string()),
+    ("model", pa.string()),
+    ("temperature", pa.float64()),
+    ("latency_s", pa.float64()),
+    ("ttft_s", pa.float64()),
+    ("tokens_in", pa.int64()),
+    ("tokens_out", pa.int64()),
+    ("est_cost", pa.float64()),
+    ("used_mock", pa.bool_()),
+    ("cache_hit", pa.bool_()),
+    ("ok", pa.bool_()),
+    ("schema_ok", pa.bool_()),
+    ("error", pa.string()),
+])
+
+# ---- log-bucketed histograms ----
+REL_ACCURACY = 0.01
+GAMMA = (1 + REL_ACCURACY) / (1 - REL_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+ZERO_BIN = -(2 ** 31)  # values <= 0
+
+
+def to_bins(values: np.ndarray) -> dict:
+    """bin -> count for the non-NaN values."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {}
+    positive = values > 0
+    bins = np.full(len(values), ZERO_BIN, dtype=np.int64)
+    bins[positive] = np.ceil(np.log(values[positive]) / LOG_GAMMA)
+    keys, counts = np.unique(bins, return_counts=True)
+    return dict(zip(keys.tolist(), counts.tolist()))
+
+
+def bin_value(b: int) -> float:
+    return 0.0 if b == ZERO_BIN else 2 * GAMMA ** b / (GAMMA + 1)
+
+
+def hist_quantile(hist: dict, q: float) -> float:
+    """Linear-interpolated quantile, same convention as pandas.Series.quantile."""
+    n = sum(hist.values())
+    if not n:
+        return float("nan")
+    rank = q * (n - 1)
+    lo, hi = math.floor(rank), math.ceil(rank)
+    out, seen = {}, 0
+    for b in sorted(hist, key=bin_value):
+        seen += hist[b]
+        for k in (lo, hi):
+            if k not in out and k < seen:
+                out[k] = bin_value(b)
+        if hi in out:
+            break
+    return out[lo] + (out[hi] - out[lo]) * (rank - lo)
+
+
+def _merge_hist(into: dict, other: dict):
+    for b, c in other.items():
+        into[b] = into.get(b, 0) + c
+
+
+class Agg:
+    """Mergeable summary of a set of calls: counts, sums, max and value histograms."""
+
+    FIELDS = ("n", "lat_n", "lat_sum", "lat_max", "tin_n", "tin_sum", "tout_n", "tout_sum", "cost_n", "cost_sum")
+
+    def __init__(self, **values):
+        for f in self.FIELDS:
+            setattr(self, f, values.get(f, 0))
+        self.lat_max = values.get("lat_max", float("nan"))
+        self.lat_hist = dict(values.get("lat_hist", {}))
+        self.cost_hist = dict(values.get("cost_hist", {}))
+
+    @classmethod
+    def of(cls, frame: pd.DataFrame) -> "Agg":
+        lat = frame["latency_s"].to_numpy(dtype=float)
+        tin = frame["tokens_in"].astype(float)
+        tout = frame["tokens_out"].astype(float)
+        cost = frame["est_cost"].to_numpy(dtype=float)
+        return cls(
+            n=len(frame),
+            lat_n=int(np.count_nonzero(~np.isnan(lat))), lat_sum=float(np.nansum(lat)),
+            lat_max=float(np.nanmax(lat)) if np.any(~np.isnan(lat)) else float("nan"),
+            tin_n=int(tin.count()), tin_sum=float(tin.sum()),
+            tout_n=int(tout.count()), tout_sum=float(tout.sum()),
+            cost_n=int(np.count_nonzero(~np.isnan(cost))), cost_sum=float(np.nansum(cost)),
+            lat_hist=to_bins(lat), cost_hist=to_bins(cost),
+        )
+
+    def merge(self, other: "Agg") -> "Agg":
+        for f in self.FIELDS:
+            if f != "lat_max":
+                setattr(self, f, getattr(self, f) + getattr(other, f))
+        self.lat_max = np.fmax(self.lat_max, other.lat_max)
+        _merge_hist(self.lat_hist, other.lat_hist)
+        _merge_hist(self.cost_hist, other.cost_hist)
+        return self
+
+    def to_row(self) -> dict:
+        row = {f: getattr(self, f) for f in self.FIELDS}
+        for name in ("lat", "cost"):
+            hist = getattr(self, f"{name}_hist")
+            row[f"{name}_bins"] = list(hist.keys())
+            row[f"{name}_counts"] = list(hist.values())
+        return row
+
+    @classmethod
+    def from_row(cls, row) -> "Agg":
+        return cls(**{f: row[f] for f in cls.FIELDS},
+                   lat_hist=dict(zip(row["lat_bins"], row["lat_counts"])),
+                   cost_hist=dict(zip(row["cost_bins"], row["cost_counts"])))
+
+
+def group_key(temperature, feature) -> tuple:
+    """Missing values become None, so NaN keys from different days compare equal."""
+    if temperature is None or (isinstance(temperature, float) and math.isnan(temperature)):
+        temperature = None
+    return float(temperature) if temperature is not None else None, feature if isinstance(feature, str) else None
+
+
+def group_aggs(frame: pd.DataFrame) -> dict:
+    """(temperature, feature) -> Agg for calls that reached the API (cache hits excluded)."""
+    frame = frame[frame["cache_hit"] != True]  # noqa: E712 (nullable column)
+    return {group_key(*key): Agg.of(g) for key, g in frame.groupby(["temperature", "feature"], dropna=False)}
+
+
+def _merge_into(groups: dict, key, agg: Agg):
+    groups[key] = groups[key].merge(agg) if key in groups else agg
+
+
+# ---- ingest ----
+def _fingerprint(seg: Path):
+    """Identifies a segment by its first line, which survives rotation (renaming) and gzip."""
+    try:
+        with (gzip.open if seg.suffix == ".gz" else open)(seg, "rb") as f:
+            first = f.readline()
+    except FileNotFoundError:  # rotated away while we were listing
+        return None
+    return hashlib.sha1(first).hexdigest() if first.endswith(b"\n") else None
+
+
+def _new_lines(seg: Path, offset: int):
+    """Yields (line, offset after it) for complete lines past offset."""
+    with (gzip.open if seg.suffix == ".gz" else open)(seg, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):  # still being written
+                return
+            offset += len(line)
+            yield line, offset
+
+
+def _to_row(rec: dict) -> dict:
+    row = {name: rec.get(name) for name in RECORD_SCHEMA.names}
+    try:
+        row["ts"] = datetime.fromisoformat(rec["ts"])
+    except (KeyError, TypeError, ValueError):
+        row["ts"] = None
+    for name in ("tokens_in", "tokens_out"):
+        if row[name] is not None:
+            row[name] = int(row[name])
+    for name in ("temperature", "latency_s", "ttft_s", "est_cost"):
+        if row[name] is not None:
+            row[name] = float(row[name])
+    return row
+
+
+def _write_parts(store: Path, buffered: dict) -> set:
+    for day, rows in buffered.items():
+        out = store / "records" / f"date={day}"
+        out.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        pq.write_table(pa.Table.from_pylist(rows, schema=RECORD_SCHEMA), out / f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+    return set(buffered)
+
+
+def rebuild_daily(store: Path, day: str):
+    """Recomputes one day's aggregates from its Parquet parts."""
+    frame = ds.dataset(store / "records" / f"date={day}", format="parquet").to_table(
+        columns=["id", "temperature", "feature", "latency_s", "tokens_in", "tokens_out", "est_cost", "cache_hit"]
+    ).to_pandas()
+    # A crash between writing parts and saving the ingest state re-reads some lines
+    frame = frame[frame["id"].isna() | ~frame.duplicated("id")]
+    rows = [{"temperature": t, "feature": f, **agg.to_row()} for (t, f), agg in group_aggs(frame).items()]
+    out = store / "daily"
+    out.mkdir(parents=True, exist_ok=True)
+    tmp = out / f"date={day}.parquet.tmp"
+    pq.write_table(pa.Table.from_pylist(rows), tmp)
+    tmp.replace(out / f"date={day}.parquet")
+
+
+def ingest(log_path=LOG_PATH, store=STORE_DIR) -> dict:
+    """Appends the log lines not seen before to the store. Returns {"rows": n, "days": [...]}."""
+    store = Path(store)
+    state_path = store / "_ingest_state.json"
+    state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    new_state, buffered, touched, rows = {}, {}, set(), 0
+
+    for seg in segments(log_path):
+        fp = _fingerprint(seg)
+        if fp is None:
+            continue
+        offset = state.get(fp, 0)
+        for line, offset in _new_lines(seg, offset):
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            row = _to_row(rec)
+            buffered.setdefault(str(rec.get("ts", ""))[:10] or "unknown", []).append(row)
+            rows += 1
+            if rows % CHUNK_ROWS == 0:
+                touched |= _write_parts(store, buffered)
+                buffered = {}
+        new_state[fp] = offset
+
+    touched |= _write_parts(store, buffered)
+    for day in sorted(touched):
+        rebuild_daily(store, day)
+    store.mkdir(parents=True, exist_ok=True)
+    tmp = state_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(new_state), encoding="utf-8")
+    tmp.replace(state_path)
+    return {"rows": rows, "days": sorted(touched)}
+
+
+# ---- reading ----
+def load_groups(store=STORE_DIR) -> dict:
+    """(temperature, feature) -> Agg merged over every day."""
+    groups = {}
+    for path in sorted((Path(store) / "daily").glob("date=*.parquet")):
+        for row in pq.read_table(path).to_pylist():
+            _merge_into(groups, group_key(row["temperature"], row["feature"]), Agg.from_row(row))
+    return groups
+
+
+def scan_groups(store=STORE_DIR, max_latency=None) -> dict:
+    """Like load_groups but straight from the records, keeping only latency_s <= max_latency."""
+    dataset = ds.dataset(Path(store) / "records", format="parquet", partitioning="hive")
+    flt = None if max_latency is None else ds.field("latency_s") <= max_latency
+    groups = {}
+    for batch in dataset.to_batches(columns=["temperature", "feature", "latency_s", "tokens_in",
+                                             "tokens_out", "est_cost", "cache_hit"], filter=flt):
+        for key, agg in group_aggs(batch.to_pandas()).items():
+            _merge_into(groups, key, agg)
+    return groups
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest api_metrics.jsonl into the day-partitioned Parquet store.")
+    ap.add_argument("--log", default=str(LOG_PATH))
+    ap.add_argument("--store", default=str(STORE_DIR))
+    args = ap.parse_args()
+    result = ingest(args.log, args.store)
+    print(f"Ingested {result['rows']} new record(s); rebuilt {len(result['days'])} day(s) -> {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Settings below read the environment; variables kept in .env count too
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -41,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pm_app.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +88,27 @@ DATABASES = {
     }
 }
 
+# DB_PROFILE=production tunes SQLite for concurrent requests: WAL so readers
+# never wait for a writer, a busy timeout instead of immediate "database is
+# locked" errors, and connections kept open across requests. The pragmas are
+# run on every new connection (pm_app/db.py). Connections persist only under
+# manage.py serve_prefork; runserver closes them after every request.
+# "default" is Django's stock setup.
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+SQLITE_PRAGMAS = {}
+if DB_PROFILE == "production":
+    DATABASES['default'].update(
+        CONN_MAX_AGE=int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        CONN_HEALTH_CHECKS=True,
+    )
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # durable at checkpoints; safe with WAL
+        "busy_timeout": 5000,     # ms
+        "cache_size": -20000,     # KiB (20 MB) per connection
+        "temp_store": "MEMORY",
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -123,5 +151,39 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+TEST_RUNNER = 'pm_tool.test_runner.TestRunner'
+
+
+CHROMA_DB = str(BASE_DIR / "chroma_data")
+
+# Pre-styled .docx skeletons for the plan documents (see pm_app/docx_render.py)
+DOCX_TEMPLATE_DIR = BASE_DIR / "pm_app" / "docx_templates"
+
+# Point the OpenAI clients at another endpoint, e.g. pm_eval/mock_openai_server.py
+# (http://127.0.0.1:8765/v1). None keeps the SDK default.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# ONNX Runtime threads for the Chroma embedding model (0: its default). The
+# prefork server (manage.py serve_prefork) sets 1, which is safe across fork().
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+# When set, the inputs of every generate/update flow prompt are appended to this
+# JSONL file; pm_eval/flow_benchmark.py replays them. Off by default.
+FLOW_PROMPT_CORPUS = os.getenv("FLOW_PROMPT_CORPUS", "")
+
+# Per-request timing breakdown (pm_app/instrumentation.py). In DEBUG, one JSONL
+# record per request goes next to pm_eval's api_metrics.jsonl; elsewhere the log
+# is off unless REQUEST_METRICS_LOG names a file ("" turns it off in DEBUG too).
+# Tests never write it (pm_tool/test_runner.py). Server-Timing headers are only
+# sent in DEBUG by default.
+REQUEST_METRICS_LOG = os.getenv(
+    "REQUEST_METRICS_LOG",
+    str(Path(os.getenv("EVAL_OUTPUT_DIR", str(Path.home() / "pm_eval_private" / "logs"))) / "request_metrics.jsonl")
+    if DEBUG else "",
+)
+REQUEST_METRICS_SERVER_TIMING = os.getenv("REQUEST_METRICS_SERVER_TIMING", str(DEBUG)).lower() == "true"
 
-CHROMA_DB = str(BASE_DIR / "chroma_data")
\ No newline at end of file
+# Counters and histograms served at /metrics (pm_app/metrics.py). With several
+# worker processes, also set METRICS_MULTIPROC_DIR to a shared directory that is
+# emptied on each deploy, so every worker's values are summed.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
@@ -0,0 +1,19 @@
+"""
+The project's test runner (settings.TEST_RUNNER). Requests made by the tests
+would otherwise be appended to the real REQUEST_METRICS_LOG, which pm_eval's
+summaries read; the log is off for the whole run, and tests that check it
+point it at a temporary file with override_settings.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._no_request_log = override_settings(REQUEST_METRICS_LOG="")
+        self._no_request_log.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._no_request_log.disable()
+        super().teardown_test_environment(**kwargs)